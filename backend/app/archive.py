@@ -0,0 +1,55 @@
+"""アーカイブ済みタスクのコールドストレージへの移動
+
+    cd backend && python -m app.archive --days 30
+
+アーカイブから保持期間以上たったタスクを archived_tasks に移す。移したタスクは
+プロジェクト画面（archived を指定しない・true のとき）とエクスポートには引き続き出て、
+POST /api/tasks/{id}/restore で作業中に戻せる。差分同期（/api/sync）には削除として現れる。
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+
+from app.database import get_conn, pool
+from app.events import publish
+
+ARCHIVE_AFTER_DAYS = int(os.environ.get("ARCHIVE_AFTER_DAYS", "30"))
+# 1 トランザクションで移す件数（ロックと WAL を小さく保つ）
+ARCHIVE_BATCH_SIZE = 1000
+
+
+def move_archived_tasks(days: int = ARCHIVE_AFTER_DAYS, batch_size: int = ARCHIVE_BATCH_SIZE) -> int:
+    """移したタスクの件数を返す"""
+    moved = 0
+    while True:
+        with get_conn() as conn, conn.cursor() as cur:
+            cur.execute(
+                "SELECT move_archived_tasks(CURRENT_TIMESTAMP - make_interval(days => %s), %s) AS moved",
+                (days, batch_size),
+            )
+            count = cur.fetchone()["moved"]
+            if count:
+                publish(cur, "tasks.archived", {"moved": count})
+            conn.commit()
+        moved += count
+        if count < batch_size:
+            return moved
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=ARCHIVE_AFTER_DAYS, help="アーカイブしてから移すまでの日数")
+    parser.add_argument("--batch-size", type=int, default=ARCHIVE_BATCH_SIZE, help="1 トランザクションで移す件数")
+    args = parser.parse_args()
+
+    pool.open()
+    try:
+        print(f"moved {move_archived_tasks(args.days, args.batch_size)} archived tasks")
+    finally:
+        pool.close()
+
+
+if __name__ == "__main__":
+    main()
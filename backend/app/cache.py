@@ -0,0 +1,133 @@
+"""ボード・プロジェクトのメタデータ用プロセス内キャッシュ
+
+件数が少なく更新もまれなので、一覧を丸ごと読み込んで保持する。
+書き込み系ルートがコミット後に invalidate() する。別プロセスからの更新は
+条件付き GET でリソースのバージョンが変わったのを見たとき（observe()）か、
+TTL（CACHE_TTL 秒）で反映される。
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections.abc import Callable
+from typing import Any, Generic, TypeVar
+
+from pydantic import BaseModel
+
+from app.database import get_conn
+
+CACHE_TTL = float(os.environ.get("CACHE_TTL", "30"))
+REFRESH_INTERVAL = 1.0
+
+T = TypeVar("T")
+
+
+class TTLCache(Generic[T]):
+    """1 つの値を loader で読み込み、TTL か invalidate() まで保持する"""
+
+    def __init__(self, name: str, loader: Callable[[], T], ttl: float = CACHE_TTL) -> None:
+        self.name = name
+        self._loader = loader
+        self._ttl = ttl
+        self._lock = threading.Lock()
+        self._value: T | None = None
+        self._loaded_at = 0.0
+        # 読み込み中に invalidate された場合、古い値を保存しないための世代番号
+        self._generation = 0
+        self._hits = 0
+        self._misses = 0
+        self._invalidations = 0
+        self._observed_version: int | None = None
+
+    def get(self, max_age: float | None = None) -> T:
+        """max_age を指定すると、それより古い値は TTL 内でも読み直す"""
+        max_age = self._ttl if max_age is None else min(max_age, self._ttl)
+        with self._lock:
+            if self._value is not None and time.monotonic() - self._loaded_at < max_age:
+                self._hits += 1
+                return self._value
+            self._misses += 1
+            generation = self._generation
+
+        loaded_at = time.monotonic()
+        value = self._loader()
+        with self._lock:
+            if generation == self._generation:
+                self._value = value
+                self._loaded_at = loaded_at
+        return value
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._value = None
+            self._generation += 1
+            self._invalidations += 1
+
+    def observe(self, version: int) -> None:
+        """リソースのバージョンが前回見たときから変わっていれば破棄する"""
+        with self._lock:
+            if version == self._observed_version:
+                return
+            self._observed_version = version
+        self.invalidate()
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {"hits": self._hits, "misses": self._misses, "invalidations": self._invalidations}
+
+
+def _load_boards() -> list[dict[str, Any]]:
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute("SELECT id, label, color, version FROM boards ORDER BY position, id")
+        return [{**row, "id": str(row["id"])} for row in cur.fetchall()]
+
+
+def _load_projects() -> dict[str, dict[str, Any]]:
+    """id をキーにした表示順の辞書"""
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute("SELECT id, name, short_name, color FROM projects ORDER BY sort_order")
+        return {str(row["id"]): {**row, "id": str(row["id"])} for row in cur.fetchall()}
+
+
+boards_cache: TTLCache[list[dict[str, Any]]] = TTLCache("boards", _load_boards)
+projects_cache: TTLCache[dict[str, dict[str, Any]]] = TTLCache("projects", _load_projects)
+
+
+def get_project(project_id: str) -> dict[str, Any] | None:
+    """キャッシュからプロジェクトを引く
+
+    見つからなければ他プロセスでの作成を考えて読み直す。存在しない id で
+    読み込みが繰り返されないよう、読み直すのは値が REFRESH_INTERVAL 秒より古い場合だけ。
+    """
+    project = projects_cache.get().get(project_id)
+    if project is None:
+        project = projects_cache.get(max_age=REFRESH_INTERVAL).get(project_id)
+    return project
+
+
+def observe_versions(versions: dict[str, int]) -> None:
+    for cache in (boards_cache, projects_cache):
+        if cache.name in versions:
+            cache.observe(versions[cache.name])
+
+
+def cache_stats() -> dict[str, dict[str, int]]:
+    return {cache.name: cache.stats() for cache in (boards_cache, projects_cache)}
+
+
+class ProjectInfo(BaseModel):
+    id: str
+    name: str
+    short_name: str
+    color: str | None
+
+
+def project_info(project_id: Any) -> ProjectInfo | None:
+    """タスクのレスポンスに付けるプロジェクト情報（タスクのクエリで結合せず、キャッシュから付与する）
+
+    キャッシュの読み込みで接続を二重に取らないよう、with get_conn() の外で呼ぶ。
+    """
+    project = get_project(str(project_id)) if project_id else None
+    return ProjectInfo(**project) if project else None
@@ -0,0 +1,56 @@
+"""差分同期用の変更履歴（change_log）の整理
+
+    cd backend && python -m app.changelog --days 30
+
+保持期間より古い履歴を削除し、削除した位置を change_log_horizon に記録する。
+それより古いトークンでの同期は 410 になり、クライアントは全件取得からやり直す。
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+
+from app.database import get_conn, pool
+
+CHANGE_LOG_RETENTION_DAYS = int(os.environ.get("CHANGE_LOG_RETENTION_DAYS", "30"))
+
+
+def prune_change_log(days: int = CHANGE_LOG_RETENTION_DAYS) -> int:
+    """削除した履歴の件数を返す"""
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute(
+            """
+            WITH pruned AS (
+                DELETE FROM change_log
+                WHERE changed_at < CURRENT_TIMESTAMP - make_interval(days => %s)
+                RETURNING txid
+            ),
+            horizon AS (
+                UPDATE change_log_horizon
+                SET txid = GREATEST(txid, (SELECT MAX(txid) FROM pruned))
+                WHERE EXISTS (SELECT 1 FROM pruned)
+            )
+            SELECT COUNT(*) AS pruned FROM pruned
+            """,
+            (days,),
+        )
+        pruned = cur.fetchone()["pruned"]
+        conn.commit()
+    return pruned
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=CHANGE_LOG_RETENTION_DAYS, help="保持する日数")
+    args = parser.parse_args()
+
+    pool.open()
+    try:
+        print(f"pruned {prune_change_log(args.days)} change log rows")
+    finally:
+        pool.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,341 @@
 from __future__ import annotations
 
+import contextvars
 import os
+import threading
+import time
+from collections import deque
+from collections.abc import Iterator, Sequence
+from contextlib import contextmanager
+from dataclasses import dataclass
 
 import psycopg2
+import psycopg2.extensions
 from psycopg2.extras import RealDictCursor
 
+from app import metrics
+
 DATABASE_URL = os.environ.get(
     "DATABASE_URL",
     "host=localhost port=5432 dbname=tasktimer user=tasktimer password=tasktimer",
 )
 
+POOL_MIN_SIZE = int(os.environ.get("DB_POOL_MIN_SIZE", "2"))
+POOL_MAX_SIZE = int(os.environ.get("DB_POOL_MAX_SIZE", "20"))
+# 接続待ちのタイムアウト（秒）
+POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", "10"))
+# この秒数以上アイドルだった接続はチェックアウト時に SELECT 1 で死活確認する
+POOL_CHECK_IDLE = float(os.environ.get("DB_POOL_CHECK_IDLE", "30"))
+# 接続の最大寿命（秒）。超えたものは返却時に破棄して作り直す
+POOL_MAX_LIFETIME = float(os.environ.get("DB_POOL_MAX_LIFETIME", "1800"))
+# 同期ハンドラを実行するスレッド数。anyio の既定値 (40) では DB 待ちのリクエストで
+# 同時実行数が頭打ちになるため、プールの待ち行列より十分大きくしておく
+THREADPOOL_SIZE = int(os.environ.get("THREADPOOL_SIZE", str(max(POOL_MAX_SIZE * 4, 100))))
+
+
+class PoolTimeout(Exception):
+    """プールから接続を取得できなかった"""
+
+
+_timed_cursors: dict[type, type] = {}
+
+
+def _timed_cursor(base: type) -> type:
+    """base の execute / executemany の所要時間を metrics に記録するサブクラス"""
+    timed = _timed_cursors.get(base)
+    if timed is None:
+        def execute(self, query, vars=None):  # type: ignore[no-untyped-def]
+            started = time.perf_counter()
+            try:
+                return base.execute(self, query, vars)
+            finally:
+                metrics.record_query(query, time.perf_counter() - started)
+
+        def executemany(self, query, vars_list):  # type: ignore[no-untyped-def]
+            started = time.perf_counter()
+            try:
+                return base.executemany(self, query, vars_list)
+            finally:
+                metrics.record_query(query, time.perf_counter() - started)
+
+        timed = _timed_cursors[base] = type(
+            f"Timed{base.__name__}", (base,), {"execute": execute, "executemany": executemany},
+        )
+    return timed
+
+
+class InstrumentedConnection(psycopg2.extensions.connection):
+    """cursor() が返すカーソルのクエリを計測する接続（cursor_factory の指定はそのまま生かす）"""
+
+    def cursor(self, *args, **kwargs):  # type: ignore[no-untyped-def]
+        base = kwargs.get("cursor_factory") or self.cursor_factory or psycopg2.extensions.cursor
+        kwargs["cursor_factory"] = _timed_cursor(base)
+        return super().cursor(*args, **kwargs)
+
+
+@dataclass
+class _PooledConn:
+    conn: psycopg2.extensions.connection
+    created_at: float
+    last_used_at: float
+
+
+class ConnectionPool:
+    """psycopg2 のスレッドセーフな接続プール
+
+    チェックアウト時に壊れた接続・長時間アイドルの接続を検査し、
+    返却時に未完了のトランザクションをロールバックしてから戻す。
+    """
+
+    def __init__(
+        self,
+        dsn: str,
+        *,
+        min_size: int = POOL_MIN_SIZE,
+        max_size: int = POOL_MAX_SIZE,
+        timeout: float = POOL_TIMEOUT,
+        check_idle: float = POOL_CHECK_IDLE,
+        max_lifetime: float = POOL_MAX_LIFETIME,
+    ) -> None:
+        self.dsn = dsn
+        self.min_size = min(min_size, max_size)
+        self.max_size = max_size
+        self.timeout = timeout
+        self.check_idle = check_idle
+        self.max_lifetime = max_lifetime
+
+        self._idle: deque[_PooledConn] = deque()
+        self._in_use: dict[int, _PooledConn] = {}
+        self._size = 0  # 作成中を含む接続数
+        self._cond = threading.Condition()
+        self._closed = False
+
+        # 統計
+        self._waiting = 0
+        self._checkouts = 0
+        self._timeouts = 0
+        self._discarded = 0
+        self._wait_time_total = 0.0
+        self._wait_time_max = 0.0
+
+    def _connect(self) -> _PooledConn:
+        conn = psycopg2.connect(
+            self.dsn, connection_factory=InstrumentedConnection, cursor_factory=RealDictCursor,
+        )
+        now = time.monotonic()
+        return _PooledConn(conn=conn, created_at=now, last_used_at=now)
+
+    def open(self) -> None:
+        """min_size まで接続を事前に確立する"""
+        with self._cond:
+            self._closed = False
+            missing = self.min_size - self._size
+            self._size += max(missing, 0)
+        for _ in range(max(missing, 0)):
+            try:
+                pooled = self._connect()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+            with self._cond:
+                self._idle.append(pooled)
+                self._cond.notify()
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            idle, self._idle = list(self._idle), deque()
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for pooled in idle:
+            pooled.conn.close()
+
+    def _is_healthy(self, pooled: _PooledConn) -> bool:
+        conn = pooled.conn
+        if conn.closed:
+            return False
+        if time.monotonic() - pooled.last_used_at < self.check_idle:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _discard(self, pooled: _PooledConn) -> None:
+        try:
+            pooled.conn.close()
+        except psycopg2.Error:
+            pass
+        with self._cond:
+            self._size -= 1
+            self._discarded += 1
+            self._cond.notify()
+
+    def getconn(self, timeout: float | None = None) -> psycopg2.extensions.connection:
+        """timeout を省略するとプールの timeout まで待つ"""
+        timeout = self.timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+        while True:
+            pooled = None
+            create = False
+            with self._cond:
+                if self._closed:
+                    raise PoolTimeout("Connection pool is closed")
+                self._waiting += 1
+                try:
+                    while not self._idle and self._size >= self.max_size:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self._timeouts += 1
+                            raise PoolTimeout(
+                                f"Could not acquire a connection within {timeout}s"
+                            )
+                        self._cond.wait(remaining)
+                finally:
+                    self._waiting -= 1
+                if self._idle:
+                    pooled = self._idle.pop()
+                else:
+                    self._size += 1
+                    create = True
+
+            if create:
+                try:
+                    pooled = self._connect()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+            elif not self._is_healthy(pooled):
+                # 壊れた接続は捨てて取り直す
+                self._discard(pooled)
+                continue
+
+            waited = time.monotonic() - started
+            with self._cond:
+                self._in_use[id(pooled.conn)] = pooled
+                self._checkouts += 1
+                self._wait_time_total += waited
+                self._wait_time_max = max(self._wait_time_max, waited)
+            metrics.record_acquire(waited)
+            return pooled.conn
+
+    def putconn(self, conn: psycopg2.extensions.connection) -> None:
+        with self._cond:
+            pooled = self._in_use.pop(id(conn))
+
+        broken = conn.closed != 0
+        if not broken and conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                broken = True
+
+        expired = time.monotonic() - pooled.created_at > self.max_lifetime
+        if broken or expired or self._closed:
+            self._discard(pooled)
+            return
+
+        pooled.last_used_at = time.monotonic()
+        with self._cond:
+            self._idle.append(pooled)
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self, timeout: float | None = None) -> Iterator[psycopg2.extensions.connection]:
+        conn = self.getconn(timeout)
+        try:
+            yield conn
+        finally:
+            self.putconn(conn)
+
+    def warm(self, statements: Sequence[str]) -> None:
+        """アイドルの接続それぞれで statements を実行しておく
+
+        新しいバックエンドは最初のクエリでカタログ（テーブル・索引の定義）を読み込むので、
+        起動直後のリクエストがその分遅くならないよう先に済ませる。
+        """
+        with self._cond:
+            count = len(self._idle)
+        conns = [self.getconn() for _ in range(count)]
+        try:
+            for conn in conns:
+                with conn.cursor() as cur:
+                    for sql in statements:
+                        cur.execute(sql)
+                conn.rollback()
+        finally:
+            for conn in conns:
+                self.putconn(conn)
+
+    def stats(self) -> dict[str, float | int]:
+        with self._cond:
+            return {
+                "size": self._size,
+                "in_use": len(self._in_use),
+                "idle": len(self._idle),
+                "waiting": self._waiting,
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "checkouts": self._checkouts,
+                "timeouts": self._timeouts,
+                "discarded": self._discarded,
+                "wait_time_total_ms": round(self._wait_time_total * 1000, 3),
+                "wait_time_max_ms": round(self._wait_time_max * 1000, 3),
+            }
+
+
+pool = ConnectionPool(DATABASE_URL)
+
+
+@dataclass
+class CommitPosition:
+    """書き込みリクエストでコミットした後のプライマリの WAL 位置（replicas の read-your-writes 用）"""
+    lsn: str | None = None
+
+
+_commit_position: contextvars.ContextVar[CommitPosition | None] = contextvars.ContextVar(
+    "commit_position", default=None,
+)
+
+
+@contextmanager
+def track_commit_position() -> Iterator[CommitPosition]:
+    """この中の get_conn() は、返却する前にその接続でコミット後の WAL 位置を記録する"""
+    position = CommitPosition()
+    token = _commit_position.set(position)
+    try:
+        yield position
+    finally:
+        _commit_position.reset(token)
+
+
+def _record_commit_position(conn: psycopg2.extensions.connection, position: CommitPosition) -> None:
+    # 未コミットのまま抜けた（返却時にロールバックされる）接続の位置は使わない
+    if conn.closed or conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+        return
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_current_wal_lsn()::text AS lsn")
+            position.lsn = cur.fetchone()["lsn"]
+        conn.rollback()
+    except psycopg2.Error:
+        # コミットは済んでいるのでリクエストは失敗させない（位置は付かない）
+        pass
+
 
-def get_conn():
-    return psycopg2.connect(DATABASE_URL, cursor_factory=RealDictCursor)
+@contextmanager
+def get_conn() -> Iterator[psycopg2.extensions.connection]:
+    """プールから接続を借りる。with を抜けると未コミットの変更はロールバックされて返却される"""
+    with pool.connection() as conn:
+        yield conn
+        position = _commit_position.get()
+        if position is not None:
+            _record_commit_position(conn, position)
@@ -0,0 +1,252 @@
+"""Postgres LISTEN/NOTIFY による変更イベントの配信
+
+書き込み系ルートは publish() でコミット前に NOTIFY する（ロールバックされれば
+配信されない）。各プロセスの EventBroker は専用の接続で LISTEN し、受け取った
+イベントをリングバッファに積んで SSE の購読者に配る。
+
+- イベント id は change_event_seq の連番。コミット順と一致しない場合があるので、
+  再開位置は id の大小ではなくバッファ内の並び（= コミット順）で決める。
+- 購読者のキューが溢れたら切断する。クライアントは Last-Event-ID で再接続し、
+  バッファに残っていれば差分から、残っていなければ reset を受けて全件取得からやり直す。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import select
+import threading
+from collections import deque
+from collections.abc import AsyncIterator, Iterable
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from typing import Any
+
+import psycopg2
+import psycopg2.extensions
+
+from app import cache
+from app.database import DATABASE_URL
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "tasktimer_events"
+# 再接続時に差分を返せる直近のイベント数
+EVENT_BUFFER_SIZE = int(os.environ.get("EVENT_BUFFER_SIZE", "1000"))
+# 購読者ごとの未送信イベントの上限
+EVENT_QUEUE_SIZE = int(os.environ.get("EVENT_QUEUE_SIZE", "256"))
+HEARTBEAT_INTERVAL = 15.0
+RECONNECT_DELAY = 1.0
+# NOTIFY のペイロード上限は 8000 バイト。超えそうなら data を省く（クライアントは取り直す）
+MAX_DATA_BYTES = 7000
+
+# LISTEN が切れてイベントを取りこぼした購読者に送る印
+_RESET: dict[str, Any] = {"type": "reset"}
+# シャットダウン時に購読を終わらせる印（送らずに切断する）
+_CLOSE: dict[str, Any] = {"type": "close"}
+
+
+def _json_default(value: Any) -> str:
+    return value.isoformat() if isinstance(value, (date, datetime)) else str(value)
+
+
+def publish(
+    cur: Any,
+    type: str,
+    data: dict[str, Any] | None = None,
+    *,
+    boards: Iterable[Any] | None = None,
+    projects: Iterable[Any] | None = None,
+) -> None:
+    """変更イベントを NOTIFY する
+
+    boards / projects は影響するボード・プロジェクトの id。None なら全購読者に配る。
+    """
+    event: dict[str, Any] = {"type": type}
+    if boards is not None:
+        event["boards"] = sorted({str(b) for b in boards if b})
+    if projects is not None:
+        event["projects"] = sorted({str(p) for p in projects if p})
+    if data is not None and len(json.dumps(data, default=_json_default).encode()) <= MAX_DATA_BYTES:
+        event["data"] = data
+    cur.execute(
+        "SELECT pg_notify(%s, (jsonb_build_object('id', nextval('change_event_seq')) || %s::jsonb)::text)",
+        (CHANNEL, json.dumps(event, default=_json_default)),
+    )
+
+
+@dataclass(eq=False)
+class Subscription:
+    board_id: str | None
+    project_id: str | None
+    queue: asyncio.Queue[dict[str, Any]] = field(default_factory=lambda: asyncio.Queue(EVENT_QUEUE_SIZE))
+    overflowed: bool = False
+
+    def wants(self, event: dict[str, Any]) -> bool:
+        if self.board_id and "boards" in event and self.board_id not in event["boards"]:
+            return False
+        if self.project_id and "projects" in event and self.project_id not in event["projects"]:
+            return False
+        return True
+
+
+class EventBroker:
+    def __init__(self, dsn: str = DATABASE_URL, buffer_size: int = EVENT_BUFFER_SIZE) -> None:
+        self._dsn = dsn
+        self._buffer: deque[dict[str, Any]] = deque(maxlen=buffer_size)
+        self._subscribers: set[Subscription] = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    def start(self, loop: asyncio.AbstractEventLoop) -> None:
+        self._loop = loop
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="event-listener", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=RECONNECT_DELAY * 2)
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                conn = psycopg2.connect(self._dsn)
+            except psycopg2.OperationalError:
+                logger.warning("Event listener could not connect", exc_info=True)
+                self._stop.wait(RECONNECT_DELAY)
+                continue
+            try:
+                conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+                with conn.cursor() as cur:
+                    cur.execute(f"LISTEN {CHANNEL}")
+                while not self._stop.is_set():
+                    if select.select([conn], [], [], RECONNECT_DELAY) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        self._publish(conn.notifies.pop(0).payload)
+            except psycopg2.Error:
+                logger.warning("Event listener disconnected", exc_info=True)
+                # 切断中のイベントは取りこぼしているので、差分での再開はできない
+                self._reset_all()
+                self._stop.wait(RECONNECT_DELAY)
+            finally:
+                conn.close()
+
+    def _publish(self, payload: str) -> None:
+        event = json.loads(payload)
+        # 他プロセスでのボード・プロジェクトの変更もここでキャッシュに反映する
+        if event["type"].startswith("board."):
+            cache.boards_cache.invalidate()
+        elif event["type"].startswith("project."):
+            cache.projects_cache.invalidate()
+        with self._lock:
+            self._buffer.append(event)
+            subscribers = [s for s in self._subscribers if s.wants(event)]
+        if subscribers and self._loop is not None:
+            self._loop.call_soon_threadsafe(self._deliver, subscribers, event)
+
+    def _reset_all(self) -> None:
+        with self._lock:
+            self._buffer.clear()
+            subscribers = list(self._subscribers)
+        if subscribers and self._loop is not None:
+            self._loop.call_soon_threadsafe(self._deliver, subscribers, _RESET)
+
+    def drain(self) -> None:
+        """すべての購読を終わらせる（シャットダウンで接続が閉じるのを待たせない）
+
+        クライアントは Last-Event-ID で別のワーカー・プロセスに再接続する。
+        """
+        with self._lock:
+            subscribers = list(self._subscribers)
+        if subscribers and self._loop is not None:
+            self._loop.call_soon_threadsafe(self._close, subscribers)
+
+    @staticmethod
+    def _close(subscribers: list[Subscription]) -> None:
+        for sub in subscribers:
+            sub.overflowed = True
+            try:
+                sub.queue.put_nowait(_CLOSE)
+            except asyncio.QueueFull:
+                pass
+
+    @staticmethod
+    def _deliver(subscribers: list[Subscription], event: dict[str, Any]) -> None:
+        for sub in subscribers:
+            try:
+                sub.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                sub.overflowed = True
+
+    def subscribe(
+        self, board_id: str | None, project_id: str | None, last_event_id: int | None
+    ) -> tuple[Subscription, list[dict[str, Any]] | None]:
+        """購読を登録し、last_event_id より後のイベントを返す（バッファに無ければ None）"""
+        sub = Subscription(board_id, project_id)
+        with self._lock:
+            self._subscribers.add(sub)
+            if last_event_id is None:
+                return sub, []
+            ids = [event["id"] for event in self._buffer]
+            if last_event_id not in ids:
+                return sub, None
+            replay = list(self._buffer)[ids.index(last_event_id) + 1:]
+        return sub, [event for event in replay if sub.wants(event)]
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        with self._lock:
+            self._subscribers.discard(sub)
+
+    def latest_id(self) -> int | None:
+        with self._lock:
+            return self._buffer[-1]["id"] if self._buffer else None
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {"subscribers": len(self._subscribers), "buffered": len(self._buffer)}
+
+
+broker = EventBroker()
+
+
+def _format(event: dict[str, Any]) -> str:
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event, separators=(',', ':'))}\n\n"
+
+
+def _format_reset() -> str:
+    # 全件を取り直した後はこの位置から再開すればよい
+    latest = broker.latest_id()
+    return (f"id: {latest}\n" if latest is not None else "") + "event: reset\ndata: {}\n\n"
+
+
+async def stream_events(board_id: str | None, project_id: str | None, last_event_id: int | None) -> AsyncIterator[str]:
+    sub, replay = broker.subscribe(board_id, project_id, last_event_id)
+    try:
+        yield f"retry: {int(RECONNECT_DELAY * 1000)}\n\n"
+        if replay is None:
+            yield _format_reset()
+        else:
+            for event in replay:
+                yield _format(event)
+        # 溢れた購読はキューに残った分を送ってから切断し、続きはクライアントの
+        # 再接続（Last-Event-ID）に任せる
+        while not (sub.overflowed and sub.queue.empty()):
+            try:
+                event = await asyncio.wait_for(sub.queue.get(), HEARTBEAT_INTERVAL)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            if event is _CLOSE:
+                break
+            yield _format_reset() if event is _RESET else _format(event)
+    finally:
+        broker.unsubscribe(sub)
@@ -0,0 +1,242 @@
+"""CSV / NDJSON からのタスク一括インポート
+
+入力を正規化して COPY で一時テーブルに流し込み、プロジェクト・ボードの解決、
+検証、tasks / board_tasks への投入までをすべて集合演算の SQL で行う。
+
+    cd backend && python -m app.importer tasks.csv
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import io
+import json
+from collections.abc import Iterable, Iterator
+from typing import Any, Literal
+
+import psycopg2.errors
+from pydantic import BaseModel
+
+from app.database import get_conn, pool
+from app.events import publish
+from app.ordering import POSITION_GAP
+from app.versions import bump_versions
+
+MAX_REPORTED_ERRORS = 1000
+
+IMPORT_COLUMNS = (
+    "title", "description", "project", "board",
+    "scheduled_start", "scheduled_end", "completed_at", "archived_at",
+)
+
+
+class ImportRowError(BaseModel):
+    line: int
+    error: str
+
+
+class ImportSummary(BaseModel):
+    total: int
+    imported: int
+    failed: int
+    errors: list[ImportRowError]  # 先頭 MAX_REPORTED_ERRORS 件
+
+
+class _CopySource(io.TextIOBase):
+    """文字列のイテレータを COPY FROM STDIN に渡せるファイルとして読ませる
+
+    読み込み中の例外は psycopg2 が QueryCanceled に置き換えるので、error に残しておく。
+    """
+
+    def __init__(self, chunks: Iterator[str]) -> None:
+        self._chunks = chunks
+        self._buf = ""
+        self.error: Exception | None = None
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> str:
+        while size < 0 or len(self._buf) < size:
+            try:
+                chunk = next(self._chunks, None)
+            except Exception as e:
+                self.error = e
+                raise
+            if chunk is None:
+                break
+            self._buf += chunk
+        if size < 0:
+            data, self._buf = self._buf, ""
+        else:
+            data, self._buf = self._buf[:size], self._buf[size:]
+        return data
+
+
+def _records(lines: Iterable[str], format: Literal["csv", "ndjson"]) -> Iterator[tuple[int, dict[str, Any] | None]]:
+    if format == "csv":
+        reader = csv.DictReader(lines)
+        for record in reader:
+            yield reader.line_num, record
+    else:
+        for line_no, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = None
+            yield line_no, record if isinstance(record, dict) else None
+
+
+def _copy_rows(lines: Iterable[str], format: Literal["csv", "ndjson"]) -> Iterator[str]:
+    """入力を (line_no, parse_error, IMPORT_COLUMNS...) の CSV に正規化して少しずつ返す"""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    for n, (line_no, record) in enumerate(_records(lines, format), start=1):
+        if record is None:
+            writer.writerow([line_no, "Invalid JSON object", *[""] * len(IMPORT_COLUMNS)])
+        else:
+            # 空文字は COPY で NULL になる（0 や false は値として残す）
+            values = [
+                "" if record.get(column) is None else str(record[column]).strip()
+                for column in IMPORT_COLUMNS
+            ]
+            writer.writerow([line_no, "", *values])
+        if n % 1000 == 0:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue()
+
+
+def import_tasks(lines: Iterable[str], format: Literal["csv", "ndjson"] = "csv") -> ImportSummary:
+    """タスクを取り込む。エラーのある行はスキップし、残りを 1 トランザクションで投入する"""
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute(f"""
+            CREATE TEMP TABLE import_rows (
+                line_no INTEGER NOT NULL,
+                parse_error TEXT,
+                {", ".join(f"{column} TEXT" for column in IMPORT_COLUMNS)},
+                task_id UUID NOT NULL DEFAULT gen_random_uuid(),
+                project_id UUID,
+                board_id UUID,
+                error TEXT
+            ) ON COMMIT DROP
+        """)
+        source = _CopySource(_copy_rows(lines, format))
+        try:
+            cur.copy_expert(
+                f"COPY import_rows (line_no, parse_error, {', '.join(IMPORT_COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+                source,
+            )
+        except psycopg2.errors.QueryCanceled:
+            # 入力のデコードの失敗などは元の例外で返す
+            if source.error is not None:
+                raise source.error from None
+            raise
+
+        # プロジェクトは短縮名または名前、ボードはラベルで解決（重複する名前は 1 回だけ引く）
+        cur.execute("""
+            UPDATE import_rows r SET project_id = m.id
+            FROM (
+                SELECT DISTINCT ON (n.project) n.project, p.id
+                FROM (SELECT DISTINCT project FROM import_rows WHERE project IS NOT NULL) n
+                JOIN projects p ON p.short_name = n.project OR p.name = n.project
+                ORDER BY n.project, (p.short_name = n.project) DESC, p.sort_order
+            ) m
+            WHERE r.project = m.project
+        """)
+        cur.execute("""
+            UPDATE import_rows r SET board_id = m.id
+            FROM (
+                SELECT DISTINCT ON (n.board) n.board, b.id
+                FROM (SELECT DISTINCT board FROM import_rows WHERE board IS NOT NULL) n
+                JOIN boards b ON b.label = n.board
+                ORDER BY n.board, b.position
+            ) m
+            WHERE r.board = m.board
+        """)
+        cur.execute("""
+            UPDATE import_rows SET error = CASE
+                WHEN parse_error IS NOT NULL THEN parse_error
+                WHEN title IS NULL THEN 'title is required'
+                WHEN length(title) > 255 THEN 'title is too long'
+                WHEN project IS NOT NULL AND project_id IS NULL THEN 'Project ''' || project || ''' not found'
+                WHEN board IS NOT NULL AND board_id IS NULL THEN 'Board ''' || board || ''' not found'
+                WHEN NOT pg_input_is_valid(COALESCE(scheduled_start, '-infinity'), 'date') THEN 'Invalid scheduled_start'
+                WHEN NOT pg_input_is_valid(COALESCE(scheduled_end, '-infinity'), 'date') THEN 'Invalid scheduled_end'
+                WHEN NOT pg_input_is_valid(COALESCE(completed_at, 'now'), 'timestamptz') THEN 'Invalid completed_at'
+                WHEN NOT pg_input_is_valid(COALESCE(archived_at, 'now'), 'timestamptz') THEN 'Invalid archived_at'
+            END
+        """)
+
+        cur.execute("""
+            INSERT INTO tasks (id, title, description, project_id,
+                               scheduled_start, scheduled_end, completed_at, archived_at)
+            SELECT task_id, title, description, project_id,
+                   scheduled_start::date, scheduled_end::date,
+                   completed_at::timestamptz, archived_at::timestamptz
+            FROM import_rows
+            WHERE error IS NULL
+            ORDER BY line_no
+        """)
+        imported = cur.rowcount
+
+        # ボードごとに既存の末尾から行順に並べる。同時に同じボードへ追加・移動して
+        # 同じキーにならないよう、末尾を読む前に並びを id 順にロックする
+        cur.execute("""
+            SELECT board_id FROM board_task_order
+            WHERE board_id IN (SELECT board_id FROM import_rows WHERE error IS NULL)
+            ORDER BY board_id
+            FOR UPDATE
+        """)
+        cur.execute("""
+            INSERT INTO board_tasks (board_id, task_id, position)
+            SELECT r.board_id, r.task_id,
+                   COALESCE(tail.max_position, 0)
+                       + row_number() OVER (PARTITION BY r.board_id ORDER BY r.line_no) * %s
+            FROM import_rows r
+            LEFT JOIN (
+                SELECT n.board_id,
+                       (SELECT MAX(bt.position) FROM board_tasks bt WHERE bt.board_id = n.board_id) AS max_position
+                FROM (SELECT DISTINCT board_id FROM import_rows WHERE board_id IS NOT NULL) n
+            ) tail ON tail.board_id = r.board_id
+            WHERE r.error IS NULL AND r.board_id IS NOT NULL
+        """, (POSITION_GAP,))
+
+        cur.execute("""
+            SELECT COUNT(*) AS total, COUNT(error) AS failed FROM import_rows
+        """)
+        counts = cur.fetchone()
+        cur.execute(
+            "SELECT line_no, error FROM import_rows WHERE error IS NOT NULL ORDER BY line_no LIMIT %s",
+            (MAX_REPORTED_ERRORS,),
+        )
+        errors = [ImportRowError(line=row["line_no"], error=row["error"]) for row in cur.fetchall()]
+        publish(cur, "tasks.imported", {"imported": imported})
+        bump_versions(cur, "tasks")
+        conn.commit()
+
+    return ImportSummary(total=counts["total"], imported=imported, failed=counts["failed"], errors=errors)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="CSV / NDJSON からタスクをインポートする")
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=["csv", "ndjson"], help="省略時は拡張子から判定")
+    args = parser.parse_args()
+
+    format = args.format or ("ndjson" if args.path.endswith((".ndjson", ".jsonl")) else "csv")
+    pool.open()
+    try:
+        with open(args.path, encoding="utf-8-sig", newline="") as f:
+            summary = import_tasks(f, format)
+    finally:
+        pool.close()
+    print(summary.model_dump_json(indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,198 @@
-from fastapi import FastAPI
+import asyncio
+import logging
+import os
+import time
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
+import anyio.to_thread
+import psycopg2
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+
+from app import cache
+from app.cache import cache_stats
+from app.database import THREADPOOL_SIZE, PoolTimeout, pool
+from app.events import broker, stream_events
+from app.metrics import MetricsMiddleware, render
+from app.pagination import NEXT_CURSOR_HEADER
+from app.replicas import LSN_HEADER, ReadYourWritesMiddleware, close_replicas, open_replicas, replica_stats
+from app.rollups import refresher
+from app.routers import board_state, boards, bulk, projects, reports, search, sync, tasks, timers
+from app.serve import draining
+from app.versions import VersionConflict
+
+logger = logging.getLogger(__name__)
+
+# /api/ready が DB の応答をこの時間まで待つ（超えたら準備できていないとみなす）
+READY_TIMEOUT = float(os.environ.get("READY_TIMEOUT", "1"))
+
+# 起動時に事前接続した各接続で実行しておく、よく使うテーブル・索引に触れるクエリ
+WARMUP_SQL = [
+    "SELECT resource, version FROM resource_version_totals",
+    "SELECT id, label, color, position, version FROM boards ORDER BY position, id LIMIT 1",
+    "SELECT id, name, short_name, color FROM projects ORDER BY sort_order LIMIT 1",
+    """
+    SELECT t.id, bt.position, tt.total_seconds, p.name
+    FROM board_tasks bt
+    JOIN tasks t ON t.id = bt.task_id
+    LEFT JOIN task_time_totals tt ON tt.task_id = t.id
+    LEFT JOIN projects p ON p.id = t.project_id
+    WHERE t.archived_at IS NULL
+    ORDER BY bt.board_id, bt.position, bt.task_id
+    LIMIT 1
+    """,
+    "SELECT id FROM tasks WHERE archived_at IS NULL ORDER BY created_at DESC, id DESC LIMIT 1",
+]
+
+
+def warm_up() -> None:
+    open_replicas()
+    pool.open()
+    pool.warm(WARMUP_SQL)
+    cache.boards_cache.get()
+    cache.projects_cache.get()
+
 
-from app.routers import boards, projects, tasks
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    anyio.to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_SIZE
+    try:
+        await anyio.to_thread.run_sync(warm_up)
+    except psycopg2.OperationalError:
+        # DB がまだ起動していない場合は最初のリクエストで接続する
+        logger.warning("Could not pre-connect database pool", exc_info=True)
+    broker.start(asyncio.get_running_loop())
+    refresher.start()
+    try:
+        yield
+    finally:
+        refresher.stop()
+        broker.stop()
+        pool.close()
+        close_replicas()
 
-app = FastAPI(title="TaskTimer API")
+
+app = FastAPI(title="TaskTimer API", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, "ETag", "Server-Timing", LSN_HEADER],
 )
+app.add_middleware(ReadYourWritesMiddleware)
+# CORS の後に追加して外側に置き、ミドルウェアを含めた時間を計る
+app.add_middleware(MetricsMiddleware)
 
+app.include_router(board_state.router)
 app.include_router(boards.router)
+app.include_router(bulk.router)
 app.include_router(projects.router)
+app.include_router(reports.router)
+app.include_router(search.router)
+app.include_router(sync.router)
 app.include_router(tasks.router)
+app.include_router(timers.router)
+
+
+@app.exception_handler(PoolTimeout)
+def pool_timeout_handler(request: Request, exc: PoolTimeout) -> JSONResponse:
+    return JSONResponse(status_code=503, content={"detail": str(exc)})
+
+
+@app.exception_handler(VersionConflict)
+def version_conflict_handler(request: Request, exc: VersionConflict) -> JSONResponse:
+    # クライアントが取り直さずにマージ・再送できるよう、現在の状態を付けて返す
+    return JSONResponse(
+        status_code=409,
+        content={"detail": str(exc), "current": exc.current().model_dump(mode="json")},
+    )
 
 
 @app.get("/api/health")
-def health() -> dict[str, str]:
+async def health() -> dict[str, str]:
+    """プロセスが応答するか（DB は確認しない。死活監視用）"""
     return {"status": "ok"}
+
+
+@app.get("/api/ready")
+def ready() -> JSONResponse:
+    """リクエストを受けられるか（ロードバランサーの振り分け用）
+
+    DB に READY_TIMEOUT 秒以内に接続・応答できなければ、またはシャットダウン中なら 503 を返す。
+    """
+    if draining.is_set():
+        return JSONResponse(status_code=503, content={"status": "draining"})
+    started = time.perf_counter()
+    try:
+        with pool.connection(timeout=READY_TIMEOUT) as conn, conn.cursor() as cur:
+            cur.execute("SET LOCAL statement_timeout = %s", (int(READY_TIMEOUT * 1000),))
+            cur.execute("SELECT 1")
+    except (PoolTimeout, psycopg2.Error) as exc:
+        return JSONResponse(status_code=503, content={"status": "unavailable", "detail": str(exc).strip()})
+    latency_ms = round((time.perf_counter() - started) * 1000, 3)
+    status = 200 if latency_ms <= READY_TIMEOUT * 1000 else 503
+    return JSONResponse(
+        status_code=status,
+        content={"status": "ready" if status == 200 else "slow", "db_latency_ms": latency_ms},
+    )
+
+
+@app.get("/api/health/pool")
+async def pool_stats() -> dict[str, float | int]:
+    return pool.stats()
+
+
+@app.get("/api/health/replicas")
+async def replica_health() -> dict[str, dict[str, float | int]]:
+    return replica_stats()
+
+
+@app.get("/api/health/cache")
+async def cache_health() -> dict[str, dict[str, int]]:
+    return cache_stats()
+
+
+@app.get("/api/health/events")
+async def event_stats() -> dict[str, int]:
+    return broker.stats()
+
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics() -> PlainTextResponse:
+    """Prometheus 形式のメトリクス（このプロセスの値）"""
+    extra = {
+        "tasktimer_db_pool": ("Connection pool stats", pool.stats()),
+        "tasktimer_events": ("Event broker stats", broker.stats()),
+    }
+    for name, stats in replica_stats().items():
+        extra[f"tasktimer_db_{name}_pool"] = (f"Connection pool stats for {name}", stats)
+    for name, stats in cache_stats().items():
+        extra[f"tasktimer_cache_{name}"] = (f"Cache stats for {name}", stats)
+    return PlainTextResponse(render(extra), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/api/events")
+async def events(
+    request: Request,
+    board_id: str | None = None,
+    project_id: str | None = None,
+    last_event_id: int | None = None,
+) -> StreamingResponse:
+    """変更イベントを Server-Sent Events で配信する（board_id / project_id で絞り込み）
+
+    再接続時は Last-Event-ID ヘッダ（EventSource が自動で付ける）かクエリの
+    last_event_id 以降の差分を返す。差分を返せない場合は reset イベントを送るので、
+    クライアントは一覧を取り直す。
+    """
+    header = request.headers.get("last-event-id", "")
+    if header.isdigit():
+        last_event_id = int(header)
+    return StreamingResponse(
+        stream_events(board_id, project_id, last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
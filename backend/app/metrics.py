@@ -0,0 +1,231 @@
+"""リクエスト・クエリの計測と Prometheus 形式での出力（GET /metrics）
+
+MetricsMiddleware がリクエストごとの RequestStats を contextvar に置き、
+database の InstrumentedConnection がそこにクエリ数・時間と接続の取得待ち時間を
+加算する（同期ハンドラのスレッドにも contextvar はコピーされ、同じオブジェクトを指す）。
+SLOW_QUERY_MS 以上かかったクエリは正規化した SQL をログに出す。
+
+SERVER_TIMING=1 のときは、レスポンスに Server-Timing ヘッダ（app / db / pool）を付ける。
+値はプロセスごとに集計する（複数ワーカーではワーカーごとの値になる）。
+"""
+
+from __future__ import annotations
+
+import bisect
+import contextvars
+import logging
+import os
+import re
+import threading
+import time
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+SLOW_QUERY_MS = float(os.environ.get("SLOW_QUERY_MS", "200"))
+SERVER_TIMING = os.environ.get("SERVER_TIMING", "").lower() in ("1", "true", "yes")
+
+# 秒
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50, 100)
+
+
+@dataclass
+class RequestStats:
+    queries: int = 0
+    query_seconds: float = 0.0
+    acquire_seconds: float = 0.0
+
+
+_request_stats: contextvars.ContextVar[RequestStats | None] = contextvars.ContextVar("request_stats", default=None)
+
+
+class Histogram:
+    """ラベルごとの累積ヒストグラム"""
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = (), buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        # ラベル値 -> (バケットごとの件数（最後は +Inf）, [合計])
+        self._series: dict[tuple[str, ...], tuple[list[int], list[float]]] = {}
+
+    def observe(self, value: float, *label_values: str) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = ([0] * (len(self.buckets) + 1), [0.0])
+            series[0][index] += 1
+            series[1][0] += value
+
+    def collect(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            series = [(key, list(counts), total[0]) for key, (counts, total) in self._series.items()]
+        for label_values, counts, total in sorted(series):
+            labels = _labels(self.labels, label_values)
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                yield f"{self.name}_bucket{_labels(self.labels, label_values, le=_number(bound))} {cumulative}"
+            cumulative += counts[-1]
+            yield f'{self.name}_bucket{_labels(self.labels, label_values, le="+Inf")} {cumulative}'
+            yield f"{self.name}_sum{labels} {_number(total)}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._lock = threading.Lock()
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, *label_values: str) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def collect(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            values = sorted(self._values.items())
+        for label_values, value in values:
+            yield f"{self.name}{_labels(self.labels, label_values)} {_number(value)}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple[str, ...], values: tuple[str, ...], **extra: str) -> str:
+    pairs = [*zip(names, values), *extra.items()]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in pairs) + "}"
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+REQUEST_DURATION = Histogram(
+    "tasktimer_http_request_duration_seconds", "HTTP request latency", ("method", "route", "status"),
+)
+REQUEST_QUERIES = Histogram(
+    "tasktimer_http_request_db_queries", "Database queries per HTTP request", ("method", "route"), COUNT_BUCKETS,
+)
+REQUEST_DB_SECONDS = Counter(
+    "tasktimer_http_request_db_seconds_total", "Time spent in database queries by route", ("method", "route"),
+)
+QUERY_DURATION = Histogram("tasktimer_db_query_duration_seconds", "Database query latency")
+ACQUIRE_DURATION = Histogram("tasktimer_db_connection_acquire_seconds", "Time waiting for a pooled connection")
+SLOW_QUERIES = Counter("tasktimer_db_slow_queries_total", "Queries slower than SLOW_QUERY_MS")
+
+_METRICS: list[Histogram | Counter] = [
+    REQUEST_DURATION, REQUEST_QUERIES, REQUEST_DB_SECONDS, QUERY_DURATION, ACQUIRE_DURATION, SLOW_QUERIES,
+]
+
+_WHITESPACE = re.compile(r"\s+")
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w$])-?\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LIST = re.compile(r"(?:\?|%s|%\(\w+\)s)(?:\s*,\s*(?:\?|%s|%\(\w+\)s))+")
+
+
+def normalize_sql(sql: str | bytes) -> str:
+    """リテラルを ? に置き換え、空白を詰めたクエリ（ログで同じクエリをまとめられる形）"""
+    if isinstance(sql, bytes):
+        sql = sql.decode("utf-8", "replace")
+    sql = _STRING.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    sql = _PLACEHOLDER_LIST.sub("?, ...", sql)
+    return _WHITESPACE.sub(" ", sql).strip()
+
+
+def record_query(sql: Any, seconds: float) -> None:
+    QUERY_DURATION.observe(seconds)
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.query_seconds += seconds
+    if seconds * 1000 >= SLOW_QUERY_MS:
+        SLOW_QUERIES.inc()
+        logger.warning("slow query (%.1f ms): %s", seconds * 1000, normalize_sql(sql))
+
+
+def record_acquire(seconds: float) -> None:
+    ACQUIRE_DURATION.observe(seconds)
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.acquire_seconds += seconds
+
+
+def _route_of(scope: dict[str, Any]) -> str:
+    """パスのパラメータを含まないルートのテンプレート（ラベルの種類を増やさない）"""
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+class MetricsMiddleware:
+    """ASGI ミドルウェア。レスポンスを送り終えた時点でルートごとの計測値を記録する"""
+
+    def __init__(self, app: Callable[..., Any]) -> None:
+        self.app = app
+
+    async def __call__(self, scope: dict[str, Any], receive: Callable[..., Any], send: Callable[..., Any]) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message: dict[str, Any]) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if SERVER_TIMING:
+                    elapsed = time.perf_counter() - started
+                    timing = (
+                        f'app;dur={elapsed * 1000:.1f}, '
+                        f'db;dur={stats.query_seconds * 1000:.1f};desc="{stats.queries} queries", '
+                        f'pool;dur={stats.acquire_seconds * 1000:.1f}'
+                    )
+                    message["headers"] = [*message.get("headers", []), (b"server-timing", timing.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_stats.reset(token)
+            elapsed = time.perf_counter() - started
+            method, route = scope["method"], _route_of(scope)
+            REQUEST_DURATION.observe(elapsed, method, route, str(status))
+            REQUEST_QUERIES.observe(stats.queries, method, route)
+            REQUEST_DB_SECONDS.inc(stats.query_seconds, method, route)
+
+
+def _gauges(name: str, help: str, values: dict[str, float | int]) -> Iterable[str]:
+    yield f"# HELP {name} {help}"
+    yield f"# TYPE {name} gauge"
+    for key, value in sorted(values.items()):
+        yield f'{name}{{stat="{key}"}} {_number(value)}'
+
+
+def render(extra: dict[str, tuple[str, dict[str, float | int]]] | None = None) -> str:
+    """Prometheus のテキスト形式。extra は {名前: (説明, {stat: 値})} の gauge"""
+    lines: list[str] = []
+    for metric in _METRICS:
+        lines.extend(metric.collect())
+    for name, (help, values) in (extra or {}).items():
+        lines.extend(_gauges(name, help, values))
+    return "\n".join(lines) + "\n"
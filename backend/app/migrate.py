@@ -0,0 +1,211 @@
+"""db/*.sql をファイル名順に適用するマイグレーションランナー
+
+    cd backend && python -m app.migrate            # 未適用のものを適用
+    cd backend && python -m app.migrate --status   # 適用状況を表示
+    cd backend && python -m app.migrate --baseline 009_time_entries.sql
+
+適用済みのファイルは schema_migrations に記録し、各ファイルは 1 トランザクションで
+適用する（失敗したファイル以降は適用しない）。複数のプロセスが同時に起動しても
+advisory lock で 1 つずつ実行される。
+
+1 行目が "-- migrate:no-transaction" のファイルはトランザクションを張らずに文ごとに
+実行する（CREATE INDEX CONCURRENTLY など、トランザクション内で実行できない文のため）。
+文は行末の ; で区切るので、関数定義のような $$ を含む文は書かないこと。途中で失敗すると
+それまでの文は残るので、再実行できるよう IF NOT EXISTS などで書いておく。
+
+docker-entrypoint-initdb.d で初期化された既存の DB には schema_migrations が無い。
+初期化時に入っていた最後のファイルを --baseline で指定し、そこまでを適用済みとして
+記録してから実行すること（それ以降のファイルだけが適用される）。
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import logging
+import re
+import sys
+import time
+from pathlib import Path
+
+import psycopg2
+import psycopg2.extensions
+
+from app.database import DATABASE_URL
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = Path(__file__).resolve().parent.parent / "db"
+_LOCK_KEY = "tasktimer_migrate"
+NO_TRANSACTION_MARKER = "-- migrate:no-transaction"
+
+
+class MigrationError(Exception):
+    """マイグレーションを適用できなかった"""
+
+
+def _migration_files(directory: Path = MIGRATIONS_DIR) -> list[Path]:
+    return sorted(directory.glob("*.sql"))
+
+
+def _checksum(path: Path) -> str:
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+def _statements(sql: str) -> list[str]:
+    """行末の ; で文に分ける（コメントだけの断片は除く）"""
+    statements = []
+    for chunk in re.split(r";[ \t]*$", sql, flags=re.MULTILINE):
+        code = [line for line in chunk.splitlines() if line.strip() and not line.strip().startswith("--")]
+        if code:
+            statements.append(chunk.strip())
+    return statements
+
+
+def _apply(conn: psycopg2.extensions.connection, cur: psycopg2.extensions.cursor, sql: str) -> None:
+    if not sql.startswith(NO_TRANSACTION_MARKER):
+        cur.execute(sql)
+        return
+    # 各文をそれぞれ自動コミットで実行する（1 回の execute に複数の文を渡すと
+    # 暗黙のトランザクションになり、CONCURRENTLY が使えない）
+    conn.autocommit = True
+    try:
+        for statement in _statements(sql):
+            cur.execute(statement)
+    finally:
+        conn.autocommit = False
+
+
+def _connect(wait: float) -> psycopg2.extensions.connection:
+    """DB の起動を wait 秒まで待って接続する"""
+    deadline = time.monotonic() + wait
+    while True:
+        try:
+            conn = psycopg2.connect(DATABASE_URL)
+            conn.set_client_encoding("UTF8")
+            return conn
+        except psycopg2.OperationalError:
+            if time.monotonic() >= deadline:
+                raise
+            time.sleep(1.0)
+
+
+def _ensure_table(cur: psycopg2.extensions.cursor) -> bool:
+    """schema_migrations を作成し、今回作成したかを返す"""
+    cur.execute("SELECT to_regclass('schema_migrations') IS NOT NULL")
+    if cur.fetchone()[0]:
+        return False
+    cur.execute("""
+        CREATE TABLE schema_migrations (
+            version TEXT PRIMARY KEY,
+            checksum TEXT NOT NULL,
+            applied_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    return True
+
+
+def _applied(cur: psycopg2.extensions.cursor) -> dict[str, str]:
+    cur.execute("SELECT version, checksum FROM schema_migrations")
+    return dict(cur.fetchall())
+
+
+def migrate(
+    baseline: str | None = None,
+    directory: Path = MIGRATIONS_DIR,
+    wait: float = 30.0,
+) -> list[str]:
+    """未適用のマイグレーションを適用し、適用したファイル名を返す"""
+    files = _migration_files(directory)
+    if baseline is not None and baseline not in {path.name for path in files}:
+        raise MigrationError(f"Unknown baseline migration: {baseline}")
+
+    conn = _connect(wait)
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_advisory_lock(hashtext(%s))", (_LOCK_KEY,))
+            created = _ensure_table(cur)
+            if created and baseline is None:
+                cur.execute("SELECT to_regclass('tasks') IS NOT NULL")
+                if cur.fetchone()[0]:
+                    conn.rollback()
+                    raise MigrationError(
+                        "Database was initialized without schema_migrations; "
+                        "rerun with --baseline <last migration it was created with>"
+                    )
+            if baseline is not None:
+                cur.executemany(
+                    "INSERT INTO schema_migrations (version, checksum) VALUES (%s, %s) ON CONFLICT DO NOTHING",
+                    [(path.name, _checksum(path)) for path in files if path.name <= baseline],
+                )
+            conn.commit()
+
+            applied = _applied(cur)
+            conn.commit()
+            done: list[str] = []
+            for path in files:
+                checksum = _checksum(path)
+                if path.name in applied:
+                    if applied[path.name] != checksum:
+                        logger.warning("%s changed after it was applied; not reapplying", path.name)
+                    continue
+                logger.info("Applying %s", path.name)
+                try:
+                    _apply(conn, cur, path.read_text(encoding="utf-8"))
+                    cur.execute(
+                        "INSERT INTO schema_migrations (version, checksum) VALUES (%s, %s)",
+                        (path.name, checksum),
+                    )
+                    conn.commit()
+                except psycopg2.Error as exc:
+                    conn.rollback()
+                    raise MigrationError(f"{path.name}: {exc}") from exc
+                done.append(path.name)
+            return done
+    finally:
+        conn.close()
+
+
+def status(directory: Path = MIGRATIONS_DIR, wait: float = 30.0) -> list[tuple[str, str]]:
+    """(ファイル名, applied / pending / changed) の一覧"""
+    conn = _connect(wait)
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT to_regclass('schema_migrations') IS NOT NULL")
+            applied = _applied(cur) if cur.fetchone()[0] else {}
+    finally:
+        conn.close()
+    result = []
+    for path in _migration_files(directory):
+        if path.name not in applied:
+            state = "pending"
+        elif applied[path.name] != _checksum(path):
+            state = "changed"
+        else:
+            state = "applied"
+        result.append((path.name, state))
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--baseline", help="このファイルまでを適用済みとして記録する")
+    parser.add_argument("--status", action="store_true", help="適用状況を表示して終了")
+    parser.add_argument("--wait", type=float, default=30.0, help="DB の起動を待つ秒数")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    if args.status:
+        for name, state in status(wait=args.wait):
+            print(f"{state:>8}  {name}")
+        return
+    try:
+        done = migrate(args.baseline, wait=args.wait)
+    except MigrationError as exc:
+        print(f"migration failed: {exc}", file=sys.stderr)
+        sys.exit(1)
+    print(f"applied {len(done)} migrations")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""並び順キーの計算
+
+boards / board_tasks の position は疎な浮動小数キーで、隣り合うキーの中点を
+割り当てることで移動した行だけを書き換える。API 上の sort_order は
+これまでどおり 0 始まりの表示順（インデックス）。
+"""
+
+POSITION_GAP = 1024.0
+
+
+def position_between(before: float | None, after: float | None) -> float | None:
+    """before と after の間に置くキーを返す。間に表現できる値がなければ None（要再採番）"""
+    if before is None and after is None:
+        return POSITION_GAP
+    if before is None:
+        return after - POSITION_GAP
+    if after is None:
+        return before + POSITION_GAP
+    mid = (before + after) / 2
+    if before < mid < after:
+        return mid
+    return None
+
+
+def _increasing_subsequence(values: list[float | None]) -> set[int]:
+    """values の None 以外から、狭義単調増加で最長の部分列の添字を返す"""
+    tails: list[int] = []  # 長さ k+1 の部分列のうち末尾の値が最小のものの末尾の添字
+    parents: dict[int, int | None] = {}
+    for i, value in enumerate(values):
+        if value is None:
+            continue
+        lo, hi = 0, len(tails)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if values[tails[mid]] < value:
+                lo = mid + 1
+            else:
+                hi = mid
+        parents[i] = tails[lo - 1] if lo > 0 else None
+        if lo == len(tails):
+            tails.append(i)
+        else:
+            tails[lo] = i
+    result: set[int] = set()
+    index = tails[-1] if tails else None
+    while index is not None:
+        result.add(index)
+        index = parents[index]
+    return result
+
+
+def positions_for_order(current: list[float | None]) -> list[float]:
+    """新しい並びの各行の現在のキー（新たに加わる行は None）から、新しいキーを決める
+
+    並びが崩れていない最長の行はキーをそのまま使い、残りの行だけを前後のキーの間に
+    割り当てる（書き換える行を最小にする）。間に表現できる値がなければ全行を
+    POSITION_GAP 間隔で振り直す。
+    """
+    fixed = _increasing_subsequence(current)
+    positions: list[float] = []
+    run: list[int] = []  # 直前の固定行より後ろで、まだキーを決めていない行
+
+    def fill(upper: float | None) -> bool:
+        lower = positions[-1] if positions else None
+        if lower is None and upper is None:
+            new = [POSITION_GAP * (i + 1) for i in range(len(run))]
+        elif lower is None:
+            new = [upper - POSITION_GAP * (len(run) - i) for i in range(len(run))]
+        elif upper is None:
+            new = [lower + POSITION_GAP * (i + 1) for i in range(len(run))]
+        else:
+            step = (upper - lower) / (len(run) + 1)
+            new = [lower + step * (i + 1) for i in range(len(run))]
+            if not all(a < b for a, b in zip([lower, *new], [*new, upper])):
+                return False
+        positions.extend(new)
+        run.clear()
+        return True
+
+    for i, value in enumerate(current):
+        if i in fixed:
+            if not fill(value):
+                return [POSITION_GAP * (n + 1) for n in range(len(current))]
+            positions.append(value)
+        else:
+            run.append(i)
+    fill(None)
+    return positions
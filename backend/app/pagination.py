@@ -0,0 +1,71 @@
+"""キーセット（カーソル）ページネーション
+
+カーソルは最後に返した行の並び順キーを JSON にして base64url で包んだもの。
+次ページは OFFSET ではなく「キーがカーソルより後ろ」の条件で取得するので、
+何ページ目でもインデックスを辿る量は一定になる。
+"""
+
+from __future__ import annotations
+
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any
+from uuid import UUID
+
+from fastapi import HTTPException, Response
+
+MAX_PAGE_SIZE = 1000
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(*values: Any) -> str:
+    raw = json.dumps(values, default=str, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _valid_key(value: Any, kind: type) -> bool:
+    if kind is int:
+        return isinstance(value, int) and not isinstance(value, bool)
+    if kind is float:
+        return isinstance(value, (int, float)) and not isinstance(value, bool)
+    if not isinstance(value, str):
+        return False
+    try:
+        if kind is UUID:
+            UUID(value)
+        elif kind is datetime and value not in ("infinity", "-infinity"):
+            datetime.fromisoformat(value)
+    except ValueError:
+        return False
+    return True
+
+
+def decode_cursor(cursor: str, *kinds: type) -> list[Any]:
+    """カーソルを並び順キーの列に戻す
+
+    kinds は各キーの型（int / float / UUID / datetime）。SQL 側で ::uuid や ::timestamptz に
+    キャストされる前に形を確かめ、壊れたカーソルは 500 ではなく 400 にする。
+    UUID と datetime は文字列のまま返す（datetime は '-infinity' も受け付ける）。
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (ValueError, binascii.Error):
+        raise HTTPException(status_code=400, detail="Invalid cursor") from None
+    if (
+        not isinstance(values, list)
+        or len(values) != len(kinds)
+        or not all(_valid_key(value, kind) for value, kind in zip(values, kinds))
+    ):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+
+def paginate(rows: list[Any], limit: int | None, response: Response, cursor_of: Any) -> list[Any]:
+    """limit + 1 件取得した rows を limit 件に切り詰め、続きがあれば次カーソルをヘッダに設定する"""
+    if limit is None or len(rows) <= limit:
+        return rows
+    rows = rows[:limit]
+    response.headers[NEXT_CURSOR_HEADER] = encode_cursor(*cursor_of(rows[-1]))
+    return rows
@@ -0,0 +1,33 @@
+"""Postgres で組み立てた JSON をそのまま返すレスポンス
+
+件数の多い一覧は、行ごとに Pydantic モデルを作り、FastAPI がそれを検証して
+エンコードし直す時間がレスポンス時間の大半を占める。一覧系のルートは 1 行を
+SQL で json_build_object(...)::text にして読み（::text にすると psycopg2 が
+JSON を解析しない）、ここで文字列を連結してバイト列のまま返す。
+
+JSON の形はルートの response_model（OpenAPI 用。検証には使われない）と揃えておくこと。
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterable, Sequence
+from typing import Any
+
+from fastapi import Response
+
+
+def raw_json(body: str, response: Response) -> Response:
+    """JSON 文字列をそのまま返す。not_modified() / paginate() が response に付けたヘッダを引き継ぐ"""
+    raw = Response(content=body.encode(), media_type="application/json")
+    for key, value in response.headers.items():
+        if key != "content-length":
+            raw.headers[key] = value
+    return raw
+
+
+def json_rows(rows: Iterable[Sequence[Any]], response: Response) -> Response:
+    """各行の 1 列目（1 行分の JSON 文字列）を配列にして返す
+
+    RealDictCursor は行ごとの辞書の組み立てが重いので、NamedTupleCursor で読んだ行を渡す。
+    """
+    return raw_json("[" + ",".join(row[0] for row in rows) + "]", response)
@@ -0,0 +1,222 @@
+"""読み取り専用レプリカへの GET の振り分けと read-your-writes
+
+DATABASE_REPLICA_URLS（";" 区切りの DSN）を設定すると、read_conn() はレプリカの
+プールから接続を返す（未設定なら get_conn() と同じくプライマリ）。書き込みは常にプライマリ。
+レプリカごとのプールの大きさはプライマリと同じ（DB_POOL_MAX_SIZE）。
+
+書き込んだクライアントが直後の GET で古いデータを読まないよう、ReadYourWritesMiddleware が
+成功した書き込みのレスポンスにプライマリの WAL 位置（LSN）を付ける（X-Commit-LSN ヘッダと
+Cookie）。位置はハンドラの接続でコミットした後、プールに返す前に読む（get_conn()）。次の GET で Cookie か X-Read-After-LSN ヘッダに
+LSN があれば、それを再生済みのレプリカだけを使い、無ければプライマリから読む。
+他のクライアントの書き込み（SSE で知った変更など）はレプリカの遅延の分だけ遅れて見える。
+
+1 リクエスト内の read_conn() と not_modified() は同じ接続先を使う（ETag のバージョンと
+本体を同じサーバーから読み、本体より新しい ETag が付かないようにする）。
+接続できないレプリカは REPLICA_RETRY 秒使わずにプライマリか他のレプリカに回す。
+"""
+
+from __future__ import annotations
+
+import contextvars
+import itertools
+import logging
+import os
+import threading
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any
+
+import psycopg2
+import psycopg2.extensions
+from starlette.requests import cookie_parser
+
+from app.database import ConnectionPool, PoolTimeout, pool, track_commit_position
+
+logger = logging.getLogger(__name__)
+
+REPLICA_URLS = [dsn.strip() for dsn in os.environ.get("DATABASE_REPLICA_URLS", "").split(";") if dsn.strip()]
+# レプリカの接続を待つ秒数（超えたら次のレプリカかプライマリを使う）
+REPLICA_TIMEOUT = float(os.environ.get("DB_REPLICA_TIMEOUT", "1"))
+# 接続できなかったレプリカを使わない秒数
+REPLICA_RETRY = float(os.environ.get("DB_REPLICA_RETRY", "10"))
+
+LSN_HEADER = "X-Commit-LSN"
+READ_AFTER_HEADER = "X-Read-After-LSN"
+LSN_COOKIE = "tasktimer_lsn"
+# Cookie の有効期間（秒）。レプリカの遅延より十分長ければよい
+LSN_COOKIE_MAX_AGE = 300
+
+_SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+# プライマリ（リカバリ中でないサーバー）はすべての書き込みを反映済みとみなす
+_PRIMARY_LSN = 2**64
+
+
+def parse_lsn(value: str | None) -> int | None:
+    """'16/B374D848' 形式の LSN を整数にする（不正な値は None）"""
+    if not value:
+        return None
+    high, sep, low = value.strip().partition("/")
+    try:
+        return (int(high, 16) << 32) + int(low, 16) if sep else None
+    except ValueError:
+        return None
+
+
+class Replica:
+    def __init__(self, index: int, dsn: str) -> None:
+        self.index = index
+        self.pool = ConnectionPool(dsn)
+        # 最後に確認した再生済みの LSN（再生位置は戻らないので、これ以下の要求は確認を省く）
+        self.replayed = 0
+        self.down_until = 0.0
+
+    def mark_down(self) -> None:
+        logger.warning("Replica %d is unavailable; reading from elsewhere for %ss", self.index, REPLICA_RETRY)
+        self.down_until = time.monotonic() + REPLICA_RETRY
+
+    def check_replayed(self, conn: psycopg2.extensions.connection) -> int:
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_is_in_recovery() AS recovery, pg_last_wal_replay_lsn()::text AS lsn")
+            row = cur.fetchone()
+        conn.rollback()
+        replayed = (parse_lsn(row["lsn"]) or 0) if row["recovery"] else _PRIMARY_LSN
+        self.replayed = max(self.replayed, replayed)
+        return self.replayed
+
+
+replicas = [Replica(i, dsn) for i, dsn in enumerate(REPLICA_URLS)]
+_next_replica = itertools.count()
+_next_lock = threading.Lock()
+
+
+@dataclass
+class ReadRouting:
+    """リクエストごとの読み取り先。min_lsn はクライアントが書き込んだ位置"""
+    min_lsn: int | None = None
+    target: ConnectionPool | None = None
+
+
+_routing: contextvars.ContextVar[ReadRouting | None] = contextvars.ContextVar("read_routing", default=None)
+
+
+def _rotation() -> list[Replica]:
+    with _next_lock:
+        start = next(_next_replica) % len(replicas)
+    return replicas[start:] + replicas[:start]
+
+
+def _checkout(min_lsn: int | None) -> tuple[ConnectionPool, psycopg2.extensions.connection]:
+    now = time.monotonic()
+    for replica in _rotation():
+        if replica.down_until > now:
+            continue
+        try:
+            conn = replica.pool.getconn(REPLICA_TIMEOUT)
+        except PoolTimeout:
+            # 接続が埋まっているだけなので、落ちたことにはせず次を試す
+            continue
+        except psycopg2.OperationalError:
+            replica.mark_down()
+            continue
+        if min_lsn is not None and replica.replayed < min_lsn:
+            try:
+                caught_up = replica.check_replayed(conn) >= min_lsn
+            except psycopg2.Error:
+                replica.pool.putconn(conn)
+                replica.mark_down()
+                continue
+            if not caught_up:
+                replica.pool.putconn(conn)
+                continue
+        return replica.pool, conn
+    return pool, pool.getconn()
+
+
+@contextmanager
+def read_conn() -> Iterator[psycopg2.extensions.connection]:
+    """GET 用の接続。レプリカが無い・追いついていないときはプライマリの接続を返す"""
+    if not replicas:
+        with pool.connection() as conn:
+            yield conn
+        return
+    routing = _routing.get()
+    if routing is not None and routing.target is not None:
+        target, conn = routing.target, routing.target.getconn()
+    else:
+        target, conn = _checkout(routing.min_lsn if routing else None)
+        if routing is not None:
+            routing.target = target
+    try:
+        yield conn
+    finally:
+        target.putconn(conn)
+
+
+def open_replicas() -> None:
+    for replica in replicas:
+        try:
+            replica.pool.open()
+        except psycopg2.OperationalError:
+            logger.warning("Could not pre-connect replica %d", replica.index, exc_info=True)
+
+
+def close_replicas() -> None:
+    for replica in replicas:
+        replica.pool.close()
+
+
+def replica_stats() -> dict[str, dict[str, float | int]]:
+    return {
+        f"replica_{replica.index}": {
+            **replica.pool.stats(),
+            "down": int(replica.down_until > time.monotonic()),
+        }
+        for replica in replicas
+    }
+
+
+def _request_lsn(headers: list[tuple[bytes, bytes]]) -> int | None:
+    lsns = []
+    for key, value in headers:
+        if key == READ_AFTER_HEADER.lower().encode():
+            lsns.append(parse_lsn(value.decode("latin-1")))
+        elif key == b"cookie":
+            lsns.append(parse_lsn(cookie_parser(value.decode("latin-1")).get(LSN_COOKIE)))
+    return max((lsn for lsn in lsns if lsn is not None), default=None)
+
+
+class ReadYourWritesMiddleware:
+    """GET にクライアントの書き込み位置を伝え、書き込みのレスポンスに位置を付ける"""
+
+    def __init__(self, app: Callable[..., Any]) -> None:
+        self.app = app
+
+    async def __call__(self, scope: dict[str, Any], receive: Callable[..., Any], send: Callable[..., Any]) -> None:
+        if scope["type"] != "http" or not replicas:
+            await self.app(scope, receive, send)
+            return
+
+        if scope["method"] in _SAFE_METHODS:
+            token = _routing.set(ReadRouting(min_lsn=_request_lsn(scope["headers"])))
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                _routing.reset(token)
+            return
+
+        with track_commit_position() as position:
+            async def send_with_lsn(message: dict[str, Any]) -> None:
+                # 位置はハンドラがコミットした接続で読んだもの（DB に触れなかったリクエストには付けない）
+                lsn = position.lsn
+                if message["type"] == "http.response.start" and message["status"] < 400 and lsn is not None:
+                    cookie = f"{LSN_COOKIE}={lsn}; Max-Age={LSN_COOKIE_MAX_AGE}; Path=/; HttpOnly; SameSite=Lax"
+                    message["headers"] = [
+                        *message.get("headers", []),
+                        (LSN_HEADER.lower().encode(), lsn.encode()),
+                        (b"set-cookie", cookie.encode()),
+                    ]
+                await send(message)
+
+            await self.app(scope, receive, send_with_lsn)
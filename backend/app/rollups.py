@@ -0,0 +1,79 @@
+"""レポート用の日次ロールアップ（report_daily）の再集計
+
+    cd backend && python -m app.rollups
+
+書き込みのトリガーが report_dirty_days に記録した日を、各プロセスの ReportRefresher が
+REPORT_REFRESH_INTERVAL 秒ごとに refresh_report_daily() で集計し直す（レポートの GET は
+読むだけなので、レプリカからも返せる）。レポートへの反映はその分だけ遅れる。
+REPORT_REFRESH_INTERVAL=0 で止め、cron などから python -m app.rollups で実行してもよい。
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+
+import psycopg2
+
+from app.database import get_conn, pool
+
+logger = logging.getLogger(__name__)
+
+REPORT_REFRESH_INTERVAL = float(os.environ.get("REPORT_REFRESH_INTERVAL", "5"))
+# refresh_report_daily() 内の advisory lock と同じキー
+_LOCK_KEY = "refresh_report_daily"
+
+
+def refresh_reports() -> int | None:
+    """集計し直した日数を返す。他のプロセスが集計中なら待たずに None を返す"""
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute("SELECT pg_try_advisory_xact_lock(hashtext(%s)) AS locked", (_LOCK_KEY,))
+        if not cur.fetchone()["locked"]:
+            return None
+        cur.execute("SELECT refresh_report_daily() AS days")
+        days = cur.fetchone()["days"]
+        conn.commit()
+    return days
+
+
+class ReportRefresher:
+    def __init__(self, interval: float = REPORT_REFRESH_INTERVAL) -> None:
+        self._interval = interval
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        if self._interval <= 0:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="report-refresher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self._interval)
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self._interval):
+            try:
+                refresh_reports()
+            except psycopg2.Error:
+                logger.warning("Could not refresh report rollups", exc_info=True)
+
+
+refresher = ReportRefresher()
+
+
+def main() -> None:
+    pool.open()
+    try:
+        print(f"refreshed {refresh_reports() or 0} days")
+    finally:
+        pool.close()
+
+
+if __name__ == "__main__":
+    main()
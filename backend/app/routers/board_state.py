@@ -0,0 +1,90 @@
+from fastapi import APIRouter, Request, Response
+from pydantic import BaseModel
+
+from app.database import get_conn
+from app.rawjson import raw_json
+from app.routers.boards import BoardResponse
+from app.routers.projects import ProjectResponse
+from app.routers.tasks import TaskResponse, UnassignedTaskResponse
+from app.versions import not_modified
+
+router = APIRouter(prefix="/api/board-state", tags=["boards"])
+
+
+class BoardStateResponse(BaseModel):
+    """ボード画面の初期表示に必要なデータ一式"""
+    boards: list[BoardResponse]
+    tasks: dict[str, list[TaskResponse]]  # board_id -> タスク（sort_order順）
+    unassigned: list[UnassignedTaskResponse]
+    projects: list[ProjectResponse]
+
+
+_PROJECT_JSON = """
+    CASE WHEN p.id IS NULL THEN NULL ELSE json_build_object(
+        'id', p.id, 'name', p.name, 'short_name', p.short_name, 'color', p.color
+    ) END
+"""
+
+# 1 文で組み立てるので、全体が同じスナップショットから読まれる
+_BOARD_STATE_SQL = f"""
+    SELECT json_build_object(
+        'boards', COALESCE((
+            SELECT json_agg(json_build_object('id', b.id, 'label', b.label, 'color', b.color, 'version', b.version)
+                            ORDER BY b.position, b.id)
+            FROM boards b
+        ), '[]'::json),
+        'tasks', COALESCE((
+            SELECT json_object_agg(b.id, COALESCE(board_tasks_json.tasks, '[]'::json))
+            FROM boards b
+            LEFT JOIN LATERAL (
+                SELECT json_agg(json_build_object(
+                    'id', t.id, 'title', t.title, 'description', t.description,
+                    'board_id', t.board_id, 'sort_order', t.sort_order,
+                    'scheduled_start', t.scheduled_start, 'scheduled_end', t.scheduled_end,
+                    'completed_at', t.completed_at, 'archived_at', t.archived_at,
+                    'project', {_PROJECT_JSON}, 'tracked_seconds', COALESCE(tt.total_seconds, 0),
+                    'version', t.version
+                ) ORDER BY t.sort_order) AS tasks
+                FROM (
+                    SELECT t.*, bt.board_id,
+                           row_number() OVER (ORDER BY bt.position, bt.task_id) - 1 AS sort_order
+                    FROM board_tasks bt
+                    JOIN tasks t ON t.id = bt.task_id
+                    WHERE bt.board_id = b.id AND t.archived_at IS NULL
+                ) t
+                LEFT JOIN projects p ON t.project_id = p.id
+                LEFT JOIN task_time_totals tt ON tt.task_id = t.id
+            ) board_tasks_json ON true
+        ), '{{}}'::json),
+        'unassigned', COALESCE((
+            SELECT json_agg(json_build_object(
+                'id', t.id, 'title', t.title, 'description', t.description,
+                'scheduled_start', t.scheduled_start, 'scheduled_end', t.scheduled_end,
+                'completed_at', t.completed_at, 'archived_at', t.archived_at,
+                'project', {_PROJECT_JSON}, 'tracked_seconds', COALESCE(tt.total_seconds, 0),
+                'version', t.version
+            ) ORDER BY t.created_at DESC)
+            FROM tasks t
+            LEFT JOIN projects p ON t.project_id = p.id
+            LEFT JOIN task_time_totals tt ON tt.task_id = t.id
+            WHERE t.archived_at IS NULL
+              AND NOT EXISTS (SELECT 1 FROM board_tasks bt WHERE bt.task_id = t.id)
+        ), '[]'::json),
+        'projects', COALESCE((
+            SELECT json_agg(json_build_object(
+                'id', p.id, 'name', p.name, 'short_name', p.short_name, 'color', p.color
+            ) ORDER BY p.sort_order)
+            FROM projects p
+        ), '[]'::json)
+    )::text AS state
+"""
+
+
+@router.get("", response_model=BoardStateResponse)
+def get_board_state(request: Request, response: Response) -> Response:
+    not_modified(request, response, "boards", "projects", "tasks")
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute(_BOARD_STATE_SQL)
+        state = cur.fetchone()["state"]
+    # 組み立て済みの JSON を解析・検証し直さずに返す
+    return raw_json(state, response)
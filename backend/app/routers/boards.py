@@ -1,9 +1,16 @@
 from __future__ import annotations
 
-from fastapi import APIRouter, HTTPException
+from typing import Any
+
+from fastapi import APIRouter, Header, HTTPException, Request, Response
 from pydantic import BaseModel
 
+from app import cache
 from app.database import get_conn
+from app.events import publish
+from app.ordering import POSITION_GAP, position_between, positions_for_order
+from app.replicas import read_conn
+from app.versions import VersionConflict, bump_versions, expected_version, not_modified
 
 router = APIRouter(prefix="/api/boards", tags=["boards"])
 
@@ -12,6 +19,7 @@ class BoardResponse(BaseModel):
     id: str
     label: str
     color: str
+    version: int  # 更新時の If-Match / version に渡す
 
 
 class BoardCreate(BaseModel):
@@ -22,139 +30,334 @@ class BoardCreate(BaseModel):
 class BoardUpdate(BaseModel):
     label: str | None = None
     color: str | None = None
+    version: int | None = None  # 指定すると一致するときだけ更新する（If-Match と同じ）
 
 
 class BoardReorder(BaseModel):
     sort_order: int
+    version: int | None = None
+
+
+class TaskMove(BaseModel):
+    task_id: str
+    sort_order: int  # 移動後の表示順（アーカイブ済みを除いた 0 始まりのインデックス）
+
+
+class TaskOrderUpdate(BaseModel):
+    """ボード内のタスクの並びの一括更新。task_ids か moves のどちらか一方を指定する
+
+    task_ids: アーカイブ済みを除いた並び全体（他のボード・未割り当てのタスクを含めると移動する）
+    moves: 順に適用する移動の列（ドラッグ中の移動をまとめて送る）
+    """
+    version: int  # GET /task-order か前回の更新で受け取ったバージョン
+    task_ids: list[str] | None = None
+    moves: list[TaskMove] | None = None
+
+
+class TaskOrderResponse(BaseModel):
+    board_id: str
+    version: int
+    task_ids: list[str]  # 表示順（アーカイブ済みを除く）
+
+
+def _neighbor_positions(cur: Any, board_id: str, index: int) -> tuple[float | None, float | None]:
+    """ボードを index 番目に置くときの前後のキーを取得（自分自身は除く）"""
+    other_boards = "SELECT position FROM boards WHERE id <> %s ORDER BY position, id"
+    if index <= 0:
+        cur.execute(other_boards + " LIMIT 1", (board_id,))
+        row = cur.fetchone()
+        return None, row["position"] if row else None
+
+    cur.execute(other_boards + " OFFSET %s LIMIT 2", (board_id, index - 1))
+    rows = cur.fetchall()
+    if rows:
+        return rows[0]["position"], rows[1]["position"] if len(rows) > 1 else None
+
+    cur.execute("SELECT MAX(position) AS position FROM boards WHERE id <> %s", (board_id,))
+    return cur.fetchone()["position"], None
+
+
+def _board_conflict(cur: Any, board_id: str) -> VersionConflict:
+    """version が一致しなかったボードの現在の状態（ボードが無ければ 404）"""
+    cur.execute("SELECT id, label, color, version FROM boards WHERE id = %s", (board_id,))
+    row = cur.fetchone()
+    if not row:
+        raise HTTPException(status_code=404, detail="Board not found")
+    board = BoardResponse(**{**row, "id": str(row["id"])})
+    return VersionConflict(lambda: board)
+
+
+def lock_task_order(cur: Any, board_id: str | None, *task_ids: str | None) -> None:
+    """board_id と、task_ids が今あるボードの並びのバージョンの行を id 順にロックする
+
+    タスクを移動する前に呼ぶと、同じボードへの移動が前後のキーを読むところから
+    直列になり、同時にドラッグしても同じキーを選ばない（別のボードへの移動は並行に進む）。
+    移動元の行もトリガーが更新するので、デッドロックしないよう先にまとめてロックする。
+    """
+    cur.execute(
+        """
+        SELECT board_id
+        FROM board_task_order
+        WHERE board_id = %s::uuid
+           OR board_id IN (SELECT board_id FROM board_tasks WHERE task_id = ANY(%s::uuid[]))
+        ORDER BY board_id
+        FOR UPDATE
+        """,
+        (board_id, [task_id for task_id in task_ids if task_id]),
+    )
+
+
+def _position_for_index(cur: Any, board_id: str, index: int) -> float:
+    before, after = _neighbor_positions(cur, board_id, index)
+    position = position_between(before, after)
+    if position is None:
+        # キーの間隔が尽きたら全ボードを等間隔に再採番する
+        cur.execute(
+            """
+            UPDATE boards b
+            SET position = r.rn * %s
+            FROM (SELECT id, row_number() OVER (ORDER BY position, id) AS rn FROM boards) r
+            WHERE b.id = r.id
+            """,
+            (POSITION_GAP,),
+        )
+        before, after = _neighbor_positions(cur, board_id, index)
+        position = position_between(before, after)
+    return position
 
 
 @router.get("")
-def list_boards() -> list[BoardResponse]:
-    with get_conn() as conn, conn.cursor() as cur:
-        cur.execute("SELECT id, label, color FROM boards ORDER BY sort_order")
-        return [
-            BoardResponse(id=str(row["id"]), label=row["label"], color=row["color"])
-            for row in cur.fetchall()
-        ]
+def list_boards(request: Request, response: Response) -> list[BoardResponse]:
+    not_modified(request, response, "boards")
+    return [BoardResponse(**row) for row in cache.boards_cache.get()]
 
 
 @router.post("", status_code=201)
 def create_board(body: BoardCreate) -> BoardResponse:
     with get_conn() as conn, conn.cursor() as cur:
-        # 最大sort_orderを取得
-        cur.execute("SELECT COALESCE(MAX(sort_order), -1) + 1 AS next_order FROM boards")
-        next_order = cur.fetchone()["next_order"]
-
+        # 末尾に追加
         cur.execute(
             """
-            INSERT INTO boards (label, color, sort_order)
-            VALUES (%s, %s, %s)
-            RETURNING id, label, color
+            INSERT INTO boards (label, color, position)
+            SELECT %s, %s, COALESCE(MAX(position), 0) + %s FROM boards
+            RETURNING id, label, color, version
             """,
-            (body.label, body.color, next_order),
+            (body.label, body.color, POSITION_GAP),
         )
         row = cur.fetchone()
+        board = BoardResponse(**{**row, "id": str(row["id"])})
+        publish(cur, "board.created", board.model_dump())
+        bump_versions(cur, "boards")
         conn.commit()
-        return BoardResponse(id=str(row["id"]), label=row["label"], color=row["color"])
+        cache.boards_cache.invalidate()
+        return board
 
 
 @router.patch("/{board_id}")
-def update_board(board_id: str, body: BoardUpdate) -> BoardResponse:
-    update_data = body.model_dump(exclude_unset=True)
+def update_board(board_id: str, body: BoardUpdate, if_match: str | None = Header(None)) -> BoardResponse:
+    expected = expected_version(if_match, body.version)
+    update_data = body.model_dump(exclude_unset=True, exclude={"version"})
     if not update_data:
         raise HTTPException(status_code=400, detail="No fields to update")
 
     set_clause = ", ".join(f"{k} = %s" for k in update_data)
     values = list(update_data.values())
-    values.append(board_id)
+    values.extend([board_id, expected, expected])
 
     with get_conn() as conn, conn.cursor() as cur:
         cur.execute(
-            f"UPDATE boards SET {set_clause} WHERE id = %s RETURNING id, label, color",
+            f"""
+            UPDATE boards SET {set_clause}
+            WHERE id = %s AND (%s::bigint IS NULL OR version = %s)
+            RETURNING id, label, color, version
+            """,
             values,
         )
         row = cur.fetchone()
-        conn.commit()
         if not row:
-            raise HTTPException(status_code=404, detail="Board not found")
-        return BoardResponse(id=str(row["id"]), label=row["label"], color=row["color"])
+            raise _board_conflict(cur, board_id)
+        board = BoardResponse(**{**row, "id": str(row["id"])})
+        publish(cur, "board.updated", board.model_dump())
+        bump_versions(cur, "boards")
+        conn.commit()
+        cache.boards_cache.invalidate()
+        return board
 
 
 @router.delete("/{board_id}", status_code=204, response_model=None)
 def delete_board(board_id: str) -> None:
     with get_conn() as conn, conn.cursor() as cur:
-        # 削除するボードのsort_orderを取得
-        cur.execute("SELECT sort_order FROM boards WHERE id = %s", (board_id,))
-        row = cur.fetchone()
-        if not row:
+        # ボードを削除（board_tasksはCASCADEで自動削除）。キーは疎なので詰め直し不要
+        cur.execute("DELETE FROM boards WHERE id = %s", (board_id,))
+        if cur.rowcount == 0:
             raise HTTPException(status_code=404, detail="Board not found")
+        publish(cur, "board.deleted", {"id": board_id})
+        bump_versions(cur, "boards", "tasks")
+        conn.commit()
+        cache.boards_cache.invalidate()
 
-        deleted_order = row["sort_order"]
 
-        # ボードを削除（board_tasksはCASCADEで自動削除）
-        cur.execute("DELETE FROM boards WHERE id = %s", (board_id,))
+@router.post("/{board_id}/reorder")
+def reorder_board(board_id: str, body: BoardReorder, if_match: str | None = Header(None)) -> BoardResponse:
+    expected = expected_version(if_match, body.version)
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute("SELECT version FROM boards WHERE id = %s FOR UPDATE", (board_id,))
+        current = cur.fetchone()
+        if not current or (expected is not None and current["version"] != expected):
+            raise _board_conflict(cur, board_id)
+
+        # 同時に別のボードを動かして同じキーを選ばないよう、前後のキーを読む前に
+        # ボード一覧のバージョンを上げて行ロックを取る（ボードの書き込みは最後にここを通る）
+        bump_versions(cur, "boards")
 
-        # 削除されたボードより後のボードのsort_orderを-1
+        # 移動先の前後のキーから新しいキーを決める（他のボードは書き換えない）
+        new_position = _position_for_index(cur, board_id, body.sort_order)
         cur.execute(
-            "UPDATE boards SET sort_order = sort_order - 1 WHERE sort_order > %s",
-            (deleted_order,),
+            "UPDATE boards SET position = %s WHERE id = %s RETURNING id, label, color, version",
+            (new_position, board_id),
         )
+        row = cur.fetchone()
+
+        publish(cur, "board.reordered", {"id": board_id, "sort_order": body.sort_order})
         conn.commit()
+        cache.boards_cache.invalidate()
 
+        return BoardResponse(**{**row, "id": str(row["id"])})
 
-@router.post("/{board_id}/reorder")
-def reorder_board(board_id: str, body: BoardReorder) -> BoardResponse:
-    with get_conn() as conn, conn.cursor() as cur:
-        # 現在のボード情報を取得
+
+def _active_task_order(cur: Any, board_id: str) -> list[Any]:
+    cur.execute(
+        """
+        SELECT bt.task_id, bt.position
+        FROM board_tasks bt
+        JOIN tasks t ON t.id = bt.task_id
+        WHERE bt.board_id = %s AND t.archived_at IS NULL
+        ORDER BY bt.position, bt.task_id
+        """,
+        (board_id,),
+    )
+    return cur.fetchall()
+
+
+@router.get("/{board_id}/task-order")
+def get_task_order(board_id: str) -> TaskOrderResponse:
+    with read_conn() as conn, conn.cursor() as cur:
         cur.execute(
-            "SELECT id, label, color, sort_order FROM boards WHERE id = %s",
+            """
+            SELECT COALESCE(o.version, 0) AS version
+            FROM boards b
+            LEFT JOIN board_task_order o ON o.board_id = b.id
+            WHERE b.id = %s
+            """,
             (board_id,),
         )
-        current = cur.fetchone()
-        if not current:
+        row = cur.fetchone()
+        if not row:
             raise HTTPException(status_code=404, detail="Board not found")
+        rows = _active_task_order(cur, board_id)
+    return TaskOrderResponse(board_id=board_id, version=row["version"], task_ids=[str(r["task_id"]) for r in rows])
 
-        old_sort_order = current["sort_order"]
-        new_sort_order = body.sort_order
 
-        if old_sort_order == new_sort_order:
-            return BoardResponse(
-                id=str(current["id"]),
-                label=current["label"],
-                color=current["color"],
+@router.put("/{board_id}/task-order")
+def update_task_order(board_id: str, body: TaskOrderUpdate) -> TaskOrderResponse:
+    """ボード内のタスクの並びを 1 トランザクション・1 回の UPDATE で書き換える
+
+    並びが body.version から変わっていれば 409（クライアントは取り直してからやり直す）。
+    """
+    if (body.task_ids is None) == (body.moves is None):
+        raise HTTPException(status_code=400, detail="Specify either task_ids or moves")
+
+    mentioned = body.task_ids if body.task_ids is not None else [move.task_id for move in body.moves]
+    with get_conn() as conn, conn.cursor() as cur:
+        # このボードと、他のボードから移すタスクの移動元の並びをまとめて id 順にロックして、
+        # 同じボードへの並べ替え・移動を直列にする（移動元はトリガーも更新するので先にロックする）
+        lock_task_order(cur, board_id, *mentioned)
+        cur.execute("SELECT version FROM board_task_order WHERE board_id = %s", (board_id,))
+        row = cur.fetchone()
+        if not row:
+            raise HTTPException(status_code=404, detail="Board not found")
+        if row["version"] != body.version:
+            raise HTTPException(
+                status_code=409,
+                detail=f"Task order has changed (current version {row['version']})",
             )
 
-        if old_sort_order < new_sort_order:
-            # 右に移動: old_sort_order < x <= new_sort_order のボードを -1
+        current = _active_task_order(cur, board_id)
+        positions = {str(r["task_id"]): r["position"] for r in current}
+        order = list(positions)
+        if body.task_ids is not None:
+            if len(set(body.task_ids)) != len(body.task_ids):
+                raise HTTPException(status_code=400, detail="Duplicate task_ids")
+            if not set(order) <= set(body.task_ids):
+                raise HTTPException(status_code=400, detail="task_ids must include every active task on the board")
+            order = list(body.task_ids)
+        else:
+            for move in body.moves:
+                if move.task_id in order:
+                    order.remove(move.task_id)
+                order.insert(max(0, min(move.sort_order, len(order))), move.task_id)
+
+        # ボードの外から加わるタスクの確認（移動元のボードは通知用）
+        incoming = [task_id for task_id in order if task_id not in positions]
+        sources: list[Any] = []
+        if incoming:
             cur.execute(
                 """
-                UPDATE boards
-                SET sort_order = sort_order - 1
-                WHERE sort_order > %s AND sort_order <= %s
+                SELECT t.id, t.project_id, bt.board_id
+                FROM tasks t
+                LEFT JOIN board_tasks bt ON bt.task_id = t.id
+                WHERE t.id = ANY(%s::uuid[]) AND t.archived_at IS NULL
                 """,
-                (old_sort_order, new_sort_order),
+                (incoming,),
             )
-        else:
-            # 左に移動: new_sort_order <= x < old_sort_order のボードを +1
+            sources = cur.fetchall()
+            if len(sources) != len(incoming):
+                raise HTTPException(status_code=400, detail="Unknown or archived task in order")
+
+        new_positions = positions_for_order([positions.get(task_id) for task_id in order])
+        changed = [
+            (task_id, position)
+            for task_id, position in zip(order, new_positions)
+            if positions.get(task_id) != position
+        ]
+        if changed:
+            # 並びが崩れていない行は書き換えず、動いた行だけを 1 文で更新・追加する
             cur.execute(
                 """
-                UPDATE boards
-                SET sort_order = sort_order + 1
-                WHERE sort_order >= %s AND sort_order < %s
+                WITH o AS (
+                    SELECT * FROM unnest(%(task_ids)s::uuid[], %(positions)s::float8[]) AS o(task_id, position)
+                ),
+                moved AS (
+                    UPDATE board_tasks bt
+                    SET board_id = %(board_id)s, position = o.position
+                    FROM o
+                    WHERE bt.task_id = o.task_id
+                    RETURNING bt.task_id
+                )
+                INSERT INTO board_tasks (board_id, task_id, position)
+                SELECT %(board_id)s, o.task_id, o.position
+                FROM o
+                WHERE o.task_id NOT IN (SELECT task_id FROM moved)
                 """,
-                (new_sort_order, old_sort_order),
+                {
+                    "board_id": board_id,
+                    "task_ids": [task_id for task_id, _ in changed],
+                    "positions": [position for _, position in changed],
+                },
             )
-
-        # ボード自体の sort_order を更新
-        cur.execute(
-            "UPDATE boards SET sort_order = %s WHERE id = %s",
-            (new_sort_order, board_id),
-        )
-
+            # tasks.version はボード上の位置の変更でも進める（古い If-Match の PATCH を 409 にする）
+            cur.execute(
+                "UPDATE tasks SET version = version + 1 WHERE id = ANY(%s::uuid[])",
+                ([task_id for task_id, _ in changed],),
+            )
+            cur.execute("SELECT version FROM board_task_order WHERE board_id = %s", (board_id,))
+            version = cur.fetchone()["version"]
+            publish(
+                cur, "tasks.reordered", {"board_id": board_id, "version": version, "task_ids": order},
+                boards=[board_id, *(r["board_id"] for r in sources)],
+            )
+            bump_versions(cur, "tasks")
+        else:
+            version = row["version"]
         conn.commit()
-
-        return BoardResponse(
-            id=str(current["id"]),
-            label=current["label"],
-            color=current["color"],
-        )
+    return TaskOrderResponse(board_id=board_id, version=version, task_ids=order)
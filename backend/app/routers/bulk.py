@@ -0,0 +1,343 @@
+import io
+from collections.abc import AsyncIterator
+from datetime import date
+from typing import Any, Literal
+from uuid import UUID, uuid4
+
+import anyio.from_thread
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from psycopg2.extras import execute_values
+from pydantic import BaseModel, Field
+
+from app.database import get_conn
+from app.events import publish
+from app.importer import ImportSummary, import_tasks
+from app.ordering import POSITION_GAP
+from app.versions import bump_versions
+
+router = APIRouter(prefix="/api/tasks", tags=["tasks"])
+
+MAX_BULK_OPERATIONS = 1000
+MAX_TITLE_LENGTH = 255  # tasks.title VARCHAR(255)
+
+# 操作はこの順に種類ごとにまとめて実行する
+_OP_ORDER = ("create", "update", "complete", "archive", "move", "delete")
+_UPDATABLE_FIELDS = ("title", "description", "scheduled_start", "scheduled_end", "project_id")
+
+
+class BulkOperation(BaseModel):
+    """一括操作の 1 件
+
+    - create: title（必須）, description, scheduled_start, scheduled_end, project_id, board_id
+    - update: task_id と変更するフィールド
+    - complete / archive: task_id, value（False で解除）
+    - move: task_id, board_id（移動先の末尾に追加。None で未割り当てに戻す）
+    - delete: task_id
+    """
+    op: Literal["create", "update", "complete", "archive", "move", "delete"]
+    task_id: str | None = None
+    title: str | None = None
+    description: str | None = None
+    scheduled_start: str | None = None  # ISO date string (YYYY-MM-DD)
+    scheduled_end: str | None = None  # ISO date string (YYYY-MM-DD)
+    project_id: str | None = None
+    board_id: str | None = None
+    value: bool = True
+
+
+class BulkRequest(BaseModel):
+    operations: list[BulkOperation] = Field(max_length=MAX_BULK_OPERATIONS)
+
+
+class BulkItemResult(BaseModel):
+    index: int
+    op: str
+    task_id: str | None
+    status: Literal["ok", "error"]
+    error: str | None = None
+
+
+class BulkResponse(BaseModel):
+    results: list[BulkItemResult]
+
+
+def _is_uuid(value: str | None) -> bool:
+    try:
+        UUID(value)
+    except (TypeError, ValueError):
+        return False
+    return True
+
+
+def _parse_date(value: str | None) -> date | None:
+    return date.fromisoformat(value) if value is not None else None
+
+
+def _item_error(op: BulkOperation) -> str | None:
+    """DB に渡す前に分かる 1 件ごとのエラー（INSERT / UPDATE で失敗させてバッチ全体を戻さない）"""
+    if op.op == "create":
+        if not op.title:
+            return "title is required"
+    elif not _is_uuid(op.task_id):
+        return "Invalid task_id"
+    elif op.op == "update" and "title" in op.model_fields_set and op.title is None:
+        return "title cannot be null"
+    if op.title is not None and len(op.title) > MAX_TITLE_LENGTH:
+        return "title is too long"
+    for field in ("scheduled_start", "scheduled_end"):
+        try:
+            _parse_date(getattr(op, field))
+        except ValueError:
+            return f"Invalid {field}"
+    if op.board_id is not None and not _is_uuid(op.board_id):
+        return f"Board '{op.board_id}' not found"
+    if op.project_id is not None and not _is_uuid(op.project_id):
+        return f"Project '{op.project_id}' not found"
+    return None
+
+
+def _existing_ids(cur: Any, table: str, ids: set[str]) -> set[str]:
+    if not ids:
+        return set()
+    cur.execute(f"SELECT id FROM {table} WHERE id = ANY(%s::uuid[])", (list(ids),))
+    return {str(row["id"]) for row in cur.fetchall()}
+
+
+@router.post("/bulk")
+def bulk_tasks(body: BulkRequest) -> BulkResponse:
+    """タスクの作成・更新・完了・アーカイブ・移動・削除を 1 トランザクションでまとめて実行
+
+    検証に失敗した操作はスキップして結果に error を返し、残りはまとめてコミットする。
+    同じタスクへの複数操作は create → update → complete → archive → move → delete の順に適用される。
+    同じ種類の操作が同じタスクに複数あるときはリストの順に適用される（update は指定したフィールドを重ねる）。
+    """
+    ops = body.operations
+    results: list[BulkItemResult | None] = [None] * len(ops)
+
+    def fail(i: int, error: str) -> None:
+        results[i] = BulkItemResult(index=i, op=ops[i].op, task_id=ops[i].task_id, status="error", error=error)
+
+    # 新規作成するタスクの id はここで採番しておく
+    task_ids: list[str | None] = [str(uuid4()) if op.op == "create" else op.task_id for op in ops]
+
+    with get_conn() as conn, conn.cursor() as cur:
+        for i, op in enumerate(ops):
+            error = _item_error(op)
+            if error:
+                fail(i, error)
+
+        # 参照先の存在をまとめて確認（更新するタスクは日付の前後の確認用に現在の値も取る）
+        pending = [i for i in range(len(ops)) if results[i] is None]
+        task_refs = list({ops[i].task_id for i in pending if ops[i].op != "create"})
+        cur.execute(
+            "SELECT id, scheduled_start, scheduled_end FROM tasks WHERE id = ANY(%s::uuid[])",
+            (task_refs,),
+        )
+        tasks = {str(row["id"]): row for row in cur.fetchall()}
+        boards = _existing_ids(cur, "boards", {ops[i].board_id for i in pending if ops[i].board_id})
+        projects = _existing_ids(cur, "projects", {ops[i].project_id for i in pending if ops[i].project_id})
+        # 同じタスクへの update はリストの順に重ねて適用するので、日付は前の update の後の値と比べる
+        scheduled = {task_id: dict(row) for task_id, row in tasks.items()}
+        for i in pending:
+            op = ops[i]
+            if op.op != "create" and op.task_id not in tasks:
+                fail(i, "Task not found")
+            elif op.board_id and op.board_id not in boards:
+                fail(i, f"Board '{op.board_id}' not found")
+            elif op.project_id and op.project_id not in projects:
+                fail(i, f"Project '{op.project_id}' not found")
+            elif op.op in ("create", "update"):
+                # 指定されなかった日付は現在の値と比べる
+                current = scheduled.get(op.task_id) or {}
+                start, end = (
+                    _parse_date(getattr(op, field)) if field in op.model_fields_set else current.get(field)
+                    for field in ("scheduled_start", "scheduled_end")
+                )
+                if start and end and start > end:
+                    fail(i, "scheduled_start must not be after scheduled_end")
+                elif op.op == "update":
+                    current.update(scheduled_start=start, scheduled_end=end)
+
+        by_op: dict[str, list[int]] = {name: [] for name in _OP_ORDER}
+        for i, op in enumerate(ops):
+            if results[i] is None:
+                by_op[op.op].append(i)
+
+        # 並びが変わるボード（移動先と、移動・アーカイブ・削除するタスクの今のボード）の
+        # board_task_order の行を書き込む前に id 順にロックする。後の文のトリガーが
+        # 行の届いた順にロックすると、交差する一括操作・並べ替えとデッドロックする
+        cur.execute(
+            """
+            SELECT board_id
+            FROM board_task_order
+            WHERE board_id = ANY(%s::uuid[])
+               OR board_id IN (SELECT board_id FROM board_tasks WHERE task_id = ANY(%s::uuid[]))
+            ORDER BY board_id
+            FOR UPDATE
+            """,
+            (
+                list({ops[i].board_id for i in by_op["create"] + by_op["move"] if ops[i].board_id}),
+                list({task_ids[i] for i in by_op["move"] + by_op["archive"] + by_op["delete"]}),
+            ),
+        )
+
+        if by_op["create"]:
+            execute_values(
+                cur,
+                """
+                INSERT INTO tasks (id, title, description, scheduled_start, scheduled_end, project_id)
+                VALUES %s
+                """,
+                [
+                    (task_ids[i], ops[i].title, ops[i].description,
+                     ops[i].scheduled_start, ops[i].scheduled_end, ops[i].project_id)
+                    for i in by_op["create"]
+                ],
+                template="(%s::uuid, %s, %s, %s::date, %s::date, %s::uuid)",
+                page_size=MAX_BULK_OPERATIONS,
+            )
+
+        if by_op["update"]:
+            # 指定されたフィールドだけを書き換える（set_* フラグで None への更新と区別）。
+            # UPDATE ... FROM は同じ行に一致する VALUES のどれか 1 行しか適用しないので、
+            # 同じタスクへの update はリストの順に 1 行へまとめる（後の指定が勝つ）
+            updates: dict[str, dict[str, Any]] = {}
+            for i in by_op["update"]:
+                fields = updates.setdefault(task_ids[i], {})
+                for field in _UPDATABLE_FIELDS:
+                    if field in ops[i].model_fields_set:
+                        fields[field] = getattr(ops[i], field)
+            rows = []
+            for task_id, fields in updates.items():
+                row: list[Any] = [task_id]
+                for field in _UPDATABLE_FIELDS:
+                    row.extend([field in fields, fields.get(field)])
+                rows.append(tuple(row))
+            columns = ", ".join(f"set_{f}, {f}" for f in _UPDATABLE_FIELDS)
+            assignments = ", ".join(
+                f"{f} = CASE WHEN v.set_{f} THEN v.{f} ELSE t.{f} END" for f in _UPDATABLE_FIELDS
+            )
+            execute_values(
+                cur,
+                f"""
+                UPDATE tasks t
+                SET {assignments}, updated_at = CURRENT_TIMESTAMP
+                FROM (VALUES %s) AS v(id, {columns})
+                WHERE t.id = v.id
+                """,
+                rows,
+                template="(%s::uuid, %s, %s, %s, %s, %s, %s::date, %s, %s::date, %s, %s::uuid)",
+                page_size=MAX_BULK_OPERATIONS,
+            )
+
+        for op_name, column in (("complete", "completed_at"), ("archive", "archived_at")):
+            if by_op[op_name]:
+                execute_values(
+                    cur,
+                    f"""
+                    UPDATE tasks t
+                    SET {column} = CASE WHEN v.value THEN CURRENT_TIMESTAMP END,
+                        updated_at = CURRENT_TIMESTAMP
+                    FROM (VALUES %s) AS v(id, value)
+                    WHERE t.id = v.id
+                    """,
+                    # 同じタスクが複数回指定された場合は最後の指定を採用する
+                    list({task_ids[i]: ops[i].value for i in by_op[op_name]}.items()),
+                    template="(%s::uuid, %s)",
+                    page_size=MAX_BULK_OPERATIONS,
+                )
+
+        # create の board_id 指定と move をまとめて、移動先ボードの末尾に順に追加する
+        placements = [i for i in by_op["create"] if ops[i].board_id] + by_op["move"]
+        if placements:
+            moved_ids = [task_ids[i] for i in by_op["move"]]
+            cur.execute("DELETE FROM board_tasks WHERE task_id = ANY(%s::uuid[])", (moved_ids,))
+            # tasks.version はボード上の位置の変更でも進める（古い If-Match の PATCH を 409 にする）
+            cur.execute("UPDATE tasks SET version = version + 1 WHERE id = ANY(%s::uuid[])", (moved_ids,))
+            # 移動先の並びは先頭でロック済みなので、同時に末尾へ追加しても同じキーにならない
+            target_boards = list({ops[i].board_id for i in placements if ops[i].board_id})
+            cur.execute(
+                """
+                SELECT b.id, COALESCE(MAX(bt.position), 0) AS max_position
+                FROM boards b
+                LEFT JOIN board_tasks bt ON bt.board_id = b.id
+                WHERE b.id = ANY(%s::uuid[])
+                GROUP BY b.id
+                """,
+                (target_boards,),
+            )
+            tail = {str(row["id"]): row["max_position"] for row in cur.fetchall()}
+            # 同じタスクが複数回指定された場合は最後の指定を採用する
+            last_placement = {task_ids[i]: i for i in placements}
+            rows = []
+            for i in placements:
+                board_id = ops[i].board_id
+                if board_id and last_placement[task_ids[i]] == i:
+                    tail[board_id] += POSITION_GAP
+                    rows.append((board_id, task_ids[i], tail[board_id]))
+            if rows:
+                execute_values(
+                    cur,
+                    "INSERT INTO board_tasks (board_id, task_id, position) VALUES %s",
+                    rows,
+                    template="(%s::uuid, %s::uuid, %s)",
+                    page_size=MAX_BULK_OPERATIONS,
+                )
+
+        if by_op["delete"]:
+            # board_tasks は CASCADE で自動削除される
+            cur.execute(
+                "DELETE FROM tasks WHERE id = ANY(%s::uuid[])",
+                ([task_ids[i] for i in by_op["delete"]],),
+            )
+
+        # 個々の差分ではなく、変更されたタスクを購読者全員に取り直してもらう
+        changed = {task_ids[i] for i, result in enumerate(results) if result is None}
+        publish(cur, "tasks.bulk", {"task_ids": sorted(changed)})
+        bump_versions(cur, "tasks")
+        conn.commit()
+
+    return BulkResponse(results=[
+        result or BulkItemResult(index=i, op=ops[i].op, task_id=task_ids[i], status="ok")
+        for i, result in enumerate(results)
+    ])
+
+
+class _RequestBody(io.RawIOBase):
+    """リクエストボディを受信しながら読むファイル（ワーカースレッドからイベントループの stream を引く）"""
+
+    def __init__(self, chunks: AsyncIterator[bytes]) -> None:
+        self._chunks = chunks
+        self._buf = b""
+
+    def readable(self) -> bool:
+        return True
+
+    async def _next_chunk(self) -> bytes:
+        return await anext(self._chunks, b"")
+
+    def readinto(self, b: Any) -> int:
+        while not self._buf:
+            self._buf = anyio.from_thread.run(self._next_chunk)
+            if not self._buf:
+                return 0
+        n = min(len(b), len(self._buf))
+        b[:n], self._buf = self._buf[:n], self._buf[n:]
+        return n
+
+
+@router.post("/import")
+async def import_tasks_endpoint(request: Request, format: Literal["csv", "ndjson"] = "csv") -> ImportSummary:
+    """リクエストボディの CSV / NDJSON からタスクを取り込む
+
+    列: title, description, project（短縮名または名前）, board（ラベル）,
+    scheduled_start, scheduled_end, completed_at, archived_at
+
+    ボディは全体を読み込まず、受信しながら少しずつデコードして COPY に流す。
+    """
+    body = io.TextIOWrapper(io.BufferedReader(_RequestBody(request.stream())), encoding="utf-8-sig", newline="")
+    try:
+        return await run_in_threadpool(import_tasks, body, format)
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="Request body must be UTF-8 encoded") from None
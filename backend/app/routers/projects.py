@@ -1,9 +1,20 @@
+import json
+from datetime import date, datetime
 from typing import Any
+from uuid import UUID
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from psycopg2.extras import NamedTupleCursor
 from pydantic import BaseModel
 
+from app import cache
 from app.database import get_conn
+from app.events import publish
+from app.pagination import MAX_PAGE_SIZE, decode_cursor, paginate
+from app.rawjson import json_rows, raw_json
+from app.replicas import read_conn
+from app.routers.tasks import TASK_SORT_ORDER_SQL, task_filter_clauses
+from app.versions import bump_versions, not_modified
 
 router = APIRouter(prefix="/api/projects", tags=["projects"])
 
@@ -36,11 +47,11 @@ def _row_to_project(row: Any) -> ProjectResponse:
     )
 
 
-@router.get("")
-def list_projects() -> list[ProjectResponse]:
-    with get_conn() as conn, conn.cursor() as cur:
-        cur.execute("SELECT id, name, short_name, color FROM projects ORDER BY sort_order")
-        return [_row_to_project(row) for row in cur.fetchall()]
+@router.get("", response_model=list[ProjectResponse])
+def list_projects(request: Request, response: Response) -> Response:
+    not_modified(request, response, "projects")
+    # キャッシュの値は ProjectResponse と同じ形（id は文字列）
+    return raw_json(json.dumps(list(cache.projects_cache.get().values())), response)
 
 
 @router.post("", status_code=201)
@@ -59,9 +70,12 @@ def create_project(body: ProjectCreate) -> ProjectResponse:
             """,
             (body.name, body.short_name, body.color, next_order),
         )
-        row = cur.fetchone()
+        project = _row_to_project(cur.fetchone())
+        publish(cur, "project.created", project.model_dump())
+        bump_versions(cur, "projects")
         conn.commit()
-        return _row_to_project(row)
+        cache.projects_cache.invalidate()
+        return project
 
 
 @router.patch("/{project_id}")
@@ -80,19 +94,27 @@ def update_project(project_id: str, body: ProjectUpdate) -> ProjectResponse:
             values,
         )
         row = cur.fetchone()
-        conn.commit()
         if not row:
             raise HTTPException(status_code=404, detail="Project not found")
-        return _row_to_project(row)
+        project = _row_to_project(row)
+        publish(cur, "project.updated", project.model_dump())
+        bump_versions(cur, "projects")
+        conn.commit()
+        cache.projects_cache.invalidate()
+        return project
 
 
 @router.delete("/{project_id}", status_code=204, response_model=None)
 def delete_project(project_id: str) -> None:
     with get_conn() as conn, conn.cursor() as cur:
+        # プロジェクトのタスクも CASCADE で削除される
         cur.execute("DELETE FROM projects WHERE id = %s", (project_id,))
-        conn.commit()
         if cur.rowcount == 0:
             raise HTTPException(status_code=404, detail="Project not found")
+        publish(cur, "project.deleted", {"id": project_id})
+        bump_versions(cur, "projects", "tasks")
+        conn.commit()
+        cache.projects_cache.invalidate()
 
 
 class ProjectTaskResponse(BaseModel):
@@ -110,56 +132,117 @@ class ProjectTaskResponse(BaseModel):
 
 
 @router.get("/{project_id}")
-def get_project(project_id: str) -> ProjectResponse:
-    with get_conn() as conn, conn.cursor() as cur:
-        cur.execute(
-            "SELECT id, name, short_name, color FROM projects WHERE id = %s",
-            (project_id,),
-        )
-        row = cur.fetchone()
-        if not row:
-            raise HTTPException(status_code=404, detail="Project not found")
-        return _row_to_project(row)
-
-
-@router.get("/{project_id}/tasks")
-def list_project_tasks(project_id: str) -> list[ProjectTaskResponse]:
-    """プロジェクトに属するタスク一覧を取得（ボード割り当て有無問わず）"""
-    with get_conn() as conn, conn.cursor() as cur:
-        # プロジェクトの存在確認
-        cur.execute("SELECT id FROM projects WHERE id = %s", (project_id,))
-        if not cur.fetchone():
-            raise HTTPException(status_code=404, detail="Project not found")
+def get_project(project_id: str, request: Request, response: Response) -> ProjectResponse:
+    not_modified(request, response, "projects")
+    row = cache.get_project(project_id)
+    if not row:
+        raise HTTPException(status_code=404, detail="Project not found")
+    return _row_to_project(row)
+
+
+def project_tasks_query(
+    project_id: str,
+    board_id: str | None = None,
+    completed: bool | None = None,
+    archived: bool | None = None,
+    scheduled_from: date | None = None,
+    scheduled_to: date | None = None,
+    limit: int | None = None,
+    cursor: str | None = None,
+) -> tuple[str, list[Any]]:
+    """GET /api/projects/{project_id}/tasks の SQL とパラメータ（benchmarks.query_plans も同じものを確かめる）"""
+    clauses, params = task_filter_clauses(project_id, completed, archived, scheduled_from, scheduled_to)
+    if board_id is not None:
+        clauses.append("t.board_id = %s")
+        params.append(board_id)
+    if cursor is not None:
+        archived_key, created_at, task_id = decode_cursor(cursor, datetime, datetime, UUID)
+        clauses.append("""
+            (COALESCE(t.archived_at, '-infinity') > %s::timestamptz
+             OR (COALESCE(t.archived_at, '-infinity') = %s::timestamptz
+                 AND (t.created_at, t.id) < (%s::timestamptz, %s::uuid)))
+        """)
+        params.extend([archived_key, archived_key, created_at, task_id])
+
+    limit_clause = "LIMIT %s" if limit is not None else ""
+    if limit is not None:
+        params.append(limit + 1)
+
+    # タスク一覧を取得（ボードは行ごとに索引で引くので未割り当ても含む）。
+    # アーカイブ済みも返す場合はコールドストレージに移動済みのタスクも合わせる
+    cold_tasks = """
+        UNION ALL
+        SELECT a.id, a.project_id, a.title, a.description, a.created_at,
+               a.scheduled_start, a.scheduled_end, a.completed_at, a.archived_at,
+               a.board_id
+        FROM archived_tasks a
+    """ if archived is not False else ""
+    # JSON は Postgres で組み立て、モデルを作らずにそのまま返す。ボード名と sort_order も
+    # 並べ替え・打ち切りの後で、ページに入る行だけ求める（sort_order は行ごとに索引を数える）
+    sql = f"""
+        SELECT json_build_object(
+                   'id', p.id, 'title', p.title, 'description', p.description,
+                   'scheduled_start', p.scheduled_start, 'scheduled_end', p.scheduled_end,
+                   'completed_at', p.completed_at, 'archived_at', p.archived_at,
+                   'board_id', p.board_id,
+                   'board_name', (SELECT label FROM boards WHERE id = p.board_id),
+                   'sort_order', CASE WHEN bt.board_id IS NOT NULL THEN {TASK_SORT_ORDER_SQL} END
+               )::text AS json,
+               p.id, p.created_at, p.archived_at
+        FROM (
+            SELECT t.*
+            FROM (
+                SELECT t.id, t.project_id, t.title, t.description, t.created_at,
+                       t.scheduled_start, t.scheduled_end, t.completed_at, t.archived_at,
+                       (SELECT bt.board_id FROM board_tasks bt WHERE bt.task_id = t.id) AS board_id
+                FROM tasks t
+                {cold_tasks}
+            ) t
+            WHERE {" AND ".join(clauses)}
+            ORDER BY COALESCE(t.archived_at, '-infinity') ASC, t.created_at DESC, t.id DESC
+            {limit_clause}
+        ) p
+        LEFT JOIN board_tasks bt ON bt.task_id = p.id
+        ORDER BY COALESCE(p.archived_at, '-infinity') ASC, p.created_at DESC, p.id DESC
+    """
+    return sql, params
+
+
+@router.get("/{project_id}/tasks", response_model=list[ProjectTaskResponse])
+def list_project_tasks(
+    project_id: str,
+    request: Request,
+    response: Response,
+    board_id: str | None = None,
+    completed: bool | None = None,
+    archived: bool | None = None,
+    scheduled_from: date | None = None,
+    scheduled_to: date | None = None,
+    limit: int | None = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+) -> Response:
+    """プロジェクトに属するタスク一覧を取得（ボード割り当て有無問わず）
+
+    archived を省略するとアーカイブ済みも含めて返す（UIでフィルタリング）。
+    コールドストレージに移動済みのタスクは archived を省略したときと true のときに含まれる。
+    """
+    not_modified(request, response, "boards", "projects", "tasks")
+    sql, params = project_tasks_query(
+        project_id, board_id, completed, archived, scheduled_from, scheduled_to, limit, cursor,
+    )
 
-        # タスク一覧を取得（board_tasks との LEFT JOIN で未割り当ても含む）
-        # アーカイブ済みも含めて取得（UIでフィルタリング）
-        cur.execute("""
-            SELECT t.id, t.title, t.description,
-                   t.scheduled_start, t.scheduled_end, t.completed_at, t.archived_at,
-                   bt.board_id, b.label AS board_name, bt.sort_order
-            FROM tasks t
-            LEFT JOIN board_tasks bt ON t.id = bt.task_id
-            LEFT JOIN boards b ON bt.board_id = b.id
-            WHERE t.project_id = %s
-            ORDER BY t.archived_at NULLS FIRST, t.created_at DESC
-        """, (project_id,))
-
-        results = []
-        for row in cur.fetchall():
-            scheduled_start = row.get("scheduled_start")
-            scheduled_end = row.get("scheduled_end")
-            completed_at = row.get("completed_at")
-            archived_at = row.get("archived_at")
-            results.append(ProjectTaskResponse(
-                id=str(row["id"]),
-                title=row["title"],
-                description=row["description"],
-                scheduled_start=scheduled_start.isoformat() if scheduled_start else None,
-                scheduled_end=scheduled_end.isoformat() if scheduled_end else None,
-                completed_at=completed_at.isoformat() if completed_at else None,
-                archived_at=archived_at.isoformat() if archived_at else None,
-                board_id=str(row["board_id"]) if row["board_id"] else None,
-                board_name=row["board_name"],
-                sort_order=row["sort_order"],
-            ))
-        return results
+    # プロジェクトの存在確認
+    if not cache.get_project(project_id):
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    with read_conn() as conn, conn.cursor(cursor_factory=NamedTupleCursor) as cur:
+        cur.execute(sql, params)
+        rows = paginate(
+            cur.fetchall(), limit, response,
+            lambda row: (
+                row.archived_at.isoformat() if row.archived_at else "-infinity",
+                row.created_at.isoformat(),
+                str(row.id),
+            ),
+        )
+    return json_rows(rows, response)
@@ -0,0 +1,107 @@
+from datetime import date
+from typing import Any, Literal
+
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel
+
+from app import cache
+from app.replicas import read_conn
+
+router = APIRouter(prefix="/api/reports", tags=["reports"])
+
+# 期間の上限（日次ロールアップなので数年分でも軽いが、誤った指定で全件を読まないように）
+MAX_RANGE_DAYS = 366 * 5
+
+
+class ReportRow(BaseModel):
+    period: str  # 日付、または週の初日（月曜）
+    id: str  # project_id / board_id
+    name: str | None
+    tracked_seconds: float
+    completed_count: int
+    avg_cycle_seconds: float | None  # 作成から完了までの平均（完了が無ければ None）
+
+
+def _report(
+    scope_type: Literal["project", "board"],
+    scope_id: str | None,
+    start: date,
+    end: date,
+    bucket: Literal["day", "week"],
+) -> list[dict[str, Any]]:
+    if end < start:
+        raise HTTPException(status_code=400, detail="end must not be before start")
+    if (end - start).days > MAX_RANGE_DAYS:
+        raise HTTPException(status_code=400, detail=f"Range must be at most {MAX_RANGE_DAYS} days")
+
+    period = "day" if bucket == "day" else "date_trunc('week', day)::date"
+    # 集計し直すのは app.rollups のバックグラウンド処理（ここでは読むだけ）
+    with read_conn() as conn, conn.cursor() as cur:
+        cur.execute(
+            f"""
+            SELECT {period} AS period, scope_id,
+                   SUM(tracked_seconds) AS tracked_seconds,
+                   SUM(completed_count)::int AS completed_count,
+                   SUM(cycle_seconds) / NULLIF(SUM(completed_count), 0) AS avg_cycle_seconds
+            FROM report_daily
+            WHERE scope_type = %s AND day BETWEEN %s AND %s
+              AND (%s::uuid IS NULL OR scope_id = %s::uuid)
+            GROUP BY 1, scope_id
+            ORDER BY 1, scope_id
+            """,
+            (scope_type, start, end, scope_id, scope_id),
+        )
+        rows = cur.fetchall()
+    return rows
+
+
+@router.get("/projects")
+def project_report(
+    start: date,
+    end: date,
+    bucket: Literal["day", "week"] = "day",
+    project_id: str | None = None,
+) -> list[ReportRow]:
+    """プロジェクト別の計測時間・完了数・サイクルタイム（start, end は両端を含む）
+
+    変更は REPORT_REFRESH_INTERVAL 秒ほど遅れて反映される。
+    """
+    rows = _report("project", project_id, start, end, bucket)
+    projects = cache.projects_cache.get()
+    return [
+        ReportRow(
+            period=row["period"].isoformat(),
+            id=str(row["scope_id"]),
+            name=projects.get(str(row["scope_id"]), {}).get("name"),
+            tracked_seconds=row["tracked_seconds"],
+            completed_count=row["completed_count"],
+            avg_cycle_seconds=row["avg_cycle_seconds"],
+        )
+        for row in rows
+    ]
+
+
+@router.get("/boards")
+def board_report(
+    start: date,
+    end: date,
+    bucket: Literal["day", "week"] = "day",
+    board_id: str | None = None,
+) -> list[ReportRow]:
+    """ボード別の計測時間・完了数・サイクルタイム（start, end は両端を含む）
+
+    変更は REPORT_REFRESH_INTERVAL 秒ほど遅れて反映される。
+    """
+    rows = _report("board", board_id, start, end, bucket)
+    labels = {board["id"]: board["label"] for board in cache.boards_cache.get()}
+    return [
+        ReportRow(
+            period=row["period"].isoformat(),
+            id=str(row["scope_id"]),
+            name=labels.get(str(row["scope_id"])),
+            tracked_seconds=row["tracked_seconds"],
+            completed_count=row["completed_count"],
+            avg_cycle_seconds=row["avg_cycle_seconds"],
+        )
+        for row in rows
+    ]
@@ -0,0 +1,151 @@
+import functools
+import re
+from typing import Any
+from uuid import UUID
+
+from fastapi import APIRouter, Query, Response
+from pydantic import BaseModel
+
+from app.cache import ProjectInfo, project_info
+from app.database import get_conn
+from app.pagination import MAX_PAGE_SIZE, decode_cursor, paginate
+from app.routers.tasks import task_filter_clauses
+
+router = APIRouter(prefix="/api/tasks", tags=["search"])
+
+DEFAULT_SEARCH_LIMIT = 50
+# 返す候補の上限（関連度の高い順にこの件数まで）。これより下位の一致はページを
+# 進めても返らないので、語を足して絞ってもらう
+SEARCH_CANDIDATE_LIMIT = 1000
+# ヒット箇所は <mark> で囲む。タイトル・説明は HTML エスケープしないので、
+# クライアントは <mark> で分割してテキストとして描画すること
+_TITLE_HEADLINE = "StartSel=<mark>, StopSel=</mark>, HighlightAll=true"
+_DESCRIPTION_HEADLINE = "StartSel=<mark>, StopSel=</mark>, MaxFragments=2, MinWords=5, MaxWords=20"
+
+
+class TaskSearchHit(BaseModel):
+    id: str
+    title: str
+    description: str | None
+    board_id: str | None  # None なら未割り当て
+    completed_at: str | None
+    archived_at: str | None
+    project: ProjectInfo | None
+    rank: float
+    title_highlight: str
+    description_highlight: str | None
+
+
+@functools.cache
+def _trgm_available() -> bool:
+    """pg_trgm が入っていればトライグラム索引での部分一致・あいまい検索も使う"""
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute("SELECT EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm') AS available")
+        return cur.fetchone()["available"]
+
+
+def _prefix_tsquery(q: str) -> str:
+    """入力中の語も拾えるよう、各語を前方一致にして AND で繋ぐ（例: 'foo ba' -> 'foo':* & 'ba':*）"""
+    return " & ".join(f"'{word}':*" for word in re.findall(r"\w+", q.lower()))
+
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+@router.get("/search")
+def search_tasks(
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=200),
+    project_id: str | None = None,
+    board_id: str | None = None,
+    completed: bool | None = None,
+    archived: bool = False,
+    limit: int = Query(DEFAULT_SEARCH_LIMIT, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+) -> list[TaskSearchHit]:
+    """タイトル・説明からタスクを検索し、関連度の高い順に返す
+
+    返すのは一致したうち関連度の高い 1000 件（SEARCH_CANDIDATE_LIMIT）まで。
+    それより下位の一致は返らないので、多すぎるときは語を足して絞る。
+    続きは X-Next-Cursor ヘッダのカーソルで取得する。
+    """
+    tsquery = _prefix_tsquery(q)
+    trgm = _trgm_available()
+    if not tsquery and not trgm:
+        return []
+
+    # 一致条件と関連度。タイトルの一致（重み A）が説明より上に来る
+    matches = ["t.search_vector @@ query"] if tsquery else []
+    match_params: list[Any] = []
+    rank_sql = "ts_rank_cd(t.search_vector, query)::float8" if tsquery else "0::float8"
+    rank_params: list[Any] = []
+    if trgm:
+        like = f"%{_escape_like(q)}%"
+        matches += ["t.title ILIKE %s", "t.description ILIKE %s", "t.title %% %s"]
+        match_params += [like, like, q]
+        rank_sql += " + similarity(t.title, %s)"
+        rank_params.append(q)
+
+    clauses, params = task_filter_clauses(project_id, completed, archived)
+    if board_id is not None:
+        clauses.append("EXISTS (SELECT 1 FROM board_tasks bt WHERE bt.task_id = t.id AND bt.board_id = %s)")
+        params.append(board_id)
+    cursor_clause, cursor_params = "TRUE", []
+    if cursor is not None:
+        last_rank, last_id = decode_cursor(cursor, float, UUID)
+        cursor_clause = "(rank < %s OR (rank = %s AND id > %s::uuid))"
+        cursor_params = [last_rank, last_rank, last_id]
+
+    where = " AND ".join([f"({' OR '.join(matches)})", *clauses])
+    with get_conn() as conn, conn.cursor() as cur:
+        # 一致した行を関連度（tsvector とトライグラムのスコア）の高い順に
+        # SEARCH_CANDIDATE_LIMIT 件まで候補にする。(rank, id) で順序を固定するので、
+        # カーソルで続きを取っても行が抜けたり重なったりしない。上位 N 件の
+        # 並べ替えなので、大量に一致しても全件は並べない。ボードと ts_headline は
+        # ページに入る行だけに掛ける
+        cur.execute(f"""
+            WITH candidates AS (
+                SELECT t.id, t.title, t.description, t.completed_at, t.archived_at, t.project_id,
+                       {rank_sql} AS rank
+                FROM tasks t
+                CROSS JOIN to_tsquery('simple', %s) query
+                WHERE {where}
+                ORDER BY rank DESC, t.id
+                LIMIT %s
+            ),
+            hits AS (
+                SELECT * FROM candidates
+                WHERE {cursor_clause}
+                ORDER BY rank DESC, id
+                LIMIT %s
+            )
+            SELECT h.*,
+                   (SELECT bt.board_id FROM board_tasks bt WHERE bt.task_id = h.id) AS board_id,
+                   ts_headline('simple', h.title, query, %s) AS title_highlight,
+                   ts_headline('simple', h.description, query, %s) AS description_highlight
+            FROM hits h
+            CROSS JOIN to_tsquery('simple', %s) query
+            ORDER BY h.rank DESC, h.id
+        """, [
+            *rank_params, tsquery, *match_params, *params, SEARCH_CANDIDATE_LIMIT,
+            *cursor_params, limit + 1,
+            _TITLE_HEADLINE, _DESCRIPTION_HEADLINE, tsquery,
+        ])
+        rows = paginate(cur.fetchall(), limit, response, lambda row: (row["rank"], str(row["id"])))
+
+    return [
+        TaskSearchHit(
+            id=str(row["id"]),
+            title=row["title"],
+            description=row["description"],
+            board_id=str(row["board_id"]) if row["board_id"] else None,
+            completed_at=row["completed_at"].isoformat() if row["completed_at"] else None,
+            archived_at=row["archived_at"].isoformat() if row["archived_at"] else None,
+            project=project_info(row["project_id"]),
+            rank=row["rank"],
+            title_highlight=row["title_highlight"],
+            description_highlight=row["description_highlight"],
+        )
+        for row in rows
+    ]
@@ -0,0 +1,141 @@
+from datetime import date, datetime
+from typing import Any
+from uuid import UUID
+
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel
+
+from app.database import get_conn
+
+router = APIRouter(prefix="/api/sync", tags=["sync"])
+
+
+class SyncTask(BaseModel):
+    id: str
+    project_id: str | None
+    title: str
+    description: str | None
+    scheduled_start: str | None
+    scheduled_end: str | None
+    completed_at: str | None
+    archived_at: str | None
+    created_at: str
+    updated_at: str
+    version: int
+
+
+class SyncBoardTask(BaseModel):
+    """タスクのボード割り当て（position の昇順がボード内の表示順）"""
+    task_id: str
+    board_id: str
+    position: float
+    version: int
+
+
+class SyncBoard(BaseModel):
+    id: str
+    label: str
+    color: str
+    position: float
+    version: int
+
+
+class SyncProject(BaseModel):
+    id: str
+    name: str
+    short_name: str
+    color: str | None
+    sort_order: int
+
+
+class SyncDeleted(BaseModel):
+    tasks: list[str] = []
+    board_tasks: list[str] = []  # task_id（未割り当てに戻ったか、タスクごと削除された）
+    boards: list[str] = []
+    projects: list[str] = []
+
+
+class SyncResponse(BaseModel):
+    token: str  # 次回の since に渡す
+    full: bool  # True ならローカルの状態をこの内容で置き換える
+    tasks: list[SyncTask]
+    board_tasks: list[SyncBoardTask]
+    boards: list[SyncBoard]
+    projects: list[SyncProject]
+    deleted: SyncDeleted
+
+
+# change_log.entity -> (テーブル, キー列, レスポンスのキー, モデル, 列)
+_ENTITIES: dict[str, tuple[str, str, str, type[BaseModel], str]] = {
+    "task": (
+        "tasks", "id", "tasks", SyncTask,
+        "id, project_id, title, description, scheduled_start, scheduled_end, "
+        "completed_at, archived_at, created_at, updated_at, version",
+    ),
+    "board_task": ("board_tasks", "task_id", "board_tasks", SyncBoardTask, "task_id, board_id, position, version"),
+    "board": ("boards", "id", "boards", SyncBoard, "id, label, color, position, version"),
+    "project": ("projects", "id", "projects", SyncProject, "id, name, short_name, color, sort_order"),
+}
+
+
+def _to_model(model: type[BaseModel], row: Any) -> BaseModel:
+    return model(**{
+        k: v.isoformat() if isinstance(v, (date, datetime)) else str(v) if isinstance(v, UUID) else v
+        for k, v in row.items()
+    })
+
+
+@router.get("")
+def sync(since: str | None = None) -> SyncResponse:
+    """since（前回のトークン）以降に作成・更新・削除された行を返す
+
+    since を省略すると全件を返す。トークンが古すぎて差分を返せない場合は 410。
+    """
+    if since is not None and not since.isdigit():
+        raise HTTPException(status_code=400, detail="Invalid sync token")
+
+    results: dict[str, list[BaseModel]] = {}
+    deleted = SyncDeleted()
+    with get_conn() as conn, conn.cursor() as cur:
+        # 全クエリを同じスナップショットで読み、トークンもそのスナップショットから作る
+        cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY")
+        cur.execute("""
+            SELECT pg_snapshot_xmin(pg_current_snapshot())::text AS token,
+                   (SELECT txid::text FROM change_log_horizon) AS horizon
+        """)
+        snapshot = cur.fetchone()
+
+        changed: dict[str, list[str]] | None = None
+        if since is not None:
+            if int(since) <= int(snapshot["horizon"]):
+                raise HTTPException(status_code=410, detail="Sync token expired; resync without since")
+            cur.execute(
+                """
+                SELECT entity, array_agg(DISTINCT entity_id)::text[] AS ids
+                FROM change_log
+                WHERE txid >= %s::xid8
+                GROUP BY entity
+                """,
+                (since,),
+            )
+            changed = {row["entity"]: row["ids"] for row in cur.fetchall()}
+
+        for entity, (table, key, name, model, columns) in _ENTITIES.items():
+            if changed is None:
+                cur.execute(f"SELECT {columns} FROM {table} ORDER BY {key}")
+            elif entity in changed:
+                cur.execute(
+                    f"SELECT {columns} FROM {table} WHERE {key} = ANY(%s::uuid[]) ORDER BY {key}",
+                    (changed[entity],),
+                )
+            else:
+                results[name] = []
+                continue
+            rows = cur.fetchall()
+            results[name] = [_to_model(model, row) for row in rows]
+            if changed is not None:
+                # 履歴にあって現在の行が無いものは削除された
+                found = {str(row[key]) for row in rows}
+                setattr(deleted, name, sorted(set(changed[entity]) - found))
+
+    return SyncResponse(token=snapshot["token"], full=since is None, deleted=deleted, **results)
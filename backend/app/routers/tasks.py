@@ -1,20 +1,29 @@
-from typing import Any
-
-from fastapi import APIRouter, HTTPException
+import csv
+import io
+import json
+from collections.abc import Iterator
+from datetime import date, datetime
+from typing import Any, Literal
+from uuid import UUID
+
+from fastapi import APIRouter, Header, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from psycopg2.extras import NamedTupleCursor
 from pydantic import BaseModel
 
+from app.cache import ProjectInfo, project_info
 from app.database import get_conn
+from app.events import publish
+from app.ordering import POSITION_GAP, position_between
+from app.pagination import MAX_PAGE_SIZE, decode_cursor, paginate
+from app.rawjson import json_rows
+from app.replicas import read_conn
+from app.routers.boards import lock_task_order
+from app.versions import VersionConflict, bump_versions, expected_version, not_modified
 
 router = APIRouter(prefix="/api/tasks", tags=["tasks"])
 
 
-class ProjectInfo(BaseModel):
-    id: str
-    name: str
-    short_name: str
-    color: str | None
-
-
 class TaskResponse(BaseModel):
     id: str
     title: str
@@ -26,6 +35,8 @@ class TaskResponse(BaseModel):
     completed_at: str | None
     archived_at: str | None
     project: ProjectInfo | None
+    tracked_seconds: float = 0  # 確定済みの計測時間の合計
+    version: int  # 更新時の If-Match / version に渡す
 
 
 class UnassignedTaskResponse(BaseModel):
@@ -38,6 +49,8 @@ class UnassignedTaskResponse(BaseModel):
     completed_at: str | None
     archived_at: str | None
     project: ProjectInfo | None
+    tracked_seconds: float = 0  # 確定済みの計測時間の合計
+    version: int  # 更新時の If-Match / version に渡す
 
 
 class TaskCreate(BaseModel):
@@ -59,17 +72,10 @@ class TaskUpdate(BaseModel):
     scheduled_end: str | None = None  # ISO date string (YYYY-MM-DD)
     project_id: str | None = None
     archived: bool | None = None
+    version: int | None = None  # 指定すると一致するときだけ更新する（If-Match と同じ）
 
 
 def _row_to_task(row: Any) -> TaskResponse:
-    project = None
-    if row.get("project_id"):
-        project = ProjectInfo(
-            id=str(row["project_id"]),
-            name=row["project_name"],
-            short_name=row["project_short_name"],
-            color=row["project_color"],
-        )
     scheduled_start = row.get("scheduled_start")
     scheduled_end = row.get("scheduled_end")
     completed_at = row.get("completed_at")
@@ -84,392 +90,783 @@ def _row_to_task(row: Any) -> TaskResponse:
         scheduled_end=scheduled_end.isoformat() if scheduled_end else None,
         completed_at=completed_at.isoformat() if completed_at else None,
         archived_at=archived_at.isoformat() if archived_at else None,
-        project=project,
+        project=project_info(row.get("project_id")),
+        tracked_seconds=row.get("tracked_seconds") or 0,
+        version=row["version"],
     )
 
 
-@router.get("")
-def list_tasks() -> list[TaskResponse]:
-    with get_conn() as conn, conn.cursor() as cur:
-        cur.execute("""
-            SELECT t.id, t.title, t.description,
-                   t.scheduled_start, t.scheduled_end, t.completed_at, t.archived_at,
-                   bt.board_id, bt.sort_order,
-                   p.id AS project_id, p.name AS project_name,
-                   p.short_name AS project_short_name, p.color AS project_color
-            FROM tasks t
-            JOIN board_tasks bt ON t.id = bt.task_id
-            JOIN boards b ON bt.board_id = b.id
-            LEFT JOIN projects p ON t.project_id = p.id
-            WHERE t.archived_at IS NULL
-            ORDER BY b.sort_order, bt.sort_order
-        """)
-        return [_row_to_task(row) for row in cur.fetchall()]
+def _row_to_unassigned_task(row: Any) -> UnassignedTaskResponse:
+    scheduled_start = row.get("scheduled_start")
+    scheduled_end = row.get("scheduled_end")
+    completed_at = row.get("completed_at")
+    archived_at = row.get("archived_at")
+    return UnassignedTaskResponse(
+        id=str(row["id"]),
+        title=row["title"],
+        description=row["description"],
+        scheduled_start=scheduled_start.isoformat() if scheduled_start else None,
+        scheduled_end=scheduled_end.isoformat() if scheduled_end else None,
+        completed_at=completed_at.isoformat() if completed_at else None,
+        archived_at=archived_at.isoformat() if archived_at else None,
+        project=project_info(row.get("project_id")),
+        tracked_seconds=row.get("tracked_seconds") or 0,
+        version=row["version"],
+    )
+
+
+# ボード内の表示順（アーカイブ済みを除いた 0 始まりのインデックス）。
+# 前にある行を索引だけで数え、そこから前にあるアーカイブ済み（部分索引で引ける少数）を引く
+TASK_SORT_ORDER_SQL = """
+    ((SELECT COUNT(*)
+      FROM board_tasks bt2
+      WHERE bt2.board_id = bt.board_id
+        AND (bt2.position, bt2.task_id) < (bt.position, bt.task_id))
+     - (SELECT COUNT(*)
+        FROM tasks t2
+        JOIN board_tasks bt2 ON bt2.task_id = t2.id
+        WHERE t2.archived_at IS NOT NULL AND bt2.board_id = bt.board_id
+          AND (bt2.position, bt2.task_id) < (bt.position, bt.task_id)))
+"""
+
+
+# ボード内の（task_id 以外の）アーカイブされていないタスクのキーを表示順に。パラメータは (board_id, task_id)
+ACTIVE_BOARD_POSITIONS_SQL = """
+    SELECT bt.position
+    FROM board_tasks bt
+    JOIN tasks t ON t.id = bt.task_id
+    WHERE bt.board_id = %s AND bt.task_id <> %s AND t.archived_at IS NULL
+    ORDER BY bt.position, bt.task_id
+"""
+
+
+def _neighbor_positions(cur: Any, board_id: str, task_id: str, index: int) -> tuple[float | None, float | None]:
+    """タスクを index 番目に置くときの前後のキーを取得（自分自身とアーカイブ済みは除く）"""
+    if index <= 0:
+        cur.execute(ACTIVE_BOARD_POSITIONS_SQL + " LIMIT 1", (board_id, task_id))
+        row = cur.fetchone()
+        return None, row["position"] if row else None
 
+    cur.execute(ACTIVE_BOARD_POSITIONS_SQL + " OFFSET %s LIMIT 2", (board_id, task_id, index - 1))
+    rows = cur.fetchall()
+    if rows:
+        return rows[0]["position"], rows[1]["position"] if len(rows) > 1 else None
 
-@router.get("/unassigned")
-def list_unassigned_tasks() -> list[UnassignedTaskResponse]:
+    # 末尾より後ろが指定された場合は最後尾に置く
+    cur.execute(
+        "SELECT MAX(position) AS position FROM board_tasks WHERE board_id = %s AND task_id <> %s",
+        (board_id, task_id),
+    )
+    return cur.fetchone()["position"], None
+
+
+def _rebalance_board(cur: Any, board_id: str) -> None:
+    """キーの間隔が尽きたボードを等間隔に再採番する"""
+    cur.execute(
+        """
+        UPDATE board_tasks bt
+        SET position = r.rn * %s
+        FROM (
+            SELECT task_id, row_number() OVER (ORDER BY position, task_id) AS rn
+            FROM board_tasks
+            WHERE board_id = %s
+        ) r
+        WHERE bt.board_id = %s AND bt.task_id = r.task_id
+        """,
+        (POSITION_GAP, board_id, board_id),
+    )
+
+
+def _position_for_index(cur: Any, board_id: str, task_id: str, index: int) -> float:
+    before, after = _neighbor_positions(cur, board_id, task_id, index)
+    position = position_between(before, after)
+    if position is None:
+        _rebalance_board(cur, board_id)
+        before, after = _neighbor_positions(cur, board_id, task_id, index)
+        position = position_between(before, after)
+    return position
+
+
+# 一覧で返す 1 行分の JSON（TaskResponse / UnassignedTaskResponse と同じ形）。
+# プロジェクトは主キーで 1 行引くだけなので、キャッシュから付けずに SQL で埋め込む
+PROJECT_JSON_SQL = """
+    (SELECT json_build_object('id', p.id, 'name', p.name, 'short_name', p.short_name, 'color', p.color)
+     FROM projects p WHERE p.id = {alias}.project_id)
+"""
+
+
+def task_json_sql(alias: str, tracked_seconds: str, on_board: bool = True) -> str:
+    board = f"'board_id', {alias}.board_id, 'sort_order', {alias}.sort_order," if on_board else ""
+    return f"""
+        json_build_object(
+            'id', {alias}.id, 'title', {alias}.title, 'description', {alias}.description, {board}
+            'scheduled_start', {alias}.scheduled_start, 'scheduled_end', {alias}.scheduled_end,
+            'completed_at', {alias}.completed_at, 'archived_at', {alias}.archived_at,
+            'project', {PROJECT_JSON_SQL.format(alias=alias)},
+            'tracked_seconds', COALESCE({tracked_seconds}, 0), 'version', {alias}.version
+        )::text
+    """
+
+
+def task_filter_clauses(
+    project_id: str | None = None,
+    completed: bool | None = None,
+    archived: bool | None = None,
+    scheduled_from: date | None = None,
+    scheduled_to: date | None = None,
+) -> tuple[list[str], list[Any]]:
+    """tasks (エイリアス t) に対する共通の絞り込み条件を組み立てる"""
+    clauses: list[str] = []
+    params: list[Any] = []
+    if project_id is not None:
+        clauses.append("t.project_id = %s")
+        params.append(project_id)
+    if completed is not None:
+        clauses.append("t.completed_at IS NOT NULL" if completed else "t.completed_at IS NULL")
+    if archived is not None:
+        clauses.append("t.archived_at IS NOT NULL" if archived else "t.archived_at IS NULL")
+    # 予定期間が [scheduled_from, scheduled_to] と重なるタスク
+    if scheduled_from is not None:
+        clauses.append("COALESCE(t.scheduled_end, t.scheduled_start) >= %s")
+        params.append(scheduled_from)
+    if scheduled_to is not None:
+        clauses.append("COALESCE(t.scheduled_start, t.scheduled_end) <= %s")
+        params.append(scheduled_to)
+    return clauses, params
+
+
+def list_tasks_query(
+    board_id: str | None = None,
+    project_id: str | None = None,
+    completed: bool | None = None,
+    archived: bool = False,
+    scheduled_from: date | None = None,
+    scheduled_to: date | None = None,
+    limit: int | None = None,
+    cursor: str | None = None,
+) -> tuple[str, list[Any]]:
+    """GET /api/tasks の SQL とパラメータ（benchmarks.query_plans も同じものの実行計画を確かめる）"""
+    clauses, params = task_filter_clauses(project_id, completed, archived, scheduled_from, scheduled_to)
+    board_clauses: list[str] = []
+    board_params: list[Any] = []
+    if board_id is not None:
+        board_clauses.append("b.id = %s")
+        board_params.append(board_id)
+
+    # カーソルと同じボードの続きは sort_order をカーソル位置から数える
+    cursor_board_id, sort_order_offset = None, 0
+    if cursor is not None:
+        board_position, cursor_board_id, position, task_id, last_sort_order = decode_cursor(cursor, float, UUID, float, UUID, int)
+        board_clauses.append("(b.position, b.id) >= (%s, %s::uuid)")
+        board_params.extend([board_position, cursor_board_id])
+        clauses.append("(bt.board_id <> %s::uuid OR (bt.position, bt.task_id) > (%s, %s::uuid))")
+        params.extend([cursor_board_id, position, task_id])
+        sort_order_offset = last_sort_order + 1
+
+    where = " AND ".join(clauses) if clauses else "TRUE"
+    board_where = " AND ".join(board_clauses) if board_clauses else "TRUE"
+    limit_clause = "LIMIT %s" if limit is not None else ""
+    limit_params = [limit + 1] if limit is not None else []
+
+    # ボードごとに (board_id, position, task_id) の索引順で読み、limit 件で打ち切る。
+    # JSON は並べ替え・打ち切りの後で組み立てる（並べ替える行を小さく保つ）
+    sql = f"""
+        SELECT {task_json_sql("x", "x.tracked_seconds")} AS json,
+               x.board_id, x.position, x.id, x.sort_order, x.board_position
+        FROM (
+            SELECT x.*, b.position AS board_position
+            FROM boards b
+            CROSS JOIN LATERAL (
+                SELECT t.id, t.title, t.description,
+                       t.scheduled_start, t.scheduled_end, t.completed_at, t.archived_at,
+                       bt.board_id, bt.position,
+                       row_number() OVER (ORDER BY bt.position, bt.task_id)
+                           - 1 + CASE WHEN bt.board_id = %s::uuid THEN %s ELSE 0 END AS sort_order,
+                       t.project_id, tt.total_seconds AS tracked_seconds, t.version
+                FROM board_tasks bt
+                JOIN tasks t ON t.id = bt.task_id
+                LEFT JOIN task_time_totals tt ON tt.task_id = t.id
+                WHERE bt.board_id = b.id AND {where}
+                ORDER BY bt.position, bt.task_id
+                {limit_clause}
+            ) x
+            WHERE {board_where}
+            ORDER BY b.position, x.board_id, x.position, x.id
+            {limit_clause}
+        ) x
+        ORDER BY x.board_position, x.board_id, x.position, x.id
+    """
+    return sql, [cursor_board_id, sort_order_offset, *params, *limit_params, *board_params, *limit_params]
+
+
+@router.get("", response_model=list[TaskResponse])
+def list_tasks(
+    request: Request,
+    response: Response,
+    board_id: str | None = None,
+    project_id: str | None = None,
+    completed: bool | None = None,
+    archived: bool = False,
+    scheduled_from: date | None = None,
+    scheduled_to: date | None = None,
+    limit: int | None = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+) -> Response:
+    """ボードに割り当てられたタスク一覧を取得
+
+    limit 指定時は X-Next-Cursor ヘッダのカーソルで続きを取得する。
+    絞り込み時の sort_order は絞り込み後の並びでのインデックス。
+    JSON は Postgres で組み立て、モデルを作らずにそのまま返す。
+    """
+    not_modified(request, response, "boards", "projects", "tasks")
+    sql, params = list_tasks_query(
+        board_id, project_id, completed, archived, scheduled_from, scheduled_to, limit, cursor,
+    )
+    with read_conn() as conn, conn.cursor(cursor_factory=NamedTupleCursor) as cur:
+        cur.execute(sql, params)
+        rows = paginate(
+            cur.fetchall(), limit, response,
+            lambda row: (row.board_position, str(row.board_id), row.position, str(row.id), row.sort_order),
+        )
+    return json_rows(rows, response)
+
+
+def unassigned_tasks_query(
+    project_id: str | None = None,
+    completed: bool | None = None,
+    archived: bool = False,
+    scheduled_from: date | None = None,
+    scheduled_to: date | None = None,
+    limit: int | None = None,
+    cursor: str | None = None,
+) -> tuple[str, list[Any]]:
+    """GET /api/tasks/unassigned の SQL とパラメータ"""
+    clauses, params = task_filter_clauses(project_id, completed, archived, scheduled_from, scheduled_to)
+    if cursor is not None:
+        created_at, task_id = decode_cursor(cursor, datetime, UUID)
+        clauses.append("(t.created_at, t.id) < (%s::timestamptz, %s::uuid)")
+        params.extend([created_at, task_id])
+
+    where = " AND ".join(["NOT EXISTS (SELECT 1 FROM board_tasks bt WHERE bt.task_id = t.id)", *clauses])
+    limit_clause = "LIMIT %s" if limit is not None else ""
+    if limit is not None:
+        params.append(limit + 1)
+
+    sql = f"""
+        SELECT {task_json_sql("t", "tt.total_seconds", on_board=False)} AS json, t.id, t.created_at
+        FROM tasks t
+        LEFT JOIN task_time_totals tt ON tt.task_id = t.id
+        WHERE {where}
+        ORDER BY t.created_at DESC, t.id DESC
+        {limit_clause}
+    """
+    return sql, params
+
+
+@router.get("/unassigned", response_model=list[UnassignedTaskResponse])
+def list_unassigned_tasks(
+    request: Request,
+    response: Response,
+    project_id: str | None = None,
+    completed: bool | None = None,
+    archived: bool = False,
+    scheduled_from: date | None = None,
+    scheduled_to: date | None = None,
+    limit: int | None = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+) -> Response:
     """ボードに割り当てられていないタスク一覧を取得"""
-    with get_conn() as conn, conn.cursor() as cur:
+    not_modified(request, response, "projects", "tasks")
+    sql, params = unassigned_tasks_query(
+        project_id, completed, archived, scheduled_from, scheduled_to, limit, cursor,
+    )
+    with read_conn() as conn, conn.cursor(cursor_factory=NamedTupleCursor) as cur:
+        cur.execute(sql, params)
+        rows = paginate(
+            cur.fetchall(), limit, response,
+            lambda row: (row.created_at.isoformat(), str(row.id)),
+        )
+    return json_rows(rows, response)
+
+
+EXPORT_BATCH_SIZE = 2000
+
+_EXPORT_COLUMNS = [
+    "id", "title", "description", "project_id", "project_name", "board_id", "board_name",
+    "scheduled_start", "scheduled_end", "completed_at", "archived_at", "created_at", "updated_at",
+]
+
+
+def _iter_export_rows() -> Iterator[list[dict[str, Any]]]:
+    """全タスク（コールドストレージに移動済みも含む）をサーバーサイドカーソルで EXPORT_BATCH_SIZE 件ずつ読み出す"""
+    with read_conn() as conn, conn.cursor(name="task_export") as cur:
+        cur.itersize = EXPORT_BATCH_SIZE
         cur.execute("""
             SELECT t.id, t.title, t.description,
+                   t.project_id, p.name AS project_name,
+                   t.board_id, b.label AS board_name,
                    t.scheduled_start, t.scheduled_end, t.completed_at, t.archived_at,
-                   p.id AS project_id, p.name AS project_name,
-                   p.short_name AS project_short_name, p.color AS project_color
-            FROM tasks t
-            LEFT JOIN board_tasks bt ON t.id = bt.task_id
+                   t.created_at, t.updated_at
+            FROM all_tasks t
             LEFT JOIN projects p ON t.project_id = p.id
-            WHERE bt.task_id IS NULL AND t.archived_at IS NULL
-            ORDER BY t.created_at DESC
+            LEFT JOIN boards b ON t.board_id = b.id
+            ORDER BY t.created_at, t.id
         """)
-        results = []
-        for row in cur.fetchall():
-            project = None
-            if row.get("project_id"):
-                project = ProjectInfo(
-                    id=str(row["project_id"]),
-                    name=row["project_name"],
-                    short_name=row["project_short_name"],
-                    color=row["project_color"],
-                )
-            scheduled_start = row.get("scheduled_start")
-            scheduled_end = row.get("scheduled_end")
-            completed_at = row.get("completed_at")
-            archived_at = row.get("archived_at")
-            results.append(UnassignedTaskResponse(
-                id=str(row["id"]),
-                title=row["title"],
-                description=row["description"],
-                scheduled_start=scheduled_start.isoformat() if scheduled_start else None,
-                scheduled_end=scheduled_end.isoformat() if scheduled_end else None,
-                completed_at=completed_at.isoformat() if completed_at else None,
-                archived_at=archived_at.isoformat() if archived_at else None,
-                project=project,
-            ))
-        return results
+        batch = []
+        for row in cur:
+            batch.append({
+                k: v.isoformat() if isinstance(v, (date, datetime)) else str(v) if isinstance(v, UUID) else v
+                for k, v in row.items()
+            })
+            if len(batch) >= EXPORT_BATCH_SIZE:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+
+def _export_ndjson() -> Iterator[str]:
+    for batch in _iter_export_rows():
+        yield "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in batch)
+
+
+def _export_csv() -> Iterator[str]:
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, fieldnames=_EXPORT_COLUMNS)
+    writer.writeheader()
+    yield buf.getvalue()
+    for batch in _iter_export_rows():
+        buf.seek(0)
+        buf.truncate()
+        writer.writerows(batch)
+        yield buf.getvalue()
+
+
+@router.get("/export")
+def export_tasks(format: Literal["ndjson", "csv"] = "ndjson") -> StreamingResponse:
+    """アーカイブ済みを含む全タスクをストリーミングで出力"""
+    if format == "csv":
+        body, media_type = _export_csv(), "text/csv; charset=utf-8"
+    else:
+        body, media_type = _export_ndjson(), "application/x-ndjson"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="tasks.{format}"'},
+    )
+
+
+def _task_event(row: Any) -> dict[str, Any]:
+    """変更イベントに載せるタスク（プロジェクトは id のみ）"""
+    return {
+        "id": str(row["id"]),
+        "title": row["title"],
+        "description": row["description"],
+        "board_id": str(row["board_id"]) if row["board_id"] else None,
+        "sort_order": row["sort_order"] if row["board_id"] else None,
+        "scheduled_start": row["scheduled_start"],
+        "scheduled_end": row["scheduled_end"],
+        "completed_at": row["completed_at"],
+        "archived_at": row["archived_at"],
+        "project_id": str(row["project_id"]) if row["project_id"] else None,
+    }
+
+
+def _row_to_response(row: Any) -> TaskResponse | UnassignedTaskResponse:
+    """board_id の有無でボード上のタスクか未割り当てタスクかを返し分ける"""
+    if row["board_id"] is None:
+        return _row_to_unassigned_task(row)
+    return _row_to_task(row)
+
+
+def _select_task(cur: Any, task_id: str) -> Any:
+    """タスク 1 件をボード情報付きで取得（LEFT JOINで未割り当てタスクにも対応）"""
+    cur.execute(f"""
+        SELECT t.id, t.title, t.description,
+               t.scheduled_start, t.scheduled_end, t.completed_at, t.archived_at,
+               bt.board_id, {TASK_SORT_ORDER_SQL} AS sort_order, t.project_id,
+               tt.total_seconds AS tracked_seconds, t.version
+        FROM tasks t
+        LEFT JOIN board_tasks bt ON t.id = bt.task_id
+        LEFT JOIN task_time_totals tt ON tt.task_id = t.id
+        WHERE t.id = %s
+    """, (task_id,))
+    return cur.fetchone()
+
+
+def _task_conflict(cur: Any, task_id: str) -> VersionConflict:
+    """version が一致しなかったタスクの現在の状態（タスクが無ければ 404）"""
+    row = _select_task(cur, task_id)
+    if not row:
+        raise HTTPException(status_code=404, detail="Task not found")
+    return VersionConflict(lambda: _row_to_response(row))
+
+
+# 存在確認・作成・末尾への配置・バージョンの加算・レスポンス用の取得を 1 文で行う
+_CREATE_TASK_SQL = """
+    WITH checks AS (
+        SELECT (%(board_id)s::uuid IS NULL
+                OR EXISTS (SELECT 1 FROM boards WHERE id = %(board_id)s::uuid)) AS board_ok,
+               (%(project_id)s::uuid IS NULL
+                OR EXISTS (SELECT 1 FROM projects WHERE id = %(project_id)s::uuid)) AS project_ok
+    ),
+    new_task AS (
+        INSERT INTO tasks (title, description, scheduled_start, scheduled_end, project_id)
+        SELECT %(title)s, %(description)s, %(scheduled_start)s::date, %(scheduled_end)s::date,
+               %(project_id)s::uuid
+        FROM checks
+        WHERE board_ok AND project_ok
+        RETURNING *
+    ),
+    tail AS (
+        SELECT COALESCE(MAX(bt.position), 0) AS max_position,
+               COUNT(*) FILTER (WHERE t.archived_at IS NULL) AS next_order
+        FROM board_tasks bt
+        JOIN tasks t ON t.id = bt.task_id
+        WHERE bt.board_id = %(board_id)s::uuid
+    ),
+    placed AS (
+        INSERT INTO board_tasks (board_id, task_id, position)
+        SELECT %(board_id)s::uuid, n.id, tail.max_position + %(gap)s
+        FROM new_task n, tail
+        WHERE %(board_id)s::uuid IS NOT NULL
+        RETURNING board_id
+    ),
+    bumped AS (
+        UPDATE resource_versions SET version = version + 1
+        WHERE resource = 'tasks' AND shard = resource_version_shard() AND EXISTS (SELECT 1 FROM new_task)
+    )
+    SELECT c.board_ok, c.project_ok,
+           n.id, n.title, n.description,
+           n.scheduled_start, n.scheduled_end, n.completed_at, n.archived_at,
+           pl.board_id, tail.next_order AS sort_order, n.project_id, n.version
+    FROM checks c
+    CROSS JOIN tail
+    LEFT JOIN new_task n ON true
+    LEFT JOIN placed pl ON true
+"""
 
 
 @router.post("", status_code=201)
 def create_task(body: TaskCreate) -> TaskResponse | UnassignedTaskResponse:
     with get_conn() as conn, conn.cursor() as cur:
-        # board_id が指定された場合は存在確認
-        if body.board_id:
-            cur.execute("SELECT id FROM boards WHERE id = %s", (body.board_id,))
-            if not cur.fetchone():
-                raise HTTPException(status_code=400, detail=f"Board '{body.board_id}' not found")
-
-        # project_id の存在確認
-        project_row = None
-        if body.project_id:
-            cur.execute("SELECT id, name, short_name, color FROM projects WHERE id = %s", (body.project_id,))
-            project_row = cur.fetchone()
-            if not project_row:
-                raise HTTPException(status_code=400, detail=f"Project '{body.project_id}' not found")
-
-        # タスクを作成
-        cur.execute(
-            "INSERT INTO tasks (title, description, scheduled_start, scheduled_end, project_id) VALUES (%s, %s, %s, %s, %s) RETURNING *",
-            (body.title, body.description, body.scheduled_start, body.scheduled_end, body.project_id),
+        if body.board_id is not None:
+            # 同時に同じボードの末尾に追加して同じキーにならないよう、先に並びをロックする
+            lock_task_order(cur, body.board_id)
+        cur.execute(_CREATE_TASK_SQL, {**body.model_dump(), "gap": POSITION_GAP})
+        row = cur.fetchone()
+        if not row["board_ok"]:
+            raise HTTPException(status_code=400, detail=f"Board '{body.board_id}' not found")
+        if not row["project_ok"]:
+            raise HTTPException(status_code=400, detail=f"Project '{body.project_id}' not found")
+        publish(
+            cur, "task.created", _task_event(row),
+            boards=[row["board_id"]], projects=[row["project_id"]],
         )
-        task_row = cur.fetchone()
-
-        project = None
-        if project_row:
-            project = ProjectInfo(
-                id=str(project_row["id"]),
-                name=project_row["name"],
-                short_name=project_row["short_name"],
-                color=project_row["color"],
-            )
-
-        # board_id が指定された場合のみ board_tasks に追加
-        if body.board_id:
-            # 現在の最大 sort_order を取得
-            cur.execute(
-                "SELECT COALESCE(MAX(sort_order), -1) + 1 AS next_order FROM board_tasks WHERE board_id = %s",
-                (body.board_id,),
-            )
-            next_order = cur.fetchone()["next_order"]
+        conn.commit()
+    return _row_to_response(row)
+
+
+_TASK_FIELD_CASTS = {
+    "title": "",
+    "description": "",
+    "scheduled_start": "::date",
+    "scheduled_end": "::date",
+    "project_id": "::uuid",
+}
+
+
+def _update_task_sql(update_data: dict[str, Any]) -> str:
+    """update_task の検証・更新・並べ替え・バージョンの加算・再取得を 1 文にまとめた SQL を組み立てる"""
+    assignments = [f"{k} = %({k})s{cast}" for k, cast in _TASK_FIELD_CASTS.items() if k in update_data]
+    # archived / completed フラグは archived_at / completed_at に変換
+    for flag, column in (("archived", "archived_at"), ("completed", "completed_at")):
+        if flag in update_data:
+            assignments.append(f"{column} = CASE WHEN %({flag})s THEN CURRENT_TIMESTAMP END")
+
+    move = "board_id" in update_data or "sort_order" in update_data
+    move_board = update_data.get("board_id") is not None
+    move_index = update_data.get("sort_order") is not None
+
+    ctes = [f"""
+        checks AS (
+            SELECT EXISTS (SELECT 1 FROM tasks WHERE id = %(task_id)s) AS task_ok,
+                   {"EXISTS (SELECT 1 FROM board_tasks WHERE task_id = %(task_id)s)" if move else "TRUE"} AS on_board,
+                   {"EXISTS (SELECT 1 FROM boards WHERE id = %(board_id)s::uuid)" if move_board else "TRUE"} AS board_ok,
+                   {"(%(project_id)s::uuid IS NULL OR EXISTS (SELECT 1 FROM projects WHERE id = %(project_id)s::uuid))"
+                    if "project_id" in update_data else "TRUE"} AS project_ok,
+                   (SELECT project_id FROM tasks WHERE id = %(task_id)s) AS previous_project_id
+        )
+    """, """
+        current_bt AS (
+            SELECT board_id, position FROM board_tasks WHERE task_id = %(task_id)s
+        )
+    """]
+    # 移動だけの場合も version を進める。version が一致しなければ何も更新しない（updated が空）
+    assignments = [*assignments, "updated_at = CURRENT_TIMESTAMP"] if assignments else ["version = t.version + 1"]
+    ctes.append(f"""
+        updated AS (
+            UPDATE tasks t
+            SET {", ".join(assignments)}
+            FROM checks c
+            WHERE t.id = %(task_id)s AND c.on_board AND c.board_ok AND c.project_ok
+              AND (%(expected_version)s::bigint IS NULL OR t.version = %(expected_version)s)
+            RETURNING t.*
+        )
+    """)
 
-            # board_tasks に追加
-            cur.execute(
-                "INSERT INTO board_tasks (board_id, task_id, sort_order) VALUES (%s, %s, %s)",
-                (body.board_id, task_row["id"], next_order),
+    if move_index or move_board:
+        if move_index:
+            dest_board = "%(board_id)s::uuid" if move_board else "(SELECT board_id FROM current_bt)"
+            ctes.append(f"dest AS (SELECT {dest_board} AS board_id)")
+        else:
+            # 今と同じ board_id だけの指定は移動ではない（dest が空なら placement も moved も空）
+            ctes.append("""
+                dest AS (
+                    SELECT %(board_id)s::uuid AS board_id
+                    WHERE %(board_id)s::uuid IS DISTINCT FROM (SELECT board_id FROM current_bt)
+                )
+            """)
+        if move_index:
+            # 移動先ボードで sort_order 番目に置いたときの前後のキー（自分とアーカイブ済みは除く）
+            # sort_order - 1 番目から 2 件だけ読み、1 件目を before、2 件目を after とする
+            ctes.append("""
+                window_bt AS (
+                    SELECT position, row_number() OVER (ORDER BY position, task_id) AS rn
+                    FROM (
+                        SELECT bt.position, bt.task_id
+                        FROM board_tasks bt JOIN tasks t ON t.id = bt.task_id
+                        WHERE bt.board_id = (SELECT board_id FROM dest)
+                          AND bt.task_id <> %(task_id)s AND t.archived_at IS NULL
+                        ORDER BY bt.position, bt.task_id
+                        OFFSET GREATEST(%(sort_order)s - 1, 0) LIMIT 2
+                    ) w
+                )
+            """)
+            before = """
+                CASE WHEN %(sort_order)s <= 0 THEN NULL ELSE COALESCE(
+                    (SELECT position FROM window_bt WHERE rn = 1),
+                    (SELECT MAX(position) FROM board_tasks
+                     WHERE board_id = d.board_id AND task_id <> %(task_id)s)
+                ) END
+            """
+            after = "(SELECT position FROM window_bt WHERE rn = CASE WHEN %(sort_order)s <= 0 THEN 1 ELSE 2 END)"
+        else:
+            # ボードだけ変わる場合は移動先の末尾に置く
+            before = "(SELECT MAX(position) FROM board_tasks WHERE board_id = d.board_id)"
+            after = "NULL::double precision"
+        ctes.append(f"""
+            neighbors AS (
+                SELECT d.board_id, {before} AS before, {after} AS after FROM dest d
             )
-            conn.commit()
-
-            return TaskResponse(
-                id=str(task_row["id"]),
-                title=task_row["title"],
-                description=task_row["description"],
-                board_id=body.board_id,
-                sort_order=next_order,
-                scheduled_start=None,
-                scheduled_end=None,
-                completed_at=None,
-                archived_at=None,
-                project=project,
+        """)
+        ctes.append("""
+            placement AS (
+                SELECT board_id, CASE
+                    WHEN before IS NULL AND after IS NULL THEN %(gap)s
+                    WHEN before IS NULL THEN after - %(gap)s
+                    WHEN after IS NULL THEN before + %(gap)s
+                    WHEN before < (before + after) / 2 AND (before + after) / 2 < after THEN (before + after) / 2
+                END AS position
+                FROM neighbors
             )
-        else:
-            # 未割り当てタスク
-            conn.commit()
-            return UnassignedTaskResponse(
-                id=str(task_row["id"]),
-                title=task_row["title"],
-                description=task_row["description"],
-                scheduled_start=None,
-                scheduled_end=None,
-                completed_at=None,
-                archived_at=None,
-                project=project,
+        """)
+        ctes.append("""
+            moved AS (
+                UPDATE board_tasks bt
+                SET board_id = pl.board_id, position = pl.position
+                FROM placement pl, checks c
+                WHERE bt.task_id = %(task_id)s AND pl.position IS NOT NULL
+                  AND c.on_board AND c.board_ok AND c.project_ok AND EXISTS (SELECT 1 FROM updated)
+                RETURNING bt.board_id, bt.position
             )
+        """)
+        needs_rebalance = "EXISTS (SELECT 1 FROM placement WHERE position IS NULL)"
+    else:
+        ctes.append("moved AS (SELECT board_id, position FROM current_bt WHERE false)")
+        needs_rebalance = "FALSE"
+
+    ctes.append("""
+        bumped AS (
+            UPDATE resource_versions SET version = version + 1
+            WHERE resource = 'tasks' AND shard = resource_version_shard() AND EXISTS (SELECT 1 FROM updated)
+        )
+    """)
+
+    # CTE 内の更新は同じ文からは見えないので、他のタスクは更新前の並び、自分は更新後の値で数える
+    return f"""
+        WITH {", ".join(ctes)},
+        final_bt AS (
+            SELECT COALESCE(m.board_id, cb.board_id) AS board_id,
+                   COALESCE(m.position, cb.position) AS position
+            FROM (SELECT 1) one
+            LEFT JOIN moved m ON true
+            LEFT JOIN current_bt cb ON true
+        )
+        SELECT c.task_ok, c.on_board, c.board_ok, c.project_ok, {needs_rebalance} AS needs_rebalance,
+               c.previous_project_id, (SELECT board_id FROM current_bt) AS previous_board_id,
+               u.id, u.title, u.description,
+               u.scheduled_start, u.scheduled_end, u.completed_at, u.archived_at,
+               f.board_id,
+               (SELECT COUNT(*)
+                FROM board_tasks bt2
+                JOIN tasks t2 ON t2.id = bt2.task_id
+                WHERE bt2.board_id = f.board_id AND t2.archived_at IS NULL AND bt2.task_id <> u.id
+                  AND (bt2.position, bt2.task_id) < (f.position, u.id)) AS sort_order,
+               u.project_id,
+               (SELECT total_seconds FROM task_time_totals WHERE task_id = u.id) AS tracked_seconds,
+               u.version
+        FROM checks c
+        CROSS JOIN final_bt f
+        LEFT JOIN updated u ON true
+    """
 
 
 @router.patch("/{task_id}")
-def update_task(task_id: str, body: TaskUpdate) -> TaskResponse | UnassignedTaskResponse:
-    update_data = body.model_dump(exclude_unset=True)
+def update_task(
+    task_id: str, body: TaskUpdate, if_match: str | None = Header(None)
+) -> TaskResponse | UnassignedTaskResponse:
+    expected = expected_version(if_match, body.version)
+    update_data = body.model_dump(exclude_unset=True, exclude={"version"})
     if not update_data:
         raise HTTPException(status_code=400, detail="No fields to update")
 
     with get_conn() as conn, conn.cursor() as cur:
-        # archived フラグの処理（archived_at への変換）
-        extra_clauses = ""
-        if "archived" in update_data:
-            archived = update_data.pop("archived")
-            if archived:
-                extra_clauses += ", archived_at = CURRENT_TIMESTAMP"
-            else:
-                extra_clauses += ", archived_at = NULL"
-
-        # completed フラグの処理（completed_at への変換）
-        if "completed" in update_data:
-            completed = update_data.pop("completed")
-            if completed:
-                extra_clauses += ", completed_at = CURRENT_TIMESTAMP"
-            else:
-                extra_clauses += ", completed_at = NULL"
-
-        # tasks テーブルの更新
-        task_fields = {k: v for k, v in update_data.items() if k in ("title", "description", "scheduled_start", "scheduled_end", "project_id")}
-        if task_fields or extra_clauses:
-            if task_fields:
-                set_clause = ", ".join(f"{k} = %s" for k in task_fields)
-                values = list(task_fields.values())
-                values.append(task_id)
-                cur.execute(
-                    f"""
-                        UPDATE tasks
-                        SET {set_clause}{extra_clauses}, updated_at = CURRENT_TIMESTAMP
-                        WHERE id = %s
-                    """,
-                    values,
-                )
+        if "board_id" in update_data or "sort_order" in update_data:
+            # 前後のキーを読む前に移動元・移動先の並びをロックする
+            lock_task_order(cur, update_data.get("board_id"), task_id)
+        cur.execute(
+            _update_task_sql(update_data),
+            {**update_data, "task_id": task_id, "gap": POSITION_GAP, "expected_version": expected},
+        )
+        row = cur.fetchone()
+        if not row["task_ok"]:
+            raise HTTPException(status_code=404, detail="Task not found")
+        if not row["on_board"]:
+            raise HTTPException(status_code=404, detail="Task not found in any board")
+        if not row["board_ok"]:
+            raise HTTPException(status_code=400, detail=f"Board '{update_data['board_id']}' not found")
+        if not row["project_ok"]:
+            raise HTTPException(status_code=400, detail=f"Project '{update_data['project_id']}' not found")
+        if row["id"] is None:
+            raise _task_conflict(cur, task_id)
+
+        # 移動元のボード・プロジェクトの購読者にも通知する
+        boards = [row["previous_board_id"], row["board_id"]]
+        projects = [row["previous_project_id"], row["project_id"]]
+
+        if row["needs_rebalance"]:
+            # キーの間隔が尽きた場合のみ、再採番してから従来どおり配置し直す
+            new_board_id = update_data.get("board_id") or str(row["board_id"])
+            _rebalance_board(cur, new_board_id)
+            if update_data.get("sort_order") is not None:
+                new_position = _position_for_index(cur, new_board_id, task_id, update_data["sort_order"])
             else:
-                # completed/archived のみ更新の場合
                 cur.execute(
-                    f"""
-                        UPDATE tasks
-                        SET updated_at = CURRENT_TIMESTAMP{extra_clauses}
-                        WHERE id = %s
-                    """,
-                    (task_id,),
+                    "SELECT MAX(position) AS position FROM board_tasks WHERE board_id = %s",
+                    (new_board_id,),
                 )
-
-        # board_tasks の更新（board_id または sort_order が変更された場合）
-        if "board_id" in update_data or "sort_order" in update_data:
-            # 現在の board_tasks を取得
-            cur.execute(
-                "SELECT board_id, sort_order FROM board_tasks WHERE task_id = %s",
-                (task_id,),
-            )
-            current = cur.fetchone()
-            if not current:
-                raise HTTPException(status_code=404, detail="Task not found in any board")
-
-            new_board_id = update_data.get("board_id", str(current["board_id"]))
-            new_sort_order = update_data.get("sort_order", current["sort_order"])
-
-            # 新しい board_id の存在確認
-            if "board_id" in update_data:
-                cur.execute("SELECT id FROM boards WHERE id = %s", (new_board_id,))
-                if not cur.fetchone():
-                    raise HTTPException(status_code=400, detail=f"Board '{new_board_id}' not found")
-
-            # board_tasks を更新
+                new_position = position_between(cur.fetchone()["position"], None)
             cur.execute(
-                """
-                UPDATE board_tasks
-                SET board_id = %s, sort_order = %s
-                WHERE task_id = %s
-                """,
-                (new_board_id, new_sort_order, task_id),
+                "UPDATE board_tasks SET board_id = %s, position = %s WHERE task_id = %s",
+                (new_board_id, new_position, task_id),
             )
+            row = _select_task(cur, task_id)
 
+        publish(cur, "task.updated", _task_event(row), boards=boards, projects=projects)
         conn.commit()
-
-        # 更新後のデータを取得して返す（LEFT JOINで未割り当てタスクにも対応）
-        cur.execute("""
-            SELECT t.id, t.title, t.description,
-                   t.scheduled_start, t.scheduled_end, t.completed_at, t.archived_at,
-                   bt.board_id, bt.sort_order,
-                   p.id AS project_id, p.name AS project_name,
-                   p.short_name AS project_short_name, p.color AS project_color
-            FROM tasks t
-            LEFT JOIN board_tasks bt ON t.id = bt.task_id
-            LEFT JOIN projects p ON t.project_id = p.id
-            WHERE t.id = %s
-        """, (task_id,))
-        row = cur.fetchone()
-        if not row:
-            raise HTTPException(status_code=404, detail="Task not found")
-
-        # board_idがない場合は未割り当てタスク
-        if row["board_id"] is None:
-            project = None
-            if row.get("project_id"):
-                project = ProjectInfo(
-                    id=str(row["project_id"]),
-                    name=row["project_name"],
-                    short_name=row["project_short_name"],
-                    color=row["project_color"],
-                )
-            scheduled_start = row.get("scheduled_start")
-            scheduled_end = row.get("scheduled_end")
-            completed_at = row.get("completed_at")
-            archived_at = row.get("archived_at")
-            return UnassignedTaskResponse(
-                id=str(row["id"]),
-                title=row["title"],
-                description=row["description"],
-                scheduled_start=scheduled_start.isoformat() if scheduled_start else None,
-                scheduled_end=scheduled_end.isoformat() if scheduled_end else None,
-                completed_at=completed_at.isoformat() if completed_at else None,
-                archived_at=archived_at.isoformat() if archived_at else None,
-                project=project,
-            )
-
-        return _row_to_task(row)
+    return _row_to_response(row)
 
 
 class TaskReorder(BaseModel):
     board_id: str
     sort_order: int
+    version: int | None = None  # 指定するとタスクの version が一致するときだけ移動する
 
 
 @router.post("/{task_id}/reorder")
-def reorder_task(task_id: str, body: TaskReorder) -> TaskResponse:
+def reorder_task(task_id: str, body: TaskReorder, if_match: str | None = Header(None)) -> TaskResponse:
+    expected = expected_version(if_match, body.version)
     with get_conn() as conn, conn.cursor() as cur:
-        # タスクの存在確認
-        cur.execute("SELECT id FROM tasks WHERE id = %s", (task_id,))
-        if not cur.fetchone():
-            raise HTTPException(status_code=404, detail="Task not found")
-
-        # 現在のboard_tasks情報を取得
+        # 同時に同じ位置へ動かして同じキーを選ばないよう、移動元・移動先の並びを先にロックする
+        lock_task_order(cur, body.board_id, task_id)
+        # タスクの version を確かめて進める（移動元のボードも通知用に取得）
         cur.execute(
-            "SELECT board_id, sort_order FROM board_tasks WHERE task_id = %s",
-            (task_id,),
+            """
+            UPDATE tasks t SET version = t.version + 1
+            WHERE t.id = %s AND (%s::bigint IS NULL OR t.version = %s)
+            RETURNING t.project_id, (SELECT board_id FROM board_tasks WHERE task_id = t.id) AS board_id
+            """,
+            (task_id, expected, expected),
         )
-        current = cur.fetchone()
+        previous = cur.fetchone()
+        if not previous:
+            raise _task_conflict(cur, task_id)
 
-        new_board_id = body.board_id
-        new_sort_order = body.sort_order
+        # 移動先の前後のキーから新しいキーを決める（他のタスクは書き換えない）
+        new_position = _position_for_index(cur, body.board_id, task_id, body.sort_order)
 
+        cur.execute(
+            """
+            UPDATE board_tasks
+            SET board_id = %s, position = %s
+            WHERE task_id = %s
+            """,
+            (body.board_id, new_position, task_id),
+        )
         # 未割り当てタスクの場合は新規にboard_tasksに追加
-        if not current:
-            # 新ボードで new_sort_order 以降のタスクを +1
-            cur.execute(
-                """
-                UPDATE board_tasks
-                SET sort_order = sort_order + 1
-                WHERE board_id = %s AND sort_order >= %s
-                """,
-                (new_board_id, new_sort_order),
-            )
-            # board_tasksに挿入
-            cur.execute(
-                "INSERT INTO board_tasks (board_id, task_id, sort_order) VALUES (%s, %s, %s)",
-                (new_board_id, task_id, new_sort_order),
-            )
-        else:
-            old_board_id = str(current["board_id"])
-            old_sort_order = current["sort_order"]
-
-            if old_board_id == new_board_id:
-                # 同じボード内での移動
-                if old_sort_order < new_sort_order:
-                    # 下に移動: old_sort_order < x <= new_sort_order のタスクを -1
-                    cur.execute(
-                        """
-                        UPDATE board_tasks
-                        SET sort_order = sort_order - 1
-                        WHERE board_id = %s AND sort_order > %s AND sort_order <= %s
-                        """,
-                        (new_board_id, old_sort_order, new_sort_order),
-                    )
-                elif old_sort_order > new_sort_order:
-                    # 上に移動: new_sort_order <= x < old_sort_order のタスクを +1
-                    cur.execute(
-                        """
-                        UPDATE board_tasks
-                        SET sort_order = sort_order + 1
-                        WHERE board_id = %s AND sort_order >= %s AND sort_order < %s
-                        """,
-                        (new_board_id, new_sort_order, old_sort_order),
-                    )
-            else:
-                # 別ボードへの移動
-                # 元ボードで old_sort_order より後のタスクを -1
-                cur.execute(
-                    """
-                    UPDATE board_tasks
-                    SET sort_order = sort_order - 1
-                    WHERE board_id = %s AND sort_order > %s
-                    """,
-                    (old_board_id, old_sort_order),
-                )
-                # 新ボードで new_sort_order 以降のタスクを +1
-                cur.execute(
-                    """
-                    UPDATE board_tasks
-                    SET sort_order = sort_order + 1
-                    WHERE board_id = %s AND sort_order >= %s
-                    """,
-                    (new_board_id, new_sort_order),
-                )
-
-            # タスク自体の board_id と sort_order を更新
+        if cur.rowcount == 0:
             cur.execute(
-                """
-                UPDATE board_tasks
-                SET board_id = %s, sort_order = %s
-                WHERE task_id = %s
-                """,
-                (new_board_id, new_sort_order, task_id),
+                "INSERT INTO board_tasks (board_id, task_id, position) VALUES (%s, %s, %s)",
+                (body.board_id, task_id, new_position),
             )
 
+        # 更新後のデータを取得して返す
+        row = _select_task(cur, task_id)
+        publish(
+            cur, "task.updated", _task_event(row),
+            boards=[previous["board_id"], body.board_id], projects=[previous["project_id"]],
+        )
+        bump_versions(cur, "tasks")
         conn.commit()
+    return _row_to_task(row)
 
-        # 更新後のデータを取得して返す
-        cur.execute("""
-            SELECT t.id, t.title, t.description,
-                   t.scheduled_start, t.scheduled_end, t.completed_at, t.archived_at,
-                   bt.board_id, bt.sort_order,
-                   p.id AS project_id, p.name AS project_name,
-                   p.short_name AS project_short_name, p.color AS project_color
-            FROM tasks t
-            JOIN board_tasks bt ON t.id = bt.task_id
-            LEFT JOIN projects p ON t.project_id = p.id
-            WHERE t.id = %s
-        """, (task_id,))
-        row = cur.fetchone()
-        return _row_to_task(row)
+
+@router.post("/{task_id}/restore")
+def restore_task(task_id: str) -> TaskResponse | UnassignedTaskResponse:
+    """アーカイブ済みのタスクを作業中に戻す（コールドストレージに移動済みでもよい）"""
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute("SELECT restore_task(%s) AS found", (task_id,))
+        if not cur.fetchone()["found"]:
+            raise HTTPException(status_code=404, detail="Task not found")
+        row = _select_task(cur, task_id)
+        publish(cur, "task.restored", _task_event(row), boards=[row["board_id"]], projects=[row["project_id"]])
+        bump_versions(cur, "tasks")
+        conn.commit()
+    return _row_to_response(row)
 
 
 @router.delete("/{task_id}", status_code=204, response_model=None)
 def delete_task(task_id: str) -> None:
     with get_conn() as conn, conn.cursor() as cur:
         # board_tasks は CASCADE で自動削除される
-        cur.execute("DELETE FROM tasks WHERE id = %s", (task_id,))
-        conn.commit()
-        if cur.rowcount == 0:
+        cur.execute(
+            """
+            DELETE FROM tasks t WHERE id = %s
+            RETURNING t.project_id, (SELECT board_id FROM board_tasks WHERE task_id = t.id) AS board_id
+            """,
+            (task_id,),
+        )
+        row = cur.fetchone()
+        if not row:
+            # コールドストレージに移動済みのタスク（計測区間は CASCADE で消える）
+            cur.execute("DELETE FROM archived_tasks WHERE id = %s RETURNING project_id, board_id", (task_id,))
+            row = cur.fetchone()
+        if not row:
             raise HTTPException(status_code=404, detail="Task not found")
+        publish(
+            cur, "task.deleted", {"id": task_id},
+            boards=[row["board_id"]], projects=[row["project_id"]],
+        )
+        bump_versions(cur, "tasks")
+        conn.commit()
@@ -0,0 +1,79 @@
+from typing import Any, Literal
+
+from fastapi import APIRouter, Header, HTTPException
+from pydantic import BaseModel
+
+from app.database import get_conn
+
+router = APIRouter(prefix="/api/tasks", tags=["timers"])
+
+# 認証が無いので、タイマーの持ち主はヘッダで区別する
+DEFAULT_USER_ID = "default"
+
+
+class TimerResponse(BaseModel):
+    task_id: str
+    state: Literal["running", "paused", "stopped"]
+    started_at: str | None  # 計測中の区間の開始時刻
+    tracked_seconds: float  # 確定済みの区間の合計（計測中の区間は含まない）
+
+
+def _row_to_timer(task_id: str, row: Any) -> TimerResponse:
+    return TimerResponse(
+        task_id=task_id,
+        state=row["state"],
+        started_at=row["started_at"].isoformat() if row["started_at"] else None,
+        tracked_seconds=row["total_seconds"],
+    )
+
+
+def _transition(task_id: str, user_id: str, action: Literal["start", "pause", "stop"]) -> TimerResponse:
+    with get_conn() as conn, conn.cursor() as cur:
+        # 区間の確定・合計の加算・タイマーの更新を 1 回の呼び出しで行う
+        cur.execute("SELECT * FROM timer_transition(%s, %s, %s)", (user_id, task_id, action))
+        row = cur.fetchone()
+        if not row:
+            raise HTTPException(status_code=404, detail="Task not found")
+        conn.commit()
+    return _row_to_timer(task_id, row)
+
+
+@router.get("/{task_id}/timer")
+def get_timer(task_id: str, x_user_id: str = Header(DEFAULT_USER_ID)) -> TimerResponse:
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT CASE
+                       WHEN r.task_id IS NULL THEN 'stopped'
+                       WHEN r.started_at IS NULL THEN 'paused'
+                       ELSE 'running'
+                   END AS state,
+                   r.started_at,
+                   COALESCE(tt.total_seconds, 0) AS total_seconds
+            FROM tasks t
+            LEFT JOIN running_timers r ON r.task_id = t.id AND r.user_id = %s
+            LEFT JOIN task_time_totals tt ON tt.task_id = t.id
+            WHERE t.id = %s
+            """,
+            (x_user_id, task_id),
+        )
+        row = cur.fetchone()
+    if not row:
+        raise HTTPException(status_code=404, detail="Task not found")
+    return _row_to_timer(task_id, row)
+
+
+@router.post("/{task_id}/timer/start")
+def start_timer(task_id: str, x_user_id: str = Header(DEFAULT_USER_ID)) -> TimerResponse:
+    """計測を開始（一時停止中なら再開）。別のタスクで計測中ならそちらを確定して切り替える"""
+    return _transition(task_id, x_user_id, "start")
+
+
+@router.post("/{task_id}/timer/pause")
+def pause_timer(task_id: str, x_user_id: str = Header(DEFAULT_USER_ID)) -> TimerResponse:
+    return _transition(task_id, x_user_id, "pause")
+
+
+@router.post("/{task_id}/timer/stop")
+def stop_timer(task_id: str, x_user_id: str = Header(DEFAULT_USER_ID)) -> TimerResponse:
+    return _transition(task_id, x_user_id, "stop")
@@ -0,0 +1,139 @@
+"""本番用のサーバー起動（複数ワーカー）
+
+    cd backend && python -m app.serve --port 8000
+
+CPU 数（affinity と cgroup のクォータ）に合わせたワーカー数で uvicorn を起動し、
+DB の接続数の上限（DB_CONNECTION_BUDGET。未指定なら max_connections の 8 割）を
+ワーカーで分ける。各ワーカーの接続はプール（DB_POOL_MAX_SIZE）と LISTEN 用の 1 本。
+
+SIGTERM を受けると /api/ready が 503 を返すようになり、新しい接続の受け付けをやめて
+処理中のリクエストを --graceful-timeout 秒まで待ってから終了する。SSE の購読は
+すぐに閉じる（クライアントは Last-Event-ID で別のワーカーに再接続する）。
+開発時は従来どおり uvicorn app.main:app --reload で起動する。
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import math
+import os
+import threading
+from types import FrameType
+
+import psycopg2
+import uvicorn
+from uvicorn.supervisors import Multiprocess
+
+from app.database import DATABASE_URL
+from app.events import broker
+
+logger = logging.getLogger(__name__)
+
+# max_connections を調べられないときの接続数の上限
+DEFAULT_CONNECTION_BUDGET = 50
+# max_connections のうちこのサーバーで使う割合（残りはマイグレーション・バッチ・psql 用）
+CONNECTION_BUDGET_RATIO = 0.8
+# ワーカーごとの LISTEN 用の接続
+LISTEN_CONNECTIONS = 1
+GRACEFUL_TIMEOUT = float(os.environ.get("GRACEFUL_TIMEOUT", "30"))
+
+# SIGTERM を受けてから終了するまでの間セットされる（/api/ready が 503 を返す）
+draining = threading.Event()
+
+
+def available_cpus() -> int:
+    """このプロセスが使える CPU 数（コンテナの CPU クォータも考慮する）"""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            cpus = min(cpus, math.ceil(int(quota) / int(period)))
+    except (OSError, ValueError):
+        pass
+    return max(cpus, 1)
+
+
+def connection_budget(dsn: str) -> int:
+    budget = os.environ.get("DB_CONNECTION_BUDGET")
+    if budget:
+        return int(budget)
+    try:
+        conn = psycopg2.connect(dsn)
+    except psycopg2.OperationalError:
+        logger.warning("Could not read max_connections; using %d connections", DEFAULT_CONNECTION_BUDGET)
+        return DEFAULT_CONNECTION_BUDGET
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT current_setting('max_connections')::int"
+                " - current_setting('superuser_reserved_connections')::int"
+            )
+            available = cur.fetchone()[0]
+    finally:
+        conn.close()
+    return int(available * CONNECTION_BUDGET_RATIO)
+
+
+def pool_size_per_worker(budget: int, workers: int) -> int:
+    size = budget // workers - LISTEN_CONNECTIONS
+    if size < 1:
+        raise SystemExit(f"A budget of {budget} DB connections is too small for {workers} workers")
+    return size
+
+
+class DrainingServer(uvicorn.Server):
+    """終了のシグナルで draining を立て、SSE の購読を閉じてから通常の終了処理に入る"""
+
+    def handle_exit(self, sig: int, frame: FrameType | None) -> None:
+        if not draining.is_set():
+            draining.set()
+            broker.drain()
+        super().handle_exit(sig, frame)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument(
+        "--workers", type=int, default=int(os.environ.get("WEB_CONCURRENCY", "0")),
+        help="ワーカー数（既定は使える CPU 数）",
+    )
+    parser.add_argument("--graceful-timeout", type=float, default=GRACEFUL_TIMEOUT, help="処理中のリクエストを待つ秒数")
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+    logging.basicConfig(level=args.log_level.upper())
+
+    workers = args.workers or available_cpus()
+    # ワーカーは新しいプロセスで app を読み込み直すので、プールの大きさは環境変数で渡す
+    pool_size = pool_size_per_worker(connection_budget(DATABASE_URL), workers)
+    if "DB_POOL_MAX_SIZE" in os.environ:
+        pool_size = min(pool_size, int(os.environ["DB_POOL_MAX_SIZE"]))
+    os.environ["DB_POOL_MAX_SIZE"] = str(pool_size)
+    os.environ.setdefault("DB_POOL_MIN_SIZE", str(min(4, pool_size)))
+    logger.info("Starting %d workers with up to %d DB connections each", workers, pool_size + LISTEN_CONNECTIONS)
+
+    config = uvicorn.Config(
+        "app.main:app",
+        host=args.host,
+        port=args.port,
+        workers=workers,
+        log_level=args.log_level,
+        timeout_graceful_shutdown=args.graceful_timeout,
+        proxy_headers=True,
+    )
+    server = DrainingServer(config)
+    # ワーカーが 1 つでも監視プロセスから起動し、落ちたワーカーを起動し直させる
+    Multiprocess(config, target=server.run, sockets=[config.bind_socket()]).run()
+
+
+if __name__ == "__main__":
+    # ワーカーに DrainingServer を app.serve のクラスとして渡す（__main__ のままだと
+    # ワーカーでは app.main が参照する draining と別のモジュールのものになる）
+    from app.serve import main as serve_main
+    serve_main()
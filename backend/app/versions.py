@@ -0,0 +1,95 @@
+"""リソースごとの変更バージョンと ETag による条件付き GET
+
+書き込み系ルートはコミット直前に bump_versions() で該当リソースのバージョンを上げる。
+GET は not_modified() で現在のバージョンから弱い ETag を作り、If-None-Match が
+一致すれば本体のクエリを実行せずに 304 を返す。プライマリから読んだバージョンは
+メタデータのキャッシュにも伝え、別プロセスで変更されていれば読み直させる
+（レプリカの遅れたバージョンを伝えると、キャッシュが新旧のバージョンを行き来する）。
+
+バージョンは本体より先に読むので、途中で書き込みが入っても古いデータに
+新しい ETag が付くことはない（逆の場合は次回の取得で読み直されるだけ）。
+
+タスク・ボードの行にはそれぞれ version があり（更新のたびにトリガーで加算）、
+PATCH・並べ替えは If-Match かリクエストの version が一致するときだけ適用する。
+一致しなければ VersionConflict を送出し、現在の状態を付けた 409 を返す。
+"""
+
+from __future__ import annotations
+
+from collections.abc import Callable
+from typing import Any, Literal
+
+from fastapi import HTTPException, Request, Response
+from pydantic import BaseModel
+
+from app import cache
+from app.replicas import read_conn
+
+Resource = Literal["boards", "projects", "tasks"]
+
+
+def bump_versions(cur: Any, *resources: Resource) -> None:
+    """行ロックをコミットまで保持するので、トランザクションの最後に呼ぶ
+
+    各リソースの 16 行のうちトランザクションごとに決まる 1 行だけを加算する
+    （同時の書き込みが 1 行の行ロックで直列化されない）。
+    """
+    cur.execute("SELECT bump_resource_versions(%s)", (sorted(resources),))
+
+
+def current_versions() -> tuple[dict[str, int], bool]:
+    """(リソースごとのバージョン, レプリカから読んだか)"""
+    # 本体と同じ読み取り先から読む（レプリカならプライマリより古いバージョンになる）
+    with read_conn() as conn, conn.cursor() as cur:
+        cur.execute("SELECT resource, version, pg_is_in_recovery() AS replica FROM resource_version_totals")
+        rows = cur.fetchall()
+    return {row["resource"]: row["version"] for row in rows}, any(row["replica"] for row in rows)
+
+
+def _matches(if_none_match: str, etag: str) -> bool:
+    # If-None-Match は弱い比較（W/ の有無を無視）
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in if_none_match.split(","))
+
+
+def not_modified(request: Request, response: Response, *resources: Resource) -> None:
+    """resources が変わっていなければ 304 を送出し、変わっていればレスポンスに ETag を付ける"""
+    versions, from_replica = current_versions()
+    if not from_replica:
+        cache.observe_versions(versions)
+    etag = 'W/"' + "-".join(f"{resource}.{versions[resource]}" for resource in sorted(resources)) + '"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _matches(if_none_match, etag):
+        raise HTTPException(status_code=304, headers=headers)
+    response.headers.update(headers)
+
+
+class VersionConflict(Exception):
+    """行の version が期待したものと違った（main.py で 409 に変換する）
+
+    current は現在の状態を組み立てる関数。プロジェクト情報などをキャッシュから
+    付けるので、接続を返した後（例外ハンドラ）で呼ぶ。
+    """
+
+    def __init__(self, current: Callable[[], BaseModel]) -> None:
+        super().__init__("Version conflict")
+        self.current = current
+
+
+def expected_version(if_match: str | None, version: int | None) -> int | None:
+    """If-Match ヘッダ（"3" / W/"3" / 3）かリクエストの version から期待するバージョンを返す
+
+    どちらも無いか If-Match が * の場合は None（確認しない）。
+    """
+    header_version = None
+    if if_match is not None and if_match.strip() != "*":
+        tag = if_match.strip().removeprefix("W/").strip('"')
+        if not tag.isdigit():
+            raise HTTPException(status_code=400, detail="Invalid If-Match header")
+        header_version = int(tag)
+    if header_version is not None and version is not None and header_version != version:
+        raise HTTPException(status_code=400, detail="If-Match and version disagree")
+    return header_version if header_version is not None else version
@@ -0,0 +1,384 @@
+"""API の負荷試験（読み取り・ドラッグ・書き込みの混合）
+
+    cd backend && python -m benchmarks.seed --tasks 100000 --truncate
+    cd backend && python -m benchmarks.load --duration 30 --concurrency 16 --mix read=70,drag=20,write=10
+    cd backend && python -m benchmarks.load --compare benchmarks/results/load-20260101-120000.json
+
+--url を省略すると uvicorn で app.main:app を別プロセスで起動し（--workers）、終了時に止める。
+対象のタスク・ボード・プロジェクトは DATABASE_URL の DB から抜き出す（先に seed で投入しておく）。
+--concurrency 本のスレッドがそれぞれ keep-alive の接続で --duration 秒リクエストを送り続け、
+エンドポイントごとのスループットと p50 / p95 / p99 を表示して --output（既定は
+benchmarks/results/load-<日時>.json）に保存する。--compare に以前の結果を渡すと差分も表示する。
+書き込みで作ったタスクと、負荷をかけたユーザーのタイマーは終了時に削除する。
+"""
+
+from __future__ import annotations
+
+import argparse
+import http.client
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+from collections.abc import Callable
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+from urllib.parse import urlsplit
+
+from app.database import get_conn, pool
+from app.versions import bump_versions
+
+RESULTS_DIR = Path(__file__).parent / "results"
+# 抜き出すタスクの数（ドラッグ・更新の対象）
+SAMPLE_TASKS = 2000
+# ドラッグのうち別のボードへ移す割合
+CROSS_BOARD_RATIO = 0.2
+# タイマーを操作するユーザー（終了時にタイマーを止める）
+LOAD_USER_PREFIX = "load-"
+SEARCH_WORDS = ("report", "invoice", "dashboard", "search", "export", "timer")
+
+
+class Dataset:
+    """リクエストの対象にする id。書き込みで作ったタスクも追加していく"""
+
+    def __init__(self) -> None:
+        with get_conn() as conn, conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT b.id, count(t.id) AS size
+                FROM boards b
+                LEFT JOIN board_tasks bt ON bt.board_id = b.id
+                LEFT JOIN tasks t ON t.id = bt.task_id AND t.archived_at IS NULL
+                GROUP BY b.id
+                """
+            )
+            self.board_sizes = {str(row["id"]): row["size"] for row in cur.fetchall()}
+            cur.execute("SELECT id FROM projects")
+            self.project_ids = [str(row["id"]) for row in cur.fetchall()]
+            cur.execute(
+                """
+                SELECT bt.task_id, bt.board_id FROM board_tasks bt
+                JOIN tasks t ON t.id = bt.task_id
+                WHERE t.archived_at IS NULL
+                ORDER BY random() LIMIT %s
+                """,
+                (SAMPLE_TASKS,),
+            )
+            # (task_id, 抜き出した時点のボード)
+            self.tasks = [(str(row["task_id"]), str(row["board_id"])) for row in cur.fetchall()]
+            cur.execute(
+                """
+                SELECT (SELECT count(*) FROM tasks) AS tasks,
+                       (SELECT count(*) FROM archived_tasks) AS archived_tasks,
+                       (SELECT count(*) FROM board_tasks) AS board_tasks,
+                       (SELECT count(*) FROM boards) AS boards,
+                       (SELECT count(*) FROM projects) AS projects
+                """
+            )
+            self.counts = dict(cur.fetchone())
+        if not self.board_sizes or not self.tasks:
+            raise SystemExit("No boards or tasks to drive; run python -m benchmarks.seed first")
+        self.board_ids = list(self.board_sizes)
+        self.created: list[str] = []
+        self._lock = threading.Lock()
+
+    def add_created(self, task_id: str) -> None:
+        with self._lock:
+            self.created.append(task_id)
+
+
+Request = tuple[str, str, dict[str, Any] | None]  # (method, path, body)
+
+
+def _list_tasks(rng: random.Random, data: Dataset) -> Request:
+    return "GET", f"/api/tasks?board_id={rng.choice(data.board_ids)}&limit=50", None
+
+
+def _list_all_tasks(rng: random.Random, data: Dataset) -> Request:
+    return "GET", "/api/tasks?limit=50", None
+
+
+def _list_project_tasks(rng: random.Random, data: Dataset) -> Request:
+    return "GET", f"/api/projects/{rng.choice(data.project_ids)}/tasks?archived=false&limit=50", None
+
+
+def _list_unassigned(rng: random.Random, data: Dataset) -> Request:
+    return "GET", "/api/tasks/unassigned?limit=50", None
+
+
+def _board_state(rng: random.Random, data: Dataset) -> Request:
+    return "GET", "/api/board-state", None
+
+
+def _search(rng: random.Random, data: Dataset) -> Request:
+    return "GET", f"/api/tasks/search?q={rng.choice(SEARCH_WORDS)}&limit=20", None
+
+
+def _reorder(rng: random.Random, data: Dataset) -> Request:
+    # 多くは同じボード内の並べ替えで、一部を別のボードへ移す
+    task_id, board_id = rng.choice(data.tasks)
+    if rng.random() < CROSS_BOARD_RATIO:
+        board_id = rng.choice(data.board_ids)
+    body = {"board_id": board_id, "sort_order": rng.randrange(max(data.board_sizes[board_id], 1))}
+    return "POST", f"/api/tasks/{task_id}/reorder", body
+
+
+def _create_task(rng: random.Random, data: Dataset) -> Request:
+    body = {
+        "title": f"load test task {rng.getrandbits(32):08x}",
+        "board_id": rng.choice(data.board_ids),
+        "project_id": rng.choice(data.project_ids) if data.project_ids else None,
+    }
+    return "POST", "/api/tasks", body
+
+
+def _update_task(rng: random.Random, data: Dataset) -> Request:
+    body = {"title": f"updated {rng.getrandbits(32):08x}"}
+    return "PATCH", f"/api/tasks/{rng.choice(data.tasks)[0]}", body
+
+
+def _start_timer(rng: random.Random, data: Dataset) -> Request:
+    return "POST", f"/api/tasks/{rng.choice(data.tasks)[0]}/timer/start", None
+
+
+# 種類 -> [(エンドポイント名, 重み, リクエストを作る関数)]
+OPERATIONS: dict[str, list[tuple[str, int, Callable[[random.Random, Dataset], Request]]]] = {
+    "read": [
+        ("list_tasks", 40, _list_tasks),
+        ("list_tasks (all boards)", 10, _list_all_tasks),
+        ("list_project_tasks", 20, _list_project_tasks),
+        ("list_unassigned_tasks", 10, _list_unassigned),
+        ("search_tasks", 15, _search),
+        ("board_state", 5, _board_state),
+    ],
+    "drag": [
+        ("reorder_task", 1, _reorder),
+    ],
+    "write": [
+        ("create_task", 40, _create_task),
+        ("update_task", 40, _update_task),
+        ("start_timer", 20, _start_timer),
+    ],
+}
+
+
+def _parse_mix(value: str) -> dict[str, int]:
+    mix = {}
+    for part in value.split(","):
+        kind, _, weight = part.partition("=")
+        if kind not in OPERATIONS or not weight.isdigit():
+            raise argparse.ArgumentTypeError(f"invalid mix entry {part!r} (kinds: {', '.join(OPERATIONS)})")
+        mix[kind] = int(weight)
+    return mix
+
+
+class Worker(threading.Thread):
+    def __init__(self, url: str, data: Dataset, mix: dict[str, int], seed: int, stop_at: float) -> None:
+        super().__init__(daemon=True)
+        parts = urlsplit(url)
+        self.host, self.port = parts.hostname or "localhost", parts.port or 80
+        self.data = data
+        self.rng = random.Random(seed)
+        self.kinds, self.kind_weights = list(mix), list(mix.values())
+        self.stop_at = stop_at
+        # エンドポイント名 -> レイテンシ（秒）, エラー数
+        self.samples: dict[str, list[float]] = defaultdict(list)
+        self.errors: dict[str, int] = defaultdict(int)
+
+    def _next(self) -> tuple[str, Request]:
+        kind = self.rng.choices(self.kinds, self.kind_weights)[0]
+        ops = OPERATIONS[kind]
+        name, _, build = self.rng.choices(ops, [weight for _, weight, _ in ops])[0]
+        return name, build(self.rng, self.data)
+
+    def run(self) -> None:
+        conn = http.client.HTTPConnection(self.host, self.port, timeout=60)
+        # 計測中のタイマーはユーザーごとに 1 つなので、スレッドごとに別のユーザーにする
+        headers = {"Content-Type": "application/json", "X-User-Id": f"{LOAD_USER_PREFIX}{self.name}"}
+        while time.perf_counter() < self.stop_at:
+            name, (method, path, body) = self._next()
+            payload = json.dumps(body) if body is not None else None
+            started = time.perf_counter()
+            try:
+                conn.request(method, path, body=payload, headers=headers)
+                response = conn.getresponse()
+                content = response.read()
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                self.errors[name] += 1
+                continue
+            self.samples[name].append(time.perf_counter() - started)
+            if response.status >= 400:
+                self.errors[name] += 1
+            elif name == "create_task":
+                self.data.add_created(json.loads(content)["id"])
+        conn.close()
+
+
+def _run(url: str, data: Dataset, mix: dict[str, int], concurrency: int, duration: float, seed: int) -> list[Worker]:
+    stop_at = time.perf_counter() + duration
+    workers = [Worker(url, data, mix, seed * 1000 + i, stop_at) for i in range(concurrency)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return workers
+
+
+def _percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+def _summarize(samples: list[float], errors: int, duration: float) -> dict[str, float | int]:
+    return {
+        "requests": len(samples),
+        "errors": errors,
+        "rps": round(len(samples) / duration, 2),
+        "mean_ms": round(statistics.fmean(samples) * 1000, 3),
+        "p50_ms": round(_percentile(samples, 0.50) * 1000, 3),
+        "p95_ms": round(_percentile(samples, 0.95) * 1000, 3),
+        "p99_ms": round(_percentile(samples, 0.99) * 1000, 3),
+    }
+
+
+def _report(workers: list[Worker], duration: float) -> dict[str, Any]:
+    samples: dict[str, list[float]] = defaultdict(list)
+    errors: dict[str, int] = defaultdict(int)
+    for worker in workers:
+        for name, values in worker.samples.items():
+            samples[name].extend(values)
+        for name, count in worker.errors.items():
+            errors[name] += count
+    endpoints = {name: _summarize(values, errors[name], duration) for name, values in sorted(samples.items())}
+    everything = [value for values in samples.values() for value in values]
+    total = _summarize(everything, sum(errors.values()), duration) if everything else {}
+    return {"endpoints": endpoints, "total": total}
+
+
+def _print(results: dict[str, Any], baseline: dict[str, Any] | None) -> None:
+    header = f"{'endpoint':<24} {'reqs':>7} {'err':>5} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"
+    print(header + ("   vs baseline (req/s, p95)" if baseline else ""))
+    rows = [*results["endpoints"].items(), ("total", results["total"])]
+    for name, row in rows:
+        line = (
+            f"{name:<24} {row['requests']:>7} {row['errors']:>5} {row['rps']:>9.1f} "
+            f"{row['p50_ms']:>8.2f} {row['p95_ms']:>8.2f} {row['p99_ms']:>8.2f}"
+        )
+        base = (baseline or {}).get("endpoints", {}).get(name) if name != "total" else (baseline or {}).get("total")
+        if base:
+            line += f"   {_change(row['rps'], base['rps']):>7} {_change(row['p95_ms'], base['p95_ms']):>7}"
+        print(line)
+
+
+def _change(value: float, base: float) -> str:
+    return f"{(value - base) / base * 100:+.1f}%" if base else "-"
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=Path(__file__).parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _start_server(port: int, workers: int) -> subprocess.Popen[bytes]:
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning", "--no-access-log"],
+        cwd=Path(__file__).parent.parent,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise SystemExit("uvicorn exited during startup")
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request("GET", "/api/health")
+            if conn.getresponse().status == 200:
+                return server
+        except OSError:
+            time.sleep(0.2)
+    server.terminate()
+    raise SystemExit("uvicorn did not become ready within 30s")
+
+
+def _cleanup(task_ids: list[str]) -> None:
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute("DELETE FROM running_timers WHERE user_id LIKE %s", (LOAD_USER_PREFIX + "%",))
+        cur.execute("DELETE FROM tasks WHERE id = ANY(%s::uuid[])", (task_ids,))
+        bump_versions(cur, "tasks")
+        conn.commit()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="既に起動しているサーバー（例: http://localhost:8000）")
+    parser.add_argument("--port", type=int, default=8765, help="--url を省略したときに起動するポート")
+    parser.add_argument("--workers", type=int, default=1, help="--url を省略したときの uvicorn のワーカー数")
+    parser.add_argument("--duration", type=float, default=30, help="計測する秒数")
+    parser.add_argument("--warmup", type=float, default=3, help="計測前に同じ負荷をかける秒数")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--mix", type=_parse_mix, default="read=70,drag=20,write=10")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--label", help="結果に残す名前（変更内容など）")
+    parser.add_argument("--output", type=Path, help="結果の JSON の保存先")
+    parser.add_argument("--compare", type=Path, help="比較する以前の結果の JSON")
+    args = parser.parse_args()
+
+    baseline = json.loads(args.compare.read_text()) if args.compare else None
+    pool.open()
+    server = None
+    try:
+        data = Dataset()
+        url = args.url
+        if url is None:
+            server = _start_server(args.port, args.workers)
+            url = f"http://127.0.0.1:{args.port}"
+        print(f"{data.counts} / {url} / mix {args.mix} / concurrency {args.concurrency}")
+        try:
+            if args.warmup:
+                _run(url, data, args.mix, args.concurrency, args.warmup, args.seed + 1)
+            results = _report(_run(url, data, args.mix, args.concurrency, args.duration, args.seed), args.duration)
+        finally:
+            _cleanup(data.created)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+        pool.close()
+
+    if not results["total"]:
+        raise SystemExit("No requests completed")
+    _print(results, baseline)
+    record = {
+        "label": args.label,
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "git_commit": _git_commit(),
+        "url": args.url,
+        "workers": args.workers if args.url is None else None,
+        "duration": args.duration,
+        "concurrency": args.concurrency,
+        "mix": args.mix,
+        "seed": args.seed,
+        "cpu_count": os.cpu_count(),
+        "dataset": data.counts,
+        **results,
+    }
+    output = args.output or RESULTS_DIR / f"load-{datetime.now():%Y%m%d-%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(record, indent=2) + "\n")
+    print(f"saved {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""主要なクエリが大量データでもインデックスで引けているかの確認
+
+    cd backend && python -m benchmarks.query_plans --tasks 200000
+
+DATABASE_URL の DB にトランザクション内でタスクを投入して ANALYZE し、
+一覧・並べ替えなどのクエリの実行計画（EXPLAIN）に tasks / board_tasks の
+Seq Scan が無いことを確認する。最後にロールバックするのでデータは残らない。
+1 つでも Seq Scan があれば計画を表示して終了コード 1 で終わる。
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from collections.abc import Callable
+from typing import Any
+
+from app.database import get_conn, pool
+from app.routers.projects import project_tasks_query
+from app.routers.tasks import (
+    ACTIVE_BOARD_POSITIONS_SQL,
+    TASK_SORT_ORDER_SQL,
+    list_tasks_query,
+    unassigned_tasks_query,
+)
+
+# 全件を読むと件数に比例して遅くなるテーブル
+HOT_TABLES = {"tasks", "board_tasks", "archived_tasks", "time_entries"}
+PAGE_SIZE = 50
+
+# (名前, 投入したデータの id {board_id, project_id, task_id} から (SQL, パラメータ) を作る関数)。
+# 一覧はルートと同じ組み立て関数を使う（ルートのクエリを変えると、ここで確かめる計画も変わる）
+QUERIES: list[tuple[str, Callable[[dict[str, str]], tuple[str, list[Any]]]]] = [
+    ("list_tasks (board)", lambda ids: list_tasks_query(board_id=ids["board_id"], limit=PAGE_SIZE)),
+    ("list_tasks (all boards)", lambda ids: list_tasks_query(limit=PAGE_SIZE)),
+    ("list_unassigned_tasks", lambda ids: unassigned_tasks_query(limit=PAGE_SIZE)),
+    ("list_project_tasks", lambda ids: project_tasks_query(ids["project_id"], archived=False, limit=PAGE_SIZE)),
+    ("list_project_tasks (with archived)", lambda ids: project_tasks_query(ids["project_id"], limit=PAGE_SIZE)),
+    ("task sort_order", lambda ids: (
+        f"SELECT {TASK_SORT_ORDER_SQL} AS sort_order FROM board_tasks bt WHERE bt.task_id = %s",
+        [ids["task_id"]],
+    )),
+    ("reorder neighbors", lambda ids: (
+        ACTIVE_BOARD_POSITIONS_SQL + " OFFSET %s LIMIT 2", [ids["board_id"], ids["task_id"], 100],
+    )),
+    # move_archived_tasks() の中のクエリ（関数の中は EXPLAIN できないので、db/012 と揃えておく）
+    ("move_archived_tasks", lambda ids: ("""
+        SELECT t.id FROM tasks t
+        WHERE t.archived_at < CURRENT_TIMESTAMP - interval '30 days'
+          AND NOT EXISTS (SELECT 1 FROM running_timers r WHERE r.task_id = t.id)
+        ORDER BY t.archived_at
+        LIMIT 1000
+    """, [])),
+]
+
+
+def seed(cur: Any, tasks: int, projects: int, boards: int) -> dict[str, str]:
+    """ボード割り当て・未割り当て・アーカイブ済みが混ざったタスクを作る"""
+    cur.execute(
+        "INSERT INTO projects (name, short_name, sort_order) "
+        "SELECT 'plan ' || i, 'P' || i, 1000 + i FROM generate_series(1, %s) AS i RETURNING id",
+        (projects,),
+    )
+    project_ids = [row["id"] for row in cur.fetchall()]
+    cur.execute(
+        "INSERT INTO boards (label, position) "
+        "SELECT 'plan ' || i, 1000 + i FROM generate_series(1, %s) AS i RETURNING id",
+        (boards,),
+    )
+    board_ids = [row["id"] for row in cur.fetchall()]
+    cur.execute(
+        """
+        INSERT INTO tasks (title, project_id, created_at, archived_at)
+        SELECT 'plan ' || i,
+               (%(project_ids)s::uuid[])[1 + i %% %(projects)s],
+               CURRENT_TIMESTAMP - make_interval(secs => i),
+               CASE WHEN i %% 10 = 0 THEN CURRENT_TIMESTAMP - make_interval(days => i %% 60) END
+        FROM generate_series(1, %(tasks)s) AS i
+        """,
+        {"project_ids": project_ids, "projects": projects, "tasks": tasks},
+    )
+    # 7 割をボードに割り当てる
+    cur.execute(
+        """
+        INSERT INTO board_tasks (board_id, task_id, position)
+        SELECT (%(board_ids)s::uuid[])[1 + n %% %(boards)s], id, n * 1024
+        FROM (SELECT id, row_number() OVER (ORDER BY id) AS n FROM tasks) t
+        WHERE n %% 10 < 7
+        """,
+        {"board_ids": board_ids, "boards": boards},
+    )
+    cur.execute("ANALYZE tasks")
+    cur.execute("ANALYZE board_tasks")
+    cur.execute("SELECT task_id FROM board_tasks WHERE board_id = %s LIMIT 1", (board_ids[0],))
+    task_id = cur.fetchone()["task_id"]
+    return {"board_id": board_ids[0], "project_id": project_ids[0], "task_id": task_id}
+
+
+def seq_scans(plan: dict[str, Any]) -> list[str]:
+    """EXPLAIN (FORMAT JSON) の計画から、HOT_TABLES を Seq Scan している箇所のテーブル名"""
+    found = []
+    if plan["Node Type"] == "Seq Scan" and plan["Relation Name"] in HOT_TABLES:
+        found.append(plan["Relation Name"])
+    for child in plan.get("Plans", []):
+        found.extend(seq_scans(child))
+    return found
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tasks", type=int, default=200_000)
+    parser.add_argument("--projects", type=int, default=50)
+    parser.add_argument("--boards", type=int, default=10)
+    args = parser.parse_args()
+
+    pool.open()
+    failed = False
+    try:
+        with get_conn() as conn, conn.cursor() as cur:
+            try:
+                ids = seed(cur, args.tasks, args.projects, args.boards)
+                print(f"{'query':<36} {'ms':>8}  plan")
+                for name, build in QUERIES:
+                    sql, params = build(ids)
+                    cur.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+                    plan = cur.fetchone()["QUERY PLAN"][0]["Plan"]
+                    started = time.perf_counter()
+                    cur.execute(sql, params)
+                    cur.fetchall()
+                    elapsed = (time.perf_counter() - started) * 1000
+                    scans = seq_scans(plan)
+                    print(f"{name:<36} {elapsed:>8.2f}  {'Seq Scan on ' + ', '.join(scans) if scans else 'ok'}")
+                    if scans:
+                        failed = True
+                        cur.execute("EXPLAIN " + sql, params)
+                        print("\n".join("    " + row["QUERY PLAN"] for row in cur.fetchall()))
+            finally:
+                conn.rollback()
+    finally:
+        pool.close()
+    if failed:
+        print("seq scan found on a hot table", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
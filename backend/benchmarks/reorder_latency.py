@@ -0,0 +1,89 @@
+"""ボードの大きさごとのドラッグ（reorder_task）レイテンシ計測
+
+    cd backend && python -m benchmarks.reorder_latency --sizes 100 1000 10000
+
+DATABASE_URL の DB に一時的なボードとタスクを作成し、終了時に削除する。
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import statistics
+import time
+
+from app.database import get_conn, pool
+from app.routers.tasks import TaskReorder, reorder_task
+
+
+def _create_board(size: int) -> tuple[str, list[str]]:
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute(
+            "INSERT INTO boards (label, position) VALUES (%s, -1) RETURNING id",
+            (f"bench-{size}",),
+        )
+        board_id = str(cur.fetchone()["id"])
+        cur.execute(
+            """
+            WITH new_tasks AS (
+                INSERT INTO tasks (title)
+                SELECT 'bench ' || i FROM generate_series(1, %s) AS i
+                RETURNING id
+            )
+            INSERT INTO board_tasks (board_id, task_id, position)
+            SELECT %s, id, row_number() OVER () * 1024 FROM new_tasks
+            RETURNING task_id
+            """,
+            (size, board_id),
+        )
+        task_ids = [str(row["task_id"]) for row in cur.fetchall()]
+        conn.commit()
+    return board_id, task_ids
+
+
+def _drop_board(board_id: str, task_ids: list[str]) -> None:
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute("DELETE FROM tasks WHERE id = ANY(%s::uuid[])", (task_ids,))
+        cur.execute("DELETE FROM boards WHERE id = %s", (board_id,))
+        conn.commit()
+
+
+def _percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--moves", type=int, default=200, help="ボードごとの移動回数")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    pool.open()
+    print(f"{'tasks':>8} {'moves':>6} {'mean ms':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    try:
+        for size in args.sizes:
+            board_id, task_ids = _create_board(size)
+            try:
+                samples = []
+                for _ in range(args.moves):
+                    task_id = rng.choice(task_ids)
+                    body = TaskReorder(board_id=board_id, sort_order=rng.randrange(size))
+                    started = time.perf_counter()
+                    reorder_task(task_id, body, if_match=None)
+                    samples.append((time.perf_counter() - started) * 1000)
+                print(
+                    f"{size:>8} {args.moves:>6} {statistics.fmean(samples):>9.2f} "
+                    f"{_percentile(samples, 0.50):>8.2f} {_percentile(samples, 0.95):>8.2f} "
+                    f"{_percentile(samples, 0.99):>8.2f}"
+                )
+            finally:
+                _drop_board(board_id, task_ids)
+    finally:
+        pool.close()
+
+
+if __name__ == "__main__":
+    main()
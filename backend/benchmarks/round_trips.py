@@ -0,0 +1,95 @@
+"""エンドポイントごとの DB ラウンドトリップ数とレイテンシの計測
+
+    cd backend && python -m benchmarks.round_trips --repeat 200
+
+cursor.execute の呼び出し回数を数える。DATABASE_URL の DB に一時的な
+ボードとタスクを作成し、終了時に削除する。
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import time
+from collections.abc import Callable
+from typing import Any
+
+import psycopg2
+from psycopg2.extras import RealDictCursor
+
+from app import database
+from app.routers.tasks import TaskCreate, TaskReorder, TaskUpdate, create_task, reorder_task, update_task
+from app.routers.timers import pause_timer, start_timer
+
+_round_trips = 0
+
+
+class _CountingCursor(RealDictCursor):
+    def execute(self, query: Any, vars: Any = None) -> None:
+        global _round_trips
+        _round_trips += 1
+        super().execute(query, vars)
+
+
+class _CountingPool(database.ConnectionPool):
+    def _connect(self) -> Any:
+        pooled = super()._connect()
+        pooled.conn.cursor_factory = _CountingCursor
+        return pooled
+
+
+def _measure(name: str, repeat: int, call: Callable[[int], Any]) -> None:
+    global _round_trips
+    trips, samples = [], []
+    for i in range(repeat):
+        _round_trips = 0
+        started = time.perf_counter()
+        call(i)
+        samples.append((time.perf_counter() - started) * 1000)
+        trips.append(_round_trips)
+    print(f"{name:<32} {statistics.fmean(trips):>11.1f} {statistics.fmean(samples):>9.2f} {statistics.median(samples):>8.2f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=100)
+    args = parser.parse_args()
+
+    database.pool = _CountingPool(database.DATABASE_URL)
+    database.pool.open()
+    with psycopg2.connect(database.DATABASE_URL, cursor_factory=RealDictCursor) as conn, conn.cursor() as cur:
+        cur.execute("INSERT INTO boards (label, position) VALUES ('bench-a', -2), ('bench-b', -1) RETURNING id")
+        board_a, board_b = (str(row["id"]) for row in cur.fetchall())
+        cur.execute("INSERT INTO projects (name, short_name) VALUES ('bench', 'bench') RETURNING id")
+        project_id = str(cur.fetchone()["id"])
+
+    created: list[str] = []
+    print(f"{'endpoint':<32} {'round trips':>11} {'mean ms':>9} {'p50 ms':>8}")
+    try:
+        _measure("create_task (board)", args.repeat, lambda i: created.append(create_task(
+            TaskCreate(title=f"bench {i}", board_id=board_a, project_id=project_id)).id))
+        _measure("create_task (unassigned)", args.repeat, lambda i: created.append(create_task(
+            TaskCreate(title=f"bench {i}")).id))
+        _measure("update_task (title)", args.repeat, lambda i: update_task(
+            created[i], TaskUpdate(title=f"renamed {i}"), if_match=None))
+        _measure("update_task (flags + project)", args.repeat, lambda i: update_task(
+            created[i], TaskUpdate(completed=True, archived=False, project_id=None), if_match=None))
+        _measure("update_task (board)", args.repeat, lambda i: update_task(
+            created[i], TaskUpdate(board_id=board_b), if_match=None))
+        _measure("update_task (sort_order)", args.repeat, lambda i: update_task(
+            created[i], TaskUpdate(sort_order=i // 2), if_match=None))
+        _measure("reorder_task", args.repeat, lambda i: reorder_task(
+            created[i], TaskReorder(board_id=board_a, sort_order=i // 2), if_match=None))
+        _measure("start_timer (switch task)", args.repeat, lambda i: start_timer(created[i], "bench"))
+        _measure("pause_timer", args.repeat, lambda i: pause_timer(created[i], "bench"))
+    finally:
+        database.pool.close()
+        with psycopg2.connect(database.DATABASE_URL) as conn, conn.cursor() as cur:
+            cur.execute("DELETE FROM running_timers WHERE user_id = 'bench'")
+            cur.execute("DELETE FROM tasks WHERE id = ANY(%s::uuid[])", (created,))
+            cur.execute("DELETE FROM boards WHERE id IN (%s, %s)", (board_a, board_b))
+            cur.execute("DELETE FROM projects WHERE id = %s", (project_id,))
+
+
+if __name__ == "__main__":
+    main()
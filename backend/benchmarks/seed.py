@@ -0,0 +1,210 @@
+"""負荷試験用の合成データの投入
+
+    cd backend && python -m benchmarks.seed --tasks 100000 --truncate
+
+DATABASE_URL の DB にプロジェクト・ボード・タスク・計測区間を COPY で投入する。
+同じ --seed と引数なら同じデータ（id を含む。日時は実行時刻からの相対）になる。
+
+    - ボードとプロジェクトの大きさは Zipf 風に偏らせる（--skew。0 で均等）
+    - --unassigned-ratio のタスクはボードに割り当てない
+    - --completed-ratio は完了、--archived-ratio はアーカイブ済み（過去 120 日に分散。
+      --move-archived を付けると python -m app.archive と同じくコールドストレージへ移す）
+    - --tracked-ratio のタスクに 1〜4 件の計測区間を付ける
+
+--truncate は投入前にタスク・ボード・プロジェクトと変更履歴をすべて削除する（ベンチマーク用の DB 専用）。
+付けなければ既存のデータに追加する。--batch-size 件ごとにコミットする。
+"""
+
+from __future__ import annotations
+
+import argparse
+import io
+import itertools
+import random
+import time
+import uuid
+from collections.abc import Iterable, Sequence
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+from app import archive
+from app.database import get_conn, pool
+from app.ordering import POSITION_GAP
+from app.routers.timers import DEFAULT_USER_ID
+from app.versions import bump_versions
+
+COLORS = ("#fce4ec", "#fff3e0", "#e3f2fd", "#e8f5e9", "#f3e5f5", "#fffde7", "#e0f7fa", "#efebe9")
+VERBS = ("Fix", "Write", "Review", "Plan", "Refactor", "Test", "Deploy", "Design", "Update", "Investigate")
+NOUNS = ("login flow", "report", "invoice", "dashboard", "API docs", "release notes", "backup job",
+         "onboarding", "search", "billing page", "timer UI", "export")
+# プロジェクトに属さないタスクの割合
+NO_PROJECT_RATIO = 0.15
+
+
+def _uuid(rng: random.Random) -> str:
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def _cum_weights(n: int, skew: float) -> list[float]:
+    """i 番目の重みが 1 / (i + 1)^skew の累積重み"""
+    return list(itertools.accumulate(1 / (i + 1) ** skew for i in range(n)))
+
+
+def _copy(cur: Any, table: str, columns: Sequence[str], rows: Iterable[Sequence[Any]]) -> None:
+    """rows を COPY で投入する（値にタブ・改行・バックスラッシュは含めない）"""
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write("\t".join(r"\N" if value is None else str(value) for value in row))
+        buffer.write("\n")
+    buffer.seek(0)
+    cur.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN", buffer)
+
+
+def _truncate(cur: Any) -> None:
+    # 差分同期のトークンは古い履歴を前提にするので、消した位置を horizon にしてリセットさせる
+    cur.execute(
+        """
+        TRUNCATE projects, boards, tasks, archived_tasks, change_log, report_daily, report_dirty_days CASCADE
+        """
+    )
+    cur.execute("UPDATE change_log_horizon SET txid = pg_current_xact_id()")
+
+
+def seed(
+    *,
+    tasks: int,
+    projects: int,
+    boards: int,
+    unassigned_ratio: float,
+    completed_ratio: float,
+    archived_ratio: float,
+    tracked_ratio: float,
+    skew: float,
+    seed: int,
+    batch_size: int,
+    truncate: bool,
+) -> None:
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+
+    with get_conn() as conn, conn.cursor() as cur:
+        if truncate:
+            _truncate(cur)
+        cur.execute("SELECT COALESCE(MAX(sort_order), -1) + 1 AS next FROM projects")
+        first_project = cur.fetchone()["next"]
+        cur.execute("SELECT COALESCE(MAX(position), 0) AS tail FROM boards")
+        board_tail = cur.fetchone()["tail"]
+
+        project_ids = [_uuid(rng) for _ in range(projects)]
+        _copy(cur, "projects", ("id", "name", "short_name", "color", "sort_order"), (
+            (project_id, f"Project {first_project + i}", f"P{first_project + i}", COLORS[i % len(COLORS)],
+             first_project + i)
+            for i, project_id in enumerate(project_ids)
+        ))
+        board_ids = [_uuid(rng) for _ in range(boards)]
+        _copy(cur, "boards", ("id", "label", "color", "position"), (
+            (board_id, f"Board {i + 1}", COLORS[i % len(COLORS)], board_tail + (i + 1) * POSITION_GAP)
+            for i, board_id in enumerate(board_ids)
+        ))
+        conn.commit()
+
+    project_weights = _cum_weights(projects, skew) if projects else []
+    board_weights = _cum_weights(boards, skew) if boards else []
+    board_positions = dict.fromkeys(board_ids, 0.0)
+    started = time.perf_counter()
+    for offset in range(0, tasks, batch_size):
+        task_rows, board_task_rows, entry_rows, total_rows = [], [], [], []
+        for i in range(offset, min(offset + batch_size, tasks)):
+            task_id = _uuid(rng)
+            created_at = now - timedelta(seconds=rng.uniform(0, 365 * 86400))
+            project_id = None
+            if project_ids and rng.random() >= NO_PROJECT_RATIO:
+                project_id = rng.choices(project_ids, cum_weights=project_weights)[0]
+            scheduled_start = scheduled_end = None
+            if rng.random() < 0.3:
+                scheduled_start = (created_at + timedelta(days=rng.randint(0, 30))).date()
+                if rng.random() < 0.5:
+                    scheduled_end = scheduled_start + timedelta(days=rng.randint(0, 14))
+            archived_at = None
+            if rng.random() < archived_ratio:
+                archived_at = max(created_at, now - timedelta(seconds=rng.uniform(0, 120 * 86400)))
+            completed_at = None
+            if (archived_at and rng.random() < 0.8) or rng.random() < completed_ratio:
+                completed_at = min(archived_at or now, created_at + timedelta(days=rng.uniform(0, 60)))
+            description = None
+            if rng.random() < 0.4:
+                description = " ".join(rng.choices(NOUNS, k=rng.randint(3, 20)))
+            task_rows.append((
+                task_id, project_id, f"{rng.choice(VERBS)} {rng.choice(NOUNS)} #{i + 1}", description,
+                scheduled_start, scheduled_end, completed_at, archived_at, created_at, created_at,
+            ))
+
+            if board_ids and rng.random() >= unassigned_ratio:
+                board_id = rng.choices(board_ids, cum_weights=board_weights)[0]
+                board_positions[board_id] += POSITION_GAP
+                board_task_rows.append((board_id, task_id, board_positions[board_id]))
+
+            if rng.random() < tracked_ratio:
+                total = 0.0
+                count = rng.randint(1, 4)
+                for _ in range(count):
+                    entry_start = created_at + timedelta(seconds=rng.uniform(0, (now - created_at).total_seconds()))
+                    seconds = rng.uniform(5 * 60, 2 * 3600)
+                    entry_rows.append((task_id, DEFAULT_USER_ID, entry_start, entry_start + timedelta(seconds=seconds)))
+                    total += seconds
+                total_rows.append((task_id, total, count))
+
+        with get_conn() as conn, conn.cursor() as cur:
+            _copy(cur, "tasks", (
+                "id", "project_id", "title", "description", "scheduled_start", "scheduled_end",
+                "completed_at", "archived_at", "created_at", "updated_at",
+            ), task_rows)
+            _copy(cur, "board_tasks", ("board_id", "task_id", "position"), board_task_rows)
+            _copy(cur, "time_entries", ("task_id", "user_id", "started_at", "ended_at"), entry_rows)
+            _copy(cur, "task_time_totals", ("task_id", "total_seconds", "entry_count"), total_rows)
+            conn.commit()
+        done = offset + len(task_rows)
+        print(f"  {done:>9,} / {tasks:,} tasks ({done / (time.perf_counter() - started):,.0f}/s)", flush=True)
+
+    with get_conn() as conn, conn.cursor() as cur:
+        bump_versions(cur, "boards", "projects", "tasks")
+        conn.commit()
+        conn.autocommit = True
+        cur.execute("VACUUM ANALYZE")
+        conn.autocommit = False
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tasks", type=int, default=10_000)
+    parser.add_argument("--projects", type=int, default=20)
+    parser.add_argument("--boards", type=int, default=8)
+    parser.add_argument("--unassigned-ratio", type=float, default=0.1)
+    parser.add_argument("--completed-ratio", type=float, default=0.3)
+    parser.add_argument("--archived-ratio", type=float, default=0.2)
+    parser.add_argument("--tracked-ratio", type=float, default=0.3)
+    parser.add_argument("--skew", type=float, default=1.0, help="ボード・プロジェクトの大きさの偏り")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--batch-size", type=int, default=50_000)
+    parser.add_argument("--truncate", action="store_true", help="投入前に既存のデータをすべて削除する")
+    parser.add_argument("--move-archived", action="store_true", help="保持期間を過ぎたアーカイブ済みを移す")
+    args = parser.parse_args()
+
+    pool.open()
+    try:
+        started = time.perf_counter()
+        seed(
+            tasks=args.tasks, projects=args.projects, boards=args.boards,
+            unassigned_ratio=args.unassigned_ratio, completed_ratio=args.completed_ratio,
+            archived_ratio=args.archived_ratio, tracked_ratio=args.tracked_ratio,
+            skew=args.skew, seed=args.seed, batch_size=args.batch_size, truncate=args.truncate,
+        )
+        if args.move_archived:
+            print(f"moved {archive.move_archived_tasks()} archived tasks")
+        print(f"seeded {args.tasks:,} tasks in {time.perf_counter() - started:.1f}s")
+    finally:
+        pool.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""一覧のシリアライズ方式の比較（行ごとの Pydantic モデル / Postgres で組み立てた JSON）
+
+    cd backend && python -m benchmarks.serialization --sizes 10000 100000
+
+DATABASE_URL の DB に一時的なボードとタスクを作成し、終了時に削除する。
+同じボードの全件を以下の 2 通りで JSON のバイト列にするまでの時間を計る。
+
+    models:   列を読んで _row_to_task でモデルを作り、FastAPI と同じく
+              response_model で検証・エンコードする（以前の list_tasks）
+    raw json: list_tasks をそのまま呼ぶ（1 行分の JSON を SQL で作って連結する）
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from typing import Any
+
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+
+from app import cache
+from app.database import get_conn, pool
+from app.routers.tasks import TaskResponse, _row_to_task, list_tasks
+
+_MODEL_SQL = """
+    SELECT t.id, t.title, t.description,
+           t.scheduled_start, t.scheduled_end, t.completed_at, t.archived_at,
+           bt.board_id, row_number() OVER (ORDER BY bt.position, bt.task_id) - 1 AS sort_order,
+           t.project_id, tt.total_seconds AS tracked_seconds, t.version
+    FROM board_tasks bt
+    JOIN tasks t ON t.id = bt.task_id
+    LEFT JOIN task_time_totals tt ON tt.task_id = t.id
+    WHERE bt.board_id = %s AND t.archived_at IS NULL
+    ORDER BY bt.position, bt.task_id
+"""
+
+_RESPONSE_FIELD = create_model_field("response", list[TaskResponse], mode="serialization")
+
+
+def _create_board(size: int) -> tuple[str, list[str]]:
+    """予定日・完了・プロジェクトが混ざったタスクを size 件持つボードを作る"""
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute(
+            "INSERT INTO projects (name, short_name, sort_order) "
+            "SELECT 'bench ' || i, 'B' || i, 1000 + i FROM generate_series(1, 3) AS i RETURNING id",
+        )
+        project_ids = [str(row["id"]) for row in cur.fetchall()]
+        cur.execute(
+            "INSERT INTO boards (label, position) VALUES (%s, -1) RETURNING id",
+            (f"bench-{size}",),
+        )
+        board_id = str(cur.fetchone()["id"])
+        cur.execute(
+            """
+            WITH new_tasks AS (
+                INSERT INTO tasks (title, description, project_id, scheduled_start, completed_at)
+                SELECT 'bench task ' || i,
+                       CASE WHEN i %% 2 = 0 THEN 'description of task ' || i END,
+                       (%(project_ids)s::uuid[])[1 + i %% 4],
+                       CASE WHEN i %% 3 = 0 THEN CURRENT_DATE + i %% 30 END,
+                       CASE WHEN i %% 5 = 0 THEN CURRENT_TIMESTAMP END
+                FROM generate_series(1, %(size)s) AS i
+                RETURNING id
+            )
+            INSERT INTO board_tasks (board_id, task_id, position)
+            SELECT %(board_id)s, id, row_number() OVER () * 1024 FROM new_tasks
+            """,
+            {"project_ids": project_ids, "size": size, "board_id": board_id},
+        )
+        conn.commit()
+        cur.execute("ANALYZE tasks")
+        cur.execute("ANALYZE board_tasks")
+        conn.commit()
+    cache.projects_cache.invalidate()
+    return board_id, project_ids
+
+
+def _drop_board(board_id: str, project_ids: list[str]) -> None:
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute(
+            "DELETE FROM tasks WHERE id IN (SELECT task_id FROM board_tasks WHERE board_id = %s)",
+            (board_id,),
+        )
+        cur.execute("DELETE FROM boards WHERE id = %s", (board_id,))
+        cur.execute("DELETE FROM projects WHERE id = ANY(%s::uuid[])", (project_ids,))
+        conn.commit()
+    cache.projects_cache.invalidate()
+
+
+def _models(board_id: str) -> bytes:
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute(_MODEL_SQL, (board_id,))
+        rows = cur.fetchall()
+    tasks = [_row_to_task(row) for row in rows]
+    content = asyncio.run(serialize_response(field=_RESPONSE_FIELD, response_content=tasks))
+    return JSONResponse(content).body
+
+
+def _raw_json(board_id: str) -> bytes:
+    request = Request({"type": "http", "method": "GET", "path": "/api/tasks", "headers": []})
+    response = list_tasks(
+        request, Response(), board_id=board_id, project_id=None, completed=None, archived=False,
+        scheduled_from=None, scheduled_to=None, limit=None, cursor=None,
+    )
+    return response.body
+
+
+def _measure(fn: Any, board_id: str, repeat: int) -> tuple[float, bytes]:
+    """repeat 回の中央値（秒）と最後の出力"""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = fn(board_id)
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples), body
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    pool.open()
+    print(f"{'tasks':>8} {'path':<9} {'ms':>9} {'rows/s':>11} {'MB':>7}")
+    try:
+        for size in args.sizes:
+            board_id, project_ids = _create_board(size)
+            try:
+                results = {}
+                for name, fn in (("models", _models), ("raw json", _raw_json)):
+                    _measure(fn, board_id, 1)  # キャッシュ・バッファを温める
+                    elapsed, body = _measure(fn, board_id, args.repeat)
+                    results[name] = (elapsed, body)
+                    print(f"{size:>8} {name:<9} {elapsed * 1000:>9.1f} {size / elapsed:>11,.0f} {len(body) / 1e6:>7.2f}")
+                # 時刻の表記（小数秒の桁数）以外は同じ内容になっているはず
+                models, raw = (json.loads(results[name][1]) for name in ("models", "raw json"))
+                assert [t["id"] for t in models] == [t["id"] for t in raw]
+                assert [t["project"] for t in models] == [t["project"] for t in raw]
+                print(f"{'':>8} speedup {results['models'][0] / results['raw json'][0]:.1f}x")
+            finally:
+                _drop_board(board_id, project_ids)
+    finally:
+        pool.close()
+
+
+if __name__ == "__main__":
+    main()
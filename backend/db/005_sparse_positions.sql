@@ -0,0 +1,44 @@
+-- 並び順を連番の sort_order から疎な浮動小数キー position に移行する。
+-- 並べ替えは移動したタスク 1 行だけを更新すればよくなる（間隔が尽きたら再採番）。
+-- 既存 DB に再適用しても壊れないよう、列の有無を確認してから変換する。
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM information_schema.columns
+        WHERE table_name = 'board_tasks' AND column_name = 'sort_order'
+    ) THEN
+        ALTER TABLE board_tasks RENAME COLUMN sort_order TO position;
+        ALTER TABLE board_tasks ALTER COLUMN position TYPE DOUBLE PRECISION;
+        ALTER TABLE board_tasks ALTER COLUMN position SET DEFAULT 0;
+
+        UPDATE board_tasks bt
+        SET position = r.rn * 1024
+        FROM (
+            SELECT board_id, task_id,
+                   row_number() OVER (PARTITION BY board_id ORDER BY position, created_at) AS rn
+            FROM board_tasks
+        ) r
+        WHERE bt.board_id = r.board_id AND bt.task_id = r.task_id;
+    END IF;
+
+    IF EXISTS (
+        SELECT 1 FROM information_schema.columns
+        WHERE table_name = 'boards' AND column_name = 'sort_order'
+    ) THEN
+        ALTER TABLE boards RENAME COLUMN sort_order TO position;
+        ALTER TABLE boards ALTER COLUMN position TYPE DOUBLE PRECISION;
+        ALTER TABLE boards ALTER COLUMN position SET DEFAULT 0;
+
+        UPDATE boards b
+        SET position = r.rn * 1024
+        FROM (
+            SELECT id, row_number() OVER (ORDER BY position, created_at) AS rn
+            FROM boards
+        ) r
+        WHERE b.id = r.id;
+    END IF;
+END
+$$;
+
+-- 隣接キーの取得（ORDER BY position OFFSET n LIMIT 2）用
+CREATE INDEX IF NOT EXISTS idx_board_tasks_board_position ON board_tasks(board_id, position);
@@ -0,0 +1,11 @@
+-- リソース（boards / projects / tasks）ごとの変更バージョン。
+-- 書き込み系 API が同じトランザクション内で加算し、GET の ETag に使う。
+-- DB を作り直したときに古い ETag と衝突しないよう、初期値は作成時刻（ミリ秒）にする。
+CREATE TABLE IF NOT EXISTS resource_versions (
+    resource TEXT PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT (extract(epoch FROM clock_timestamp()) * 1000)::BIGINT
+);
+
+INSERT INTO resource_versions (resource)
+VALUES ('boards'), ('projects'), ('tasks')
+ON CONFLICT (resource) DO NOTHING;
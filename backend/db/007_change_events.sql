@@ -0,0 +1,2 @@
+-- 変更イベント（NOTIFY tasktimer_events）の連番。SSE の id / Last-Event-ID に使う。
+CREATE SEQUENCE IF NOT EXISTS change_event_seq;
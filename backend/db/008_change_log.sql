@@ -0,0 +1,75 @@
+-- 差分同期（GET /api/sync）のための変更履歴。
+-- tasks / board_tasks / boards / projects の変更をトリガーで記録する（CASCADE による削除も含む）。
+-- 内容は持たず「どの行が変わったか」だけを残し、同期時に現在の行を引く（無ければ削除）。
+-- txid は書き込んだトランザクションの id。同期トークンはスナップショットの xmin で、
+-- 次回は txid >= トークンの行を返す（コミット順が前後しても取りこぼさない）。
+CREATE TABLE IF NOT EXISTS change_log (
+    id BIGSERIAL PRIMARY KEY,
+    txid xid8 NOT NULL DEFAULT pg_current_xact_id(),
+    entity TEXT NOT NULL,
+    entity_id UUID NOT NULL,
+    changed_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_change_log_txid ON change_log(txid);
+CREATE INDEX IF NOT EXISTS idx_change_log_changed_at ON change_log(changed_at);
+
+-- 古い履歴を削除した位置。これより古いトークンでは差分を返せない
+CREATE TABLE IF NOT EXISTS change_log_horizon (
+    id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+    txid xid8 NOT NULL DEFAULT '0'
+);
+INSERT INTO change_log_horizon DEFAULT VALUES ON CONFLICT (id) DO NOTHING;
+
+-- 文単位のトリガーで遷移テーブルからまとめて記録する（一括投入でも 1 文で済む）
+-- TG_ARGV[0]: entity 名, TG_ARGV[1]: 行を識別する列
+CREATE OR REPLACE FUNCTION log_new_rows() RETURNS trigger AS $$
+BEGIN
+    EXECUTE format(
+        'INSERT INTO change_log (entity, entity_id) SELECT DISTINCT %L, %I FROM new_rows',
+        TG_ARGV[0], TG_ARGV[1]
+    );
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION log_old_rows() RETURNS trigger AS $$
+BEGIN
+    EXECUTE format(
+        'INSERT INTO change_log (entity, entity_id) SELECT DISTINCT %L, %I FROM old_rows',
+        TG_ARGV[0], TG_ARGV[1]
+    );
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$
+DECLARE
+    t RECORD;
+BEGIN
+    FOR t IN
+        SELECT * FROM (VALUES
+            ('tasks', 'task', 'id'),
+            ('board_tasks', 'board_task', 'task_id'),
+            ('boards', 'board', 'id'),
+            ('projects', 'project', 'id')
+        ) AS v(tbl, entity, key_column)
+    LOOP
+        EXECUTE format(
+            'CREATE OR REPLACE TRIGGER %I AFTER INSERT ON %I REFERENCING NEW TABLE AS new_rows
+             FOR EACH STATEMENT EXECUTE FUNCTION log_new_rows(%L, %L)',
+            t.tbl || '_log_insert', t.tbl, t.entity, t.key_column
+        );
+        EXECUTE format(
+            'CREATE OR REPLACE TRIGGER %I AFTER UPDATE ON %I REFERENCING NEW TABLE AS new_rows
+             FOR EACH STATEMENT EXECUTE FUNCTION log_new_rows(%L, %L)',
+            t.tbl || '_log_update', t.tbl, t.entity, t.key_column
+        );
+        EXECUTE format(
+            'CREATE OR REPLACE TRIGGER %I AFTER DELETE ON %I REFERENCING OLD TABLE AS old_rows
+             FOR EACH STATEMENT EXECUTE FUNCTION log_old_rows(%L, %L)',
+            t.tbl || '_log_delete', t.tbl, t.entity, t.key_column
+        );
+    END LOOP;
+END;
+$$;
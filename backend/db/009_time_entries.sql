@@ -0,0 +1,90 @@
+-- 時間計測。確定した計測区間は time_entries に追記のみで記録し、
+-- タスクごとの合計は task_time_totals に加算していく（一覧表示で履歴を集計しない）。
+-- 計測中・一時停止中のタイマーは running_timers に 1 ユーザー 1 行だけ持つ。
+CREATE TABLE IF NOT EXISTS time_entries (
+    id BIGSERIAL PRIMARY KEY,
+    task_id UUID NOT NULL REFERENCES tasks(id) ON DELETE CASCADE,
+    user_id TEXT NOT NULL,
+    started_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    ended_at TIMESTAMP WITH TIME ZONE NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_time_entries_task_started ON time_entries(task_id, started_at);
+
+CREATE TABLE IF NOT EXISTS task_time_totals (
+    task_id UUID PRIMARY KEY REFERENCES tasks(id) ON DELETE CASCADE,
+    total_seconds DOUBLE PRECISION NOT NULL DEFAULT 0,
+    entry_count INTEGER NOT NULL DEFAULT 0
+);
+
+-- started_at が NULL なら一時停止中
+CREATE TABLE IF NOT EXISTS running_timers (
+    user_id TEXT PRIMARY KEY,
+    task_id UUID NOT NULL REFERENCES tasks(id) ON DELETE CASCADE,
+    started_at TIMESTAMP WITH TIME ZONE
+);
+
+CREATE INDEX IF NOT EXISTS idx_running_timers_task_id ON running_timers(task_id);
+
+-- タイマーの開始・一時停止・停止を 1 回の呼び出しで行う。
+-- 別のタスクで計測中に開始すると、そちらの区間を確定してから切り替える。
+-- タスクが存在しなければ行を返さない。
+CREATE OR REPLACE FUNCTION timer_transition(p_user_id TEXT, p_task_id UUID, p_action TEXT)
+RETURNS TABLE (state TEXT, started_at TIMESTAMP WITH TIME ZONE, total_seconds DOUBLE PRECISION) AS $$
+DECLARE
+    current_timer running_timers%ROWTYPE;
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM tasks WHERE id = p_task_id) THEN
+        RETURN;
+    END IF;
+
+    -- 同じユーザーの操作を直列化する（行が無い状態からの同時開始も含む）
+    PERFORM pg_advisory_xact_lock(hashtext('timer:' || p_user_id));
+    SELECT * INTO current_timer FROM running_timers r WHERE r.user_id = p_user_id;
+
+    IF current_timer.started_at IS NOT NULL AND (
+        (p_action = 'start' AND current_timer.task_id <> p_task_id)
+        OR (p_action <> 'start' AND current_timer.task_id = p_task_id)
+    ) THEN
+        INSERT INTO time_entries (task_id, user_id, started_at, ended_at)
+        VALUES (current_timer.task_id, p_user_id, current_timer.started_at, now());
+
+        INSERT INTO task_time_totals AS tt (task_id, total_seconds, entry_count)
+        VALUES (current_timer.task_id, extract(epoch FROM now() - current_timer.started_at), 1)
+        ON CONFLICT (task_id) DO UPDATE
+        SET total_seconds = tt.total_seconds + EXCLUDED.total_seconds,
+            entry_count = tt.entry_count + 1;
+
+        -- タスク一覧の tracked_seconds が変わるので ETag を更新する
+        UPDATE resource_versions SET version = version + 1 WHERE resource = 'tasks';
+    END IF;
+
+    IF p_action = 'start' THEN
+        INSERT INTO running_timers AS r (user_id, task_id, started_at)
+        VALUES (p_user_id, p_task_id, now())
+        ON CONFLICT (user_id) DO UPDATE
+        SET task_id = EXCLUDED.task_id,
+            started_at = CASE
+                WHEN r.task_id = EXCLUDED.task_id AND r.started_at IS NOT NULL THEN r.started_at
+                ELSE EXCLUDED.started_at
+            END;
+    ELSIF p_action = 'pause' THEN
+        UPDATE running_timers r SET started_at = NULL
+        WHERE r.user_id = p_user_id AND r.task_id = p_task_id;
+    ELSIF p_action = 'stop' THEN
+        DELETE FROM running_timers r
+        WHERE r.user_id = p_user_id AND r.task_id = p_task_id;
+    END IF;
+
+    RETURN QUERY
+    SELECT CASE
+               WHEN r.task_id IS NULL THEN 'stopped'
+               WHEN r.started_at IS NULL THEN 'paused'
+               ELSE 'running'
+           END,
+           r.started_at,
+           COALESCE((SELECT tt.total_seconds FROM task_time_totals tt WHERE tt.task_id = p_task_id), 0)
+    FROM (SELECT 1) one
+    LEFT JOIN running_timers r ON r.user_id = p_user_id AND r.task_id = p_task_id;
+END;
+$$ LANGUAGE plpgsql;
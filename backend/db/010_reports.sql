@@ -0,0 +1,181 @@
+-- 集計レポート用の日次ロールアップ（プロジェクト別・ボード別）。
+-- 元データの変更はトリガーで「再集計が必要な日」として report_dirty_days に記録し、
+-- レポート取得時に refresh_report_daily() がその日だけを集計し直す。
+-- 日付の区切りは tasktimer.report_timezone（未設定なら UTC）で決める:
+--     ALTER DATABASE tasktimer SET tasktimer.report_timezone = 'Asia/Tokyo';
+-- 変更したら既存の行を作り直すこと（report_dirty_days に全日付を入れる）。
+
+CREATE INDEX IF NOT EXISTS idx_time_entries_started_at ON time_entries(started_at);
+
+CREATE TABLE IF NOT EXISTS report_daily (
+    scope_type TEXT NOT NULL,  -- 'project' | 'board'
+    day DATE NOT NULL,
+    scope_id UUID NOT NULL,
+    tracked_seconds DOUBLE PRECISION NOT NULL DEFAULT 0,
+    completed_count INTEGER NOT NULL DEFAULT 0,
+    cycle_seconds DOUBLE PRECISION NOT NULL DEFAULT 0,  -- 完了したタスクの created_at -> completed_at の合計
+    PRIMARY KEY (scope_type, day, scope_id)
+);
+
+CREATE TABLE IF NOT EXISTS report_dirty_days (
+    day DATE PRIMARY KEY
+);
+
+CREATE OR REPLACE FUNCTION report_timezone() RETURNS TEXT AS $$
+    SELECT COALESCE(NULLIF(current_setting('tasktimer.report_timezone', true), ''), 'UTC')
+$$ LANGUAGE sql STABLE;
+
+CREATE OR REPLACE FUNCTION report_day(ts TIMESTAMP WITH TIME ZONE) RETURNS DATE AS $$
+    SELECT (ts AT TIME ZONE report_timezone())::date
+$$ LANGUAGE sql STABLE;
+
+-- タスクの完了日と、計測区間のある日を再集計対象にする
+CREATE OR REPLACE FUNCTION mark_task_report_days(task_ids UUID[]) RETURNS void AS $$
+    INSERT INTO report_dirty_days (day)
+    SELECT report_day(completed_at) FROM tasks WHERE id = ANY(task_ids) AND completed_at IS NOT NULL
+    UNION
+    SELECT report_day(started_at) FROM time_entries WHERE task_id = ANY(task_ids)
+    ON CONFLICT (day) DO NOTHING
+$$ LANGUAGE sql;
+
+CREATE OR REPLACE FUNCTION mark_report_days_from_tasks() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO report_dirty_days (day)
+        SELECT DISTINCT report_day(completed_at) FROM new_rows WHERE completed_at IS NOT NULL
+        ON CONFLICT (day) DO NOTHING;
+    ELSIF TG_OP = 'DELETE' THEN
+        -- 計測区間は CASCADE で削除され、time_entries 側のトリガーで記録される
+        INSERT INTO report_dirty_days (day)
+        SELECT DISTINCT report_day(completed_at) FROM old_rows WHERE completed_at IS NOT NULL
+        ON CONFLICT (day) DO NOTHING;
+    ELSE
+        -- 集計に関わる列が変わった行だけ（タイトルの編集などでは何もしない）
+        INSERT INTO report_dirty_days (day)
+        SELECT DISTINCT report_day(x.completed_at)
+        FROM old_rows o
+        JOIN new_rows n ON n.id = o.id
+        CROSS JOIN LATERAL (VALUES (o.completed_at), (n.completed_at)) AS x(completed_at)
+        WHERE x.completed_at IS NOT NULL
+          AND (o.completed_at IS DISTINCT FROM n.completed_at
+               OR o.created_at IS DISTINCT FROM n.created_at
+               OR o.project_id IS DISTINCT FROM n.project_id)
+        ON CONFLICT (day) DO NOTHING;
+
+        -- プロジェクトが変わると過去の計測時間の集計先も変わる
+        PERFORM mark_task_report_days(ARRAY(
+            SELECT n.id FROM old_rows o JOIN new_rows n ON n.id = o.id
+            WHERE o.project_id IS DISTINCT FROM n.project_id
+        ));
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION mark_report_days_from_board_tasks() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM mark_task_report_days(ARRAY(SELECT task_id FROM new_rows));
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM mark_task_report_days(ARRAY(SELECT task_id FROM old_rows));
+    ELSE
+        -- 並べ替え（position だけの変更）は対象外
+        PERFORM mark_task_report_days(ARRAY(
+            SELECT n.task_id FROM old_rows o JOIN new_rows n ON n.task_id = o.task_id
+            WHERE o.board_id IS DISTINCT FROM n.board_id
+        ));
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION mark_report_days_from_time_entries() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO report_dirty_days (day)
+        SELECT DISTINCT report_day(started_at) FROM new_rows
+        ON CONFLICT (day) DO NOTHING;
+    ELSE
+        INSERT INTO report_dirty_days (day)
+        SELECT DISTINCT report_day(started_at) FROM old_rows
+        ON CONFLICT (day) DO NOTHING;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER tasks_report_insert AFTER INSERT ON tasks
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION mark_report_days_from_tasks();
+CREATE OR REPLACE TRIGGER tasks_report_update AFTER UPDATE ON tasks
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION mark_report_days_from_tasks();
+CREATE OR REPLACE TRIGGER tasks_report_delete AFTER DELETE ON tasks
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION mark_report_days_from_tasks();
+
+CREATE OR REPLACE TRIGGER board_tasks_report_insert AFTER INSERT ON board_tasks
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION mark_report_days_from_board_tasks();
+CREATE OR REPLACE TRIGGER board_tasks_report_update AFTER UPDATE ON board_tasks
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION mark_report_days_from_board_tasks();
+CREATE OR REPLACE TRIGGER board_tasks_report_delete AFTER DELETE ON board_tasks
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION mark_report_days_from_board_tasks();
+
+CREATE OR REPLACE TRIGGER time_entries_report_insert AFTER INSERT ON time_entries
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION mark_report_days_from_time_entries();
+CREATE OR REPLACE TRIGGER time_entries_report_delete AFTER DELETE ON time_entries
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION mark_report_days_from_time_entries();
+
+-- 再集計が必要な日だけを、インデックスで範囲を絞って集計し直す
+CREATE OR REPLACE FUNCTION refresh_report_daily() RETURNS INTEGER AS $$
+DECLARE
+    days DATE[];
+BEGIN
+    -- 同時に呼ばれても同じ日を二重に集計しない
+    PERFORM pg_advisory_xact_lock(hashtext('refresh_report_daily'));
+    WITH taken AS (DELETE FROM report_dirty_days RETURNING day)
+    SELECT array_agg(day) INTO days FROM taken;
+    IF days IS NULL THEN
+        RETURN 0;
+    END IF;
+
+    DELETE FROM report_daily WHERE day = ANY(days);
+
+    INSERT INTO report_daily (scope_type, day, scope_id, tracked_seconds, completed_count, cycle_seconds)
+    SELECT scope.scope_type, f.day, scope.scope_id,
+           SUM(f.tracked_seconds), SUM(f.completed_count), SUM(f.cycle_seconds)
+    FROM (
+        SELECT d.day, t.id AS task_id, t.project_id, 0 AS tracked_seconds,
+               1 AS completed_count, extract(epoch FROM t.completed_at - t.created_at) AS cycle_seconds
+        FROM unnest(days) AS d(day)
+        JOIN tasks t
+          ON t.completed_at >= d.day::timestamp AT TIME ZONE report_timezone()
+         AND t.completed_at < (d.day + 1)::timestamp AT TIME ZONE report_timezone()
+        UNION ALL
+        SELECT d.day, t.id, t.project_id, extract(epoch FROM te.ended_at - te.started_at), 0, 0
+        FROM unnest(days) AS d(day)
+        JOIN time_entries te
+          ON te.started_at >= d.day::timestamp AT TIME ZONE report_timezone()
+         AND te.started_at < (d.day + 1)::timestamp AT TIME ZONE report_timezone()
+        JOIN tasks t ON t.id = te.task_id
+    ) f
+    LEFT JOIN board_tasks bt ON bt.task_id = f.task_id
+    CROSS JOIN LATERAL (VALUES ('project', f.project_id), ('board', bt.board_id)) AS scope(scope_type, scope_id)
+    WHERE scope.scope_id IS NOT NULL
+    GROUP BY scope.scope_type, f.day, scope.scope_id;
+
+    RETURN array_length(days, 1);
+END;
+$$ LANGUAGE plpgsql;
+
+-- 既存データは最初のレポート取得時に集計する
+INSERT INTO report_dirty_days (day)
+SELECT report_day(completed_at) FROM tasks WHERE completed_at IS NOT NULL
+UNION
+SELECT report_day(started_at) FROM time_entries
+ON CONFLICT (day) DO NOTHING;
@@ -0,0 +1,24 @@
+-- タスクの全文検索。単語単位の検索は tsvector（GIN）で、日本語のように空白で
+-- 区切られない文字列や綴りの揺れは pg_trgm のトライグラム索引で拾う。
+-- 言語ごとの語幹処理はせず 'simple' 設定で小文字化だけ行う。
+ALTER TABLE tasks ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', coalesce(title, '')), 'A')
+        || setweight(to_tsvector('simple', coalesce(description, '')), 'B')
+    ) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_tasks_search_vector ON tasks USING GIN (search_vector);
+
+-- pg_trgm が無い環境（contrib 未導入）でも起動できるよう、あるときだけ作る。
+-- アプリは pg_extension を見てトライグラム検索を使うかを決める。
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm') THEN
+        CREATE EXTENSION IF NOT EXISTS pg_trgm;
+        CREATE INDEX IF NOT EXISTS idx_tasks_title_trgm ON tasks USING GIN (title gin_trgm_ops);
+        CREATE INDEX IF NOT EXISTS idx_tasks_description_trgm ON tasks USING GIN (description gin_trgm_ops);
+    ELSE
+        RAISE NOTICE 'pg_trgm is not available; task search falls back to full-text only';
+    END IF;
+END
+$$;
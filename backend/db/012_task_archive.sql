@@ -0,0 +1,188 @@
+-- アーカイブ済みタスクのコールドストレージ。
+-- アーカイブから一定期間たったタスクは archived_tasks に移し（計測区間も
+-- archived_time_entries へ）、tasks とその索引には作業中のタスクだけが残るようにする。
+-- 移動は python -m app.archive を定期実行して行い、restore_task() で tasks に戻せる。
+-- ボードの割り当てと計測時間の合計は移動時の値を持っておき、戻すときに復元する。
+CREATE TABLE IF NOT EXISTS archived_tasks (
+    id UUID PRIMARY KEY,
+    project_id UUID REFERENCES projects(id) ON DELETE CASCADE,
+    title VARCHAR(255) NOT NULL,
+    description TEXT,
+    scheduled_start DATE,
+    scheduled_end DATE,
+    completed_at TIMESTAMP WITH TIME ZONE,
+    archived_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    updated_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    board_id UUID,  -- ボードが削除されていることがあるので外部キーにしない
+    position DOUBLE PRECISION,
+    tracked_seconds DOUBLE PRECISION NOT NULL DEFAULT 0,
+    entry_count INTEGER NOT NULL DEFAULT 0,
+    moved_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_archived_tasks_project_id ON archived_tasks(project_id);
+CREATE INDEX IF NOT EXISTS idx_archived_tasks_completed_at ON archived_tasks(completed_at);
+CREATE INDEX IF NOT EXISTS idx_archived_tasks_created_at ON archived_tasks(created_at, id);
+
+CREATE TABLE IF NOT EXISTS archived_time_entries (
+    id BIGINT PRIMARY KEY,
+    task_id UUID NOT NULL REFERENCES archived_tasks(id) ON DELETE CASCADE,
+    user_id TEXT NOT NULL,
+    started_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    ended_at TIMESTAMP WITH TIME ZONE NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_archived_time_entries_task_started ON archived_time_entries(task_id, started_at);
+CREATE INDEX IF NOT EXISTS idx_archived_time_entries_started_at ON archived_time_entries(started_at);
+
+-- tasks に残るアーカイブ済みは移動待ちの少数だけなので、その行だけを索引する
+-- （archived_at IS NULL の絞り込みには全行の B-tree は使われない）
+DROP INDEX IF EXISTS idx_tasks_archived_at;
+CREATE INDEX IF NOT EXISTS idx_tasks_archived ON tasks(archived_at) WHERE archived_at IS NOT NULL;
+
+-- 移動済みも含めた全タスク・全計測区間（プロジェクト画面・エクスポート・集計用）
+CREATE OR REPLACE VIEW all_tasks AS
+    SELECT t.id, t.project_id, t.title, t.description, t.scheduled_start, t.scheduled_end,
+           t.completed_at, t.archived_at, t.created_at, t.updated_at,
+           bt.board_id, FALSE AS cold
+    FROM tasks t
+    LEFT JOIN board_tasks bt ON bt.task_id = t.id
+    UNION ALL
+    SELECT a.id, a.project_id, a.title, a.description, a.scheduled_start, a.scheduled_end,
+           a.completed_at, a.archived_at, a.created_at, a.updated_at,
+           a.board_id, TRUE AS cold
+    FROM archived_tasks a;
+
+CREATE OR REPLACE VIEW all_time_entries AS
+    SELECT id, task_id, user_id, started_at, ended_at FROM time_entries
+    UNION ALL
+    SELECT id, task_id, user_id, started_at, ended_at FROM archived_time_entries;
+
+-- p_cutoff より前にアーカイブされたタスクを最大 p_limit 件移し、移した件数を返す。
+-- 計測中・一時停止中のタイマーがあるタスクは移さない。
+CREATE OR REPLACE FUNCTION move_archived_tasks(p_cutoff TIMESTAMP WITH TIME ZONE, p_limit INTEGER)
+RETURNS INTEGER AS $$
+DECLARE
+    task_ids UUID[];
+BEGIN
+    SELECT array_agg(id) INTO task_ids
+    FROM (
+        SELECT t.id FROM tasks t
+        WHERE t.archived_at < p_cutoff
+          AND NOT EXISTS (SELECT 1 FROM running_timers r WHERE r.task_id = t.id)
+        ORDER BY t.archived_at
+        LIMIT p_limit
+        FOR UPDATE SKIP LOCKED
+    ) picked;
+    IF task_ids IS NULL THEN
+        RETURN 0;
+    END IF;
+
+    INSERT INTO archived_tasks (
+        id, project_id, title, description, scheduled_start, scheduled_end,
+        completed_at, archived_at, created_at, updated_at,
+        board_id, position, tracked_seconds, entry_count
+    )
+    SELECT t.id, t.project_id, t.title, t.description, t.scheduled_start, t.scheduled_end,
+           t.completed_at, t.archived_at, t.created_at, t.updated_at,
+           bt.board_id, bt.position, COALESCE(tt.total_seconds, 0), COALESCE(tt.entry_count, 0)
+    FROM tasks t
+    LEFT JOIN board_tasks bt ON bt.task_id = t.id
+    LEFT JOIN task_time_totals tt ON tt.task_id = t.id
+    WHERE t.id = ANY(task_ids);
+
+    INSERT INTO archived_time_entries (id, task_id, user_id, started_at, ended_at)
+    SELECT id, task_id, user_id, started_at, ended_at FROM time_entries WHERE task_id = ANY(task_ids);
+
+    -- board_tasks・time_entries・task_time_totals は CASCADE で消える
+    DELETE FROM tasks WHERE id = ANY(task_ids);
+
+    UPDATE resource_versions SET version = version + 1 WHERE resource = 'tasks';
+    RETURN array_length(task_ids, 1);
+END;
+$$ LANGUAGE plpgsql;
+
+-- アーカイブ済みのタスクを作業中に戻す。移動済みなら tasks に戻し、
+-- 元のボードが残っていればその末尾に置く。タスクが無ければ FALSE。
+CREATE OR REPLACE FUNCTION restore_task(p_task_id UUID) RETURNS BOOLEAN AS $$
+DECLARE
+    archived archived_tasks%ROWTYPE;
+BEGIN
+    SELECT * INTO archived FROM archived_tasks WHERE id = p_task_id FOR UPDATE;
+    IF NOT FOUND THEN
+        UPDATE tasks SET archived_at = NULL, updated_at = CURRENT_TIMESTAMP
+        WHERE id = p_task_id AND archived_at IS NOT NULL;
+        RETURN FOUND OR EXISTS (SELECT 1 FROM tasks WHERE id = p_task_id);
+    END IF;
+
+    INSERT INTO tasks (
+        id, project_id, title, description, scheduled_start, scheduled_end,
+        completed_at, archived_at, created_at, updated_at
+    )
+    VALUES (
+        archived.id, archived.project_id, archived.title, archived.description,
+        archived.scheduled_start, archived.scheduled_end, archived.completed_at,
+        NULL, archived.created_at, CURRENT_TIMESTAMP
+    );
+
+    INSERT INTO time_entries (id, task_id, user_id, started_at, ended_at)
+    SELECT id, task_id, user_id, started_at, ended_at FROM archived_time_entries WHERE task_id = p_task_id;
+
+    IF archived.entry_count > 0 THEN
+        INSERT INTO task_time_totals (task_id, total_seconds, entry_count)
+        VALUES (p_task_id, archived.tracked_seconds, archived.entry_count);
+    END IF;
+
+    -- 元の位置には別のタスクが入っているかもしれないので末尾に置く
+    INSERT INTO board_tasks (board_id, task_id, position)
+    SELECT b.id, p_task_id, COALESCE((SELECT MAX(position) FROM board_tasks WHERE board_id = b.id), 0) + 1024
+    FROM boards b
+    WHERE b.id = archived.board_id;
+
+    -- archived_time_entries は CASCADE で消える
+    DELETE FROM archived_tasks WHERE id = p_task_id;
+    RETURN TRUE;
+END;
+$$ LANGUAGE plpgsql;
+
+-- 集計は移動済みのタスク・計測区間も含める（010 の定義を置き換え）
+CREATE OR REPLACE FUNCTION refresh_report_daily() RETURNS INTEGER AS $$
+DECLARE
+    days DATE[];
+BEGIN
+    -- 同時に呼ばれても同じ日を二重に集計しない
+    PERFORM pg_advisory_xact_lock(hashtext('refresh_report_daily'));
+    WITH taken AS (DELETE FROM report_dirty_days RETURNING day)
+    SELECT array_agg(day) INTO days FROM taken;
+    IF days IS NULL THEN
+        RETURN 0;
+    END IF;
+
+    DELETE FROM report_daily WHERE day = ANY(days);
+
+    INSERT INTO report_daily (scope_type, day, scope_id, tracked_seconds, completed_count, cycle_seconds)
+    SELECT scope.scope_type, f.day, scope.scope_id,
+           SUM(f.tracked_seconds), SUM(f.completed_count), SUM(f.cycle_seconds)
+    FROM (
+        SELECT d.day, t.project_id, t.board_id, 0 AS tracked_seconds,
+               1 AS completed_count, extract(epoch FROM t.completed_at - t.created_at) AS cycle_seconds
+        FROM unnest(days) AS d(day)
+        JOIN all_tasks t
+          ON t.completed_at >= d.day::timestamp AT TIME ZONE report_timezone()
+         AND t.completed_at < (d.day + 1)::timestamp AT TIME ZONE report_timezone()
+        UNION ALL
+        SELECT d.day, t.project_id, t.board_id, extract(epoch FROM te.ended_at - te.started_at), 0, 0
+        FROM unnest(days) AS d(day)
+        JOIN all_time_entries te
+          ON te.started_at >= d.day::timestamp AT TIME ZONE report_timezone()
+         AND te.started_at < (d.day + 1)::timestamp AT TIME ZONE report_timezone()
+        JOIN all_tasks t ON t.id = te.task_id
+    ) f
+    CROSS JOIN LATERAL (VALUES ('project', f.project_id), ('board', f.board_id)) AS scope(scope_type, scope_id)
+    WHERE scope.scope_id IS NOT NULL
+    GROUP BY scope.scope_type, f.day, scope.scope_id;
+
+    RETURN array_length(days, 1);
+END;
+$$ LANGUAGE plpgsql;
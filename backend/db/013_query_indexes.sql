@@ -0,0 +1,19 @@
+-- migrate:no-transaction
+-- 一覧・並べ替えのクエリに合わせた索引（benchmarks/query_plans.py の EXPLAIN で確認）。
+-- 稼働中の DB でも書き込みを止めないよう CONCURRENTLY で作る。作成が途中で失敗すると
+-- 無効な索引が残るので、作り直せるよう先に DROP してから作る
+
+-- ボード内の並び (position, task_id) をそのまま辿れるようにする。
+-- board_id 単独の索引は主キー (board_id, task_id) とこの索引の先頭列で足りる
+DROP INDEX CONCURRENTLY IF EXISTS idx_board_tasks_board_order;
+CREATE INDEX CONCURRENTLY idx_board_tasks_board_order ON board_tasks(board_id, position, task_id);
+DROP INDEX CONCURRENTLY IF EXISTS idx_board_tasks_board_position;
+DROP INDEX CONCURRENTLY IF EXISTS idx_board_tasks_board_id;
+
+-- 未割り当て一覧（作成日時の降順）とプロジェクト画面の作業中タスク
+DROP INDEX CONCURRENTLY IF EXISTS idx_tasks_active_created;
+CREATE INDEX CONCURRENTLY idx_tasks_active_created ON tasks(created_at DESC, id DESC)
+    WHERE archived_at IS NULL;
+DROP INDEX CONCURRENTLY IF EXISTS idx_tasks_project_active;
+CREATE INDEX CONCURRENTLY idx_tasks_project_active ON tasks(project_id, created_at DESC, id DESC)
+    WHERE archived_at IS NULL;
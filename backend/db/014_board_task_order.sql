@@ -0,0 +1,55 @@
+-- ボード内のタスクの並びのバージョン。並び（割り当て・position・アーカイブ）が
+-- 変わるたびにトリガーで加算し、一括並べ替え（PUT /api/boards/{id}/task-order）は
+-- クライアントが見たバージョンと一致するときだけ適用する。
+CREATE TABLE IF NOT EXISTS board_task_order (
+    board_id UUID PRIMARY KEY REFERENCES boards(id) ON DELETE CASCADE,
+    version BIGINT NOT NULL DEFAULT 0
+);
+
+CREATE OR REPLACE FUNCTION bump_board_task_order(board_ids UUID[]) RETURNS void AS $$
+    INSERT INTO board_task_order AS o (board_id, version)
+    SELECT b.id, 1 FROM boards b WHERE b.id = ANY(board_ids)  -- 削除中のボードは除く
+    ON CONFLICT (board_id) DO UPDATE SET version = o.version + 1
+$$ LANGUAGE sql;
+
+CREATE OR REPLACE FUNCTION bump_board_task_order_from_board_tasks() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM bump_board_task_order(ARRAY(SELECT DISTINCT board_id FROM new_rows));
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM bump_board_task_order(ARRAY(SELECT DISTINCT board_id FROM old_rows));
+    ELSE
+        PERFORM bump_board_task_order(ARRAY(
+            SELECT board_id FROM new_rows UNION SELECT board_id FROM old_rows
+        ));
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- アーカイブ・解除で表示順（sort_order）がずれる
+CREATE OR REPLACE FUNCTION bump_board_task_order_from_tasks() RETURNS trigger AS $$
+BEGIN
+    PERFORM bump_board_task_order(ARRAY(
+        SELECT DISTINCT bt.board_id
+        FROM old_rows o
+        JOIN new_rows n ON n.id = o.id
+        JOIN board_tasks bt ON bt.task_id = n.id
+        WHERE o.archived_at IS DISTINCT FROM n.archived_at
+    ));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER board_tasks_order_insert AFTER INSERT ON board_tasks
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_board_task_order_from_board_tasks();
+CREATE OR REPLACE TRIGGER board_tasks_order_update AFTER UPDATE ON board_tasks
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_board_task_order_from_board_tasks();
+CREATE OR REPLACE TRIGGER board_tasks_order_delete AFTER DELETE ON board_tasks
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_board_task_order_from_board_tasks();
+CREATE OR REPLACE TRIGGER tasks_order_update AFTER UPDATE ON tasks
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_board_task_order_from_tasks();
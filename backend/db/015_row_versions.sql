@@ -0,0 +1,42 @@
+-- 行ごとのバージョン（楽観的排他制御）。UPDATE のたびにトリガーで 1 加算し、
+-- PATCH・並べ替えは If-Match かリクエストの version が一致するときだけ適用する。
+-- tasks.version はタスクの内容とボード上の位置の両方、board_tasks.version は位置の変更で進む。
+ALTER TABLE tasks ADD COLUMN IF NOT EXISTS version BIGINT NOT NULL DEFAULT 1;
+ALTER TABLE boards ADD COLUMN IF NOT EXISTS version BIGINT NOT NULL DEFAULT 1;
+ALTER TABLE board_tasks ADD COLUMN IF NOT EXISTS version BIGINT NOT NULL DEFAULT 1;
+
+-- 文の中で version を明示的に進めた場合（SET version = version + 1）は二重に加算しない
+CREATE OR REPLACE FUNCTION bump_row_version() RETURNS trigger AS $$
+BEGIN
+    IF NEW.version = OLD.version THEN
+        NEW.version := OLD.version + 1;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER tasks_row_version BEFORE UPDATE ON tasks
+    FOR EACH ROW EXECUTE FUNCTION bump_row_version();
+CREATE OR REPLACE TRIGGER boards_row_version BEFORE UPDATE ON boards
+    FOR EACH ROW EXECUTE FUNCTION bump_row_version();
+CREATE OR REPLACE TRIGGER board_tasks_row_version BEFORE UPDATE ON board_tasks
+    FOR EACH ROW EXECUTE FUNCTION bump_row_version();
+
+-- タスクの移動は移動先ボードの board_task_order の行をロックしてから前後のキーを読む。
+-- 行が無いとロックできないので、全ボードに作っておく
+INSERT INTO board_task_order (board_id)
+SELECT id FROM boards
+ON CONFLICT (board_id) DO NOTHING;
+
+CREATE OR REPLACE FUNCTION create_board_task_order() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO board_task_order (board_id)
+    SELECT id FROM new_rows
+    ON CONFLICT (board_id) DO NOTHING;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER boards_task_order_insert AFTER INSERT ON boards
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION create_board_task_order();
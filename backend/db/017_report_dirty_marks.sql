@@ -0,0 +1,102 @@
+-- 再集計が必要な日の記録を、書き込みごとの行にする。
+-- 日ごとに 1 行で ON CONFLICT (day) DO NOTHING にしていると、既にある行には
+-- ロックを取らないので、集計がその行を消したあとにまだコミットされていない
+-- 書き込みがコミットされ、その日が再集計されないまま残ることがあった。
+-- 書き込みごとに行を足せば、集計はコミット済みの行だけを消すので、
+-- 未コミットの書き込みの記録は残る。同じ日の書き込みどうしが 1 行を
+-- ロックし合うこともない。
+ALTER TABLE report_dirty_days DROP CONSTRAINT IF EXISTS report_dirty_days_pkey;
+
+CREATE OR REPLACE FUNCTION mark_task_report_days(task_ids UUID[]) RETURNS void AS $$
+    INSERT INTO report_dirty_days (day)
+    SELECT report_day(completed_at) FROM tasks WHERE id = ANY(task_ids) AND completed_at IS NOT NULL
+    UNION
+    SELECT report_day(started_at) FROM time_entries WHERE task_id = ANY(task_ids)
+$$ LANGUAGE sql;
+
+CREATE OR REPLACE FUNCTION mark_report_days_from_tasks() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO report_dirty_days (day)
+        SELECT DISTINCT report_day(completed_at) FROM new_rows WHERE completed_at IS NOT NULL;
+    ELSIF TG_OP = 'DELETE' THEN
+        -- 計測区間は CASCADE で削除され、time_entries 側のトリガーで記録される
+        INSERT INTO report_dirty_days (day)
+        SELECT DISTINCT report_day(completed_at) FROM old_rows WHERE completed_at IS NOT NULL;
+    ELSE
+        -- 集計に関わる列が変わった行だけ（タイトルの編集などでは何もしない）
+        INSERT INTO report_dirty_days (day)
+        SELECT DISTINCT report_day(x.completed_at)
+        FROM old_rows o
+        JOIN new_rows n ON n.id = o.id
+        CROSS JOIN LATERAL (VALUES (o.completed_at), (n.completed_at)) AS x(completed_at)
+        WHERE x.completed_at IS NOT NULL
+          AND (o.completed_at IS DISTINCT FROM n.completed_at
+               OR o.created_at IS DISTINCT FROM n.created_at
+               OR o.project_id IS DISTINCT FROM n.project_id);
+
+        -- プロジェクトが変わると過去の計測時間の集計先も変わる
+        PERFORM mark_task_report_days(ARRAY(
+            SELECT n.id FROM old_rows o JOIN new_rows n ON n.id = o.id
+            WHERE o.project_id IS DISTINCT FROM n.project_id
+        ));
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION mark_report_days_from_time_entries() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO report_dirty_days (day)
+        SELECT DISTINCT report_day(started_at) FROM new_rows;
+    ELSE
+        INSERT INTO report_dirty_days (day)
+        SELECT DISTINCT report_day(started_at) FROM old_rows;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- 同じ日の記録が複数あっても 1 回だけ集計する
+CREATE OR REPLACE FUNCTION refresh_report_daily() RETURNS INTEGER AS $$
+DECLARE
+    days DATE[];
+BEGIN
+    -- 同時に呼ばれても同じ日を二重に集計しない
+    PERFORM pg_advisory_xact_lock(hashtext('refresh_report_daily'));
+    -- 取り出すのはこの時点でコミット済みの記録だけ。まだコミットされていない書き込みの
+    -- 記録は残るので、次の集計で拾われる
+    WITH taken AS (DELETE FROM report_dirty_days RETURNING day)
+    SELECT array_agg(DISTINCT day) INTO days FROM taken;
+    IF days IS NULL THEN
+        RETURN 0;
+    END IF;
+
+    DELETE FROM report_daily WHERE day = ANY(days);
+
+    INSERT INTO report_daily (scope_type, day, scope_id, tracked_seconds, completed_count, cycle_seconds)
+    SELECT scope.scope_type, f.day, scope.scope_id,
+           SUM(f.tracked_seconds), SUM(f.completed_count), SUM(f.cycle_seconds)
+    FROM (
+        SELECT d.day, t.project_id, t.board_id, 0 AS tracked_seconds,
+               1 AS completed_count, extract(epoch FROM t.completed_at - t.created_at) AS cycle_seconds
+        FROM unnest(days) AS d(day)
+        JOIN all_tasks t
+          ON t.completed_at >= d.day::timestamp AT TIME ZONE report_timezone()
+         AND t.completed_at < (d.day + 1)::timestamp AT TIME ZONE report_timezone()
+        UNION ALL
+        SELECT d.day, t.project_id, t.board_id, extract(epoch FROM te.ended_at - te.started_at), 0, 0
+        FROM unnest(days) AS d(day)
+        JOIN all_time_entries te
+          ON te.started_at >= d.day::timestamp AT TIME ZONE report_timezone()
+         AND te.started_at < (d.day + 1)::timestamp AT TIME ZONE report_timezone()
+        JOIN all_tasks t ON t.id = te.task_id
+    ) f
+    CROSS JOIN LATERAL (VALUES ('project', f.project_id), ('board', f.board_id)) AS scope(scope_type, scope_id)
+    WHERE scope.scope_id IS NOT NULL
+    GROUP BY scope.scope_type, f.day, scope.scope_id;
+
+    RETURN array_length(days, 1);
+END;
+$$ LANGUAGE plpgsql;
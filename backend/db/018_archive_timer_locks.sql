@@ -0,0 +1,114 @@
+-- タイマーのあるタスクがコールドストレージに移されないよう、タイマー操作と
+-- 移動の間のロックを揃える（016 の定義を置き換え）。
+
+CREATE OR REPLACE FUNCTION timer_transition(p_user_id TEXT, p_task_id UUID, p_action TEXT)
+RETURNS TABLE (state TEXT, started_at TIMESTAMP WITH TIME ZONE, total_seconds DOUBLE PRECISION) AS $$
+DECLARE
+    current_timer running_timers%ROWTYPE;
+BEGIN
+    -- タスクの行を FOR KEY SHARE でロックし、計測中にコールドストレージへ移されないようにする
+    -- （move_archived_tasks は FOR UPDATE SKIP LOCKED で選ぶので、ロック中のタスクは飛ばす）
+    PERFORM 1 FROM tasks WHERE id = p_task_id FOR KEY SHARE;
+    IF NOT FOUND THEN
+        RETURN;
+    END IF;
+
+    -- 同じユーザーの操作を直列化する（行が無い状態からの同時開始も含む）
+    PERFORM pg_advisory_xact_lock(hashtext('timer:' || p_user_id));
+    SELECT * INTO current_timer FROM running_timers r WHERE r.user_id = p_user_id;
+
+    IF current_timer.started_at IS NOT NULL AND (
+        (p_action = 'start' AND current_timer.task_id <> p_task_id)
+        OR (p_action <> 'start' AND current_timer.task_id = p_task_id)
+    ) THEN
+        INSERT INTO time_entries (task_id, user_id, started_at, ended_at)
+        VALUES (current_timer.task_id, p_user_id, current_timer.started_at, now());
+
+        INSERT INTO task_time_totals AS tt (task_id, total_seconds, entry_count)
+        VALUES (current_timer.task_id, extract(epoch FROM now() - current_timer.started_at), 1)
+        ON CONFLICT (task_id) DO UPDATE
+        SET total_seconds = tt.total_seconds + EXCLUDED.total_seconds,
+            entry_count = tt.entry_count + 1;
+
+        -- タスク一覧の tracked_seconds が変わるので ETag を更新する
+        PERFORM bump_resource_versions('{tasks}');
+    END IF;
+
+    IF p_action = 'start' THEN
+        INSERT INTO running_timers AS r (user_id, task_id, started_at)
+        VALUES (p_user_id, p_task_id, now())
+        ON CONFLICT (user_id) DO UPDATE
+        SET task_id = EXCLUDED.task_id,
+            started_at = CASE
+                WHEN r.task_id = EXCLUDED.task_id AND r.started_at IS NOT NULL THEN r.started_at
+                ELSE EXCLUDED.started_at
+            END;
+    ELSIF p_action = 'pause' THEN
+        UPDATE running_timers r SET started_at = NULL
+        WHERE r.user_id = p_user_id AND r.task_id = p_task_id;
+    ELSIF p_action = 'stop' THEN
+        DELETE FROM running_timers r
+        WHERE r.user_id = p_user_id AND r.task_id = p_task_id;
+    END IF;
+
+    RETURN QUERY
+    SELECT CASE
+               WHEN r.task_id IS NULL THEN 'stopped'
+               WHEN r.started_at IS NULL THEN 'paused'
+               ELSE 'running'
+           END,
+           r.started_at,
+           COALESCE((SELECT tt.total_seconds FROM task_time_totals tt WHERE tt.task_id = p_task_id), 0)
+    FROM (SELECT 1) one
+    LEFT JOIN running_timers r ON r.user_id = p_user_id AND r.task_id = p_task_id;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION move_archived_tasks(p_cutoff TIMESTAMP WITH TIME ZONE, p_limit INTEGER)
+RETURNS INTEGER AS $$
+DECLARE
+    task_ids UUID[];
+BEGIN
+    SELECT array_agg(id) INTO task_ids
+    FROM (
+        SELECT t.id FROM tasks t
+        WHERE t.archived_at < p_cutoff
+          AND NOT EXISTS (SELECT 1 FROM running_timers r WHERE r.task_id = t.id)
+        ORDER BY t.archived_at
+        LIMIT p_limit
+        FOR UPDATE SKIP LOCKED
+    ) picked;
+
+    -- 上の NOT EXISTS は文の開始時点のスナップショットで見ているので、その後
+    -- ロックを取るまでにコミットされたタイマーを見落とす。ロックを取った今は
+    -- 新しいタイマーは作れないので、新しいスナップショットで確かめ直す
+    SELECT array_agg(id) INTO task_ids
+    FROM unnest(task_ids) AS id
+    WHERE NOT EXISTS (SELECT 1 FROM running_timers r WHERE r.task_id = id);
+    IF task_ids IS NULL THEN
+        RETURN 0;
+    END IF;
+
+    INSERT INTO archived_tasks (
+        id, project_id, title, description, scheduled_start, scheduled_end,
+        completed_at, archived_at, created_at, updated_at,
+        board_id, position, tracked_seconds, entry_count
+    )
+    SELECT t.id, t.project_id, t.title, t.description, t.scheduled_start, t.scheduled_end,
+           t.completed_at, t.archived_at, t.created_at, t.updated_at,
+           bt.board_id, bt.position, COALESCE(tt.total_seconds, 0), COALESCE(tt.entry_count, 0)
+    FROM tasks t
+    LEFT JOIN board_tasks bt ON bt.task_id = t.id
+    LEFT JOIN task_time_totals tt ON tt.task_id = t.id
+    WHERE t.id = ANY(task_ids);
+
+    INSERT INTO archived_time_entries (id, task_id, user_id, started_at, ended_at)
+    SELECT id, task_id, user_id, started_at, ended_at FROM time_entries WHERE task_id = ANY(task_ids);
+
+    -- board_tasks・time_entries・task_time_totals は CASCADE で消える
+    DELETE FROM tasks WHERE id = ANY(task_ids);
+
+    PERFORM bump_resource_versions('{tasks}');
+    RETURN array_length(task_ids, 1);
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,44 @@
+"""benchmarks.query_plans と同じクエリの実行計画に Seq Scan が無いことの確認
+
+DATABASE_URL が設定されているときだけ実行する（投入したデータは最後にロールバックする）。
+
+    cd backend && DATABASE_URL=postgresql://... python -m pytest tests
+"""
+
+from __future__ import annotations
+
+import os
+from collections.abc import Iterator
+from typing import Any
+
+import pytest
+
+from app.database import get_conn, pool
+from benchmarks.query_plans import QUERIES, seed, seq_scans
+
+pytestmark = pytest.mark.skipif("DATABASE_URL" not in os.environ, reason="DATABASE_URL is not set")
+
+# プランナが索引を選ぶ程度の件数（これより少ないと全件読むほうが安くなる）
+PLAN_TEST_TASKS = 50_000
+
+
+@pytest.fixture(scope="module")
+def seeded() -> Iterator[tuple[Any, dict[str, str]]]:
+    pool.open()
+    try:
+        with get_conn() as conn, conn.cursor() as cur:
+            try:
+                yield cur, seed(cur, PLAN_TEST_TASKS, projects=50, boards=10)
+            finally:
+                conn.rollback()
+    finally:
+        pool.close()
+
+
+@pytest.mark.parametrize(("name", "build"), QUERIES, ids=[name for name, _ in QUERIES])
+def test_no_seq_scan_on_hot_tables(seeded: tuple[Any, dict[str, str]], name: str, build: Any) -> None:
+    cur, ids = seeded
+    sql, params = build(ids)
+    cur.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+    plan = cur.fetchone()["QUERY PLAN"][0]["Plan"]
+    assert seq_scans(plan) == [], plan
@@ -5,4 +5,4 @@ export { default as BoardColorPicker, BOARD_COLORS } from "./BoardColorPicker";
 export { default as BoardSidebar } from "./BoardSidebar";
 export { default as useBoardDnd } from "./useBoardDnd";
 export { default as useBoardApi } from "./useBoardApi";
-export type { Project, Task, InboxTask, Board } from "./types";
+export type { Project, Task, InboxTask, Board, BoardState } from "./types";
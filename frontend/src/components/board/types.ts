@@ -16,6 +16,8 @@ export type Task = {
   completed_at: string | null;
   archived_at: string | null;
   project: Project | null;
+  tracked_seconds?: number;
+  version: number;
 };
 
 export type InboxTask = {
@@ -27,10 +29,20 @@ export type InboxTask = {
   completed_at: string | null;
   archived_at: string | null;
   project: Project | null;
+  tracked_seconds?: number;
+  version: number;
 };
 
 export type Board = {
   id: string;
   label: string;
   color: string;
+  version: number;
+};
+
+export type BoardState = {
+  boards: Board[];
+  tasks: Record<string, Task[]>;
+  unassigned: InboxTask[];
+  projects: Project[];
 };
@@ -40,6 +40,7 @@ import {
   type Task,
   type InboxTask,
   type Board,
+  type BoardState,
 } from "../components/board";
 
 export default function BoardPage() {
@@ -117,29 +118,16 @@ export default function BoardPage() {
 
   // 初期データ取得
   useEffect(() => {
-    Promise.all([
-      fetch("/api/boards").then((res) => {
+    fetch("/api/board-state")
+      .then((res) => {
         if (!res.ok) throw new Error(`HTTP ${res.status}`);
         return res.json();
-      }),
-      fetch("/api/tasks").then((res) => {
-        if (!res.ok) throw new Error(`HTTP ${res.status}`);
-        return res.json();
-      }),
-      fetch("/api/tasks/unassigned").then((res) => {
-        if (!res.ok) throw new Error(`HTTP ${res.status}`);
-        return res.json();
-      }),
-      fetch("/api/projects").then((res) => {
-        if (!res.ok) throw new Error(`HTTP ${res.status}`);
-        return res.json();
-      }),
-    ])
-      .then(([boardsData, tasksData, inboxData, projectsData]) => {
-        setBoards(boardsData);
-        setTasks(tasksData);
-        setInboxTasks(inboxData);
-        setProjects(projectsData);
+      })
+      .then((state: BoardState) => {
+        setBoards(state.boards);
+        setTasks(state.boards.flatMap((b) => state.tasks[b.id] ?? []));
+        setInboxTasks(state.unassigned);
+        setProjects(state.projects);
       })
       .catch((err) => setError(err.message));
   }, []);
@@ -14,3 +14,6 @@ docker volume rm "$VOLUME_NAME" 2>/dev/null || true
 
 echo "Starting db container..."
 docker compose up -d db
+
+echo "Applying migrations..."
+docker compose run --rm backend python -m app.migrate